@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import os
+import socket
+import threading
 import time
 import warnings
-from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import timedelta
 from typing import (
     Any,
     AsyncIterator,
@@ -19,6 +24,7 @@ from typing import (
     Sequence,
     Tuple,
     Union,
+    cast,
 )
 from urllib.parse import urlparse
 
@@ -32,21 +38,152 @@ from langchain_core.pydantic_v1 import (
     root_validator,
     validator,
 )
+from requests.adapters import HTTPAdapter
 from requests.models import Response
+from requests.structures import CaseInsensitiveDict
 
 from langchain_nvidia_ai_endpoints._statics import MODEL_TABLE, Model, determine_model
+from langchain_nvidia_ai_endpoints.balancing import LoadBalancer
+from langchain_nvidia_ai_endpoints.circuit import CircuitBreaker
+from langchain_nvidia_ai_endpoints.compression import (
+    _check_encoding,
+    _compress,
+    _fallback_encoding,
+)
+from langchain_nvidia_ai_endpoints.hedging import (
+    _ATTEMPT,
+    HedgingPolicy,
+    _AbortableAdapter,
+    _Attempt,
+    _attempt_abandoned,
+)
+from langchain_nvidia_ai_endpoints.http2 import AsyncHTTP2Session, HTTP2Session
+from langchain_nvidia_ai_endpoints.metrics import _request_metrics, _RequestMetrics
+from langchain_nvidia_ai_endpoints.timeouts import Timeouts
+from langchain_nvidia_ai_endpoints.tracing import (
+    RequestSpan,
+    _aiohttp_trace_config,
+    _request_span,
+)
 
 logger = logging.getLogger(__name__)
 
 _MODE_TYPE = Literal["nvidia", "nim"]
 
+## JSON codec used for request bodies and responses: orjson or msgspec when
+## installed (several times faster on large embedding responses), stdlib otherwise
+try:
+    import orjson
+
+    def _json_dumps(obj: Any) -> bytes:
+        ## like the stdlib, accept non-str keys (e.g. token ids of logit_bias)
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    _json_loads: Callable[[Union[str, bytes]], Any] = orjson.loads
+except ImportError:
+    try:
+        import msgspec  # type: ignore
+
+        _msgspec_encoder = msgspec.json.Encoder()
+        _msgspec_decoder = msgspec.json.Decoder()
+
+        def _json_dumps(obj: Any) -> bytes:
+            return _msgspec_encoder.encode(obj)
+
+        def _json_loads(data: Union[str, bytes]) -> Any:
+            try:
+                return _msgspec_decoder.decode(data)
+            except msgspec.DecodeError as e:
+                # callers handle the stdlib error type
+                raise json.JSONDecodeError(str(e), "", 0) from None
+    except ImportError:
+
+        def _json_dumps(obj: Any) -> bytes:
+            return json.dumps(obj).encode("utf-8")
+
+        _json_loads = json.loads
+
+## Guards lazy creation of the pooled session shared by all calls of an NVEModel
+_SESSION_LOCK = threading.Lock()
+
+
+_DEFAULT_TIMEOUTS = Timeouts.parse_obj({})
+
 
 def default_payload_fn(payload: dict) -> dict:
     return payload
 
 
-class NVEModel(BaseModel):
+class _HTTPError(Exception):
+    """Error response of an endpoint"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _is_endpoint_failure(error: BaseException) -> bool:
+    """Whether an error says the endpoint is unhealthy, rather than the request bad"""
+    if isinstance(error, _HTTPError):
+        status = error.status_code
+    elif isinstance(error, aiohttp.ClientResponseError):
+        status = error.status
+    else:
+        return isinstance(error, (OSError, aiohttp.ClientError, asyncio.TimeoutError))
+    return status is None or status >= 500 or status == 429
+
+
+async def _wait_for(awaitable: Any, timeout: Optional[float], waiting_for: str) -> Any:
+    """Await with a timeout, raising a TimeoutError that says what was late"""
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"No {waiting_for} within {timeout:.2f}s") from None
+
+
+async def _close_with_loop(client: Any, clients: dict) -> AsyncIterator[None]:
+    """
+    Close the async client of a loop, and forget it, once the loop shuts down its
+    async generators, as `asyncio.run` does before closing the loop
+    """
+    try:
+        yield
+    finally:
+        clients.pop(asyncio.get_running_loop(), None)
+        await client.aclose()
+
+
+def _private_response_socket(raw: Any) -> Optional[socket.socket]:
+    """
+    Socket of a urllib3 response that no longer has a connection, reached
+    through private attributes of urllib3 and http.client, None if they changed
+    """
+    try:
+        sock = raw._fp.fp.raw._sock
+    except AttributeError:
+        return None
+    return sock if isinstance(sock, socket.socket) else None
 
+
+class _StreamState:
+    """Progress of a stream: finished choices and whether usage has arrived"""
+
+    def __init__(self, payload: dict) -> None:
+        self.n = payload.get("n") or 1
+        stream_options = payload.get("stream_options") or {}
+        self.expect_usage = bool(stream_options.get("include_usage"))
+        self.stopped: set = set()
+        self.has_usage = False
+
+    @property
+    def done(self) -> bool:
+        """All choices finished and, if requested, usage received"""
+        if len(self.stopped) < self.n:
+            return False
+        return self.has_usage or not self.expect_usage
+
+
+class NVEModel(BaseModel):
     """
     Underlying Client for interacting with the AI Foundation Model Function API.
     Leveraged by the NVIDIABaseModel to provide a simple requests-oriented interface.
@@ -80,11 +217,35 @@ class NVEModel(BaseModel):
     )
     get_session_fn: Callable = Field(requests.Session)
     get_asession_fn: Callable = Field(aiohttp.ClientSession)
+    max_connections: int = Field(
+        32, ge=1, description="Maximum number of pooled connections per host"
+    )
+    http2: bool = Field(
+        False, description="Multiplex requests over HTTP/2, requires httpx[http2]"
+    )
+    compression: Optional[Literal["gzip", "zstd"]] = Field(
+        None, description="Encoding of large request bodies, zstd requires zstandard"
+    )
+    compression_threshold: int = Field(
+        16384, ge=0, description="Size from which request bodies are compressed (B)"
+    )
+    hedging: Optional[HedgingPolicy] = Field(
+        None, description="Policy for hedging non-streaming requests"
+    )
+    load_balancer: Optional[LoadBalancer] = Field(
+        None, description="Spreads requests for base_url over several replicas"
+    )
+    circuit_breaker: Optional[CircuitBreaker] = Field(
+        None, description="Fails requests fast while their endpoint is unhealthy"
+    )
 
     api_key: Optional[SecretStr] = Field(description="API Key for service of choice")
 
     ## Generation arguments
     timeout: float = Field(60, ge=0, description="Timeout for waiting on response (s)")
+    timeouts: Optional[Timeouts] = Field(
+        None, description="Timeouts for each phase of a request"
+    )
     interval: float = Field(0.02, ge=0, description="Interval for pulling response")
     last_inputs: dict = Field({}, description="Last inputs sent over to the server")
     last_response: Response = Field(
@@ -93,15 +254,23 @@ class NVEModel(BaseModel):
     payload_fn: Callable = Field(
         default_payload_fn, description="Function to process payload"
     )
+    json_dumps_fn: Callable[[Any], bytes] = Field(
+        _json_dumps, description="Function to encode request bodies as JSON"
+    )
+    json_loads_fn: Callable[[Union[str, bytes]], Any] = Field(
+        _json_loads, description="Function to decode JSON responses and events"
+    )
     headers_tmpl: dict = Field(
         {
             "call": {
                 "Accept": "application/json",
+                "Accept-Encoding": "gzip, deflate",
                 "Authorization": "Bearer {api_key}",
                 "User-Agent": "langchain-nvidia-ai-endpoints",
             },
             "stream": {
                 "Accept": "text/event-stream",
+                "Accept-Encoding": "gzip, deflate",
                 "Content-Type": "application/json",
                 "Authorization": "Bearer {api_key}",
                 "User-Agent": "langchain-nvidia-ai-endpoints",
@@ -110,6 +279,17 @@ class NVEModel(BaseModel):
         description="Headers template must contain `call` and `stream` keys.",
     )
     _available_models: Optional[List[Model]] = PrivateAttr(default=None)
+    _session: Optional[Any] = PrivateAttr(default=None)
+    ## http2 clients per event loop, each closed when its loop shuts down
+    _asessions: Dict[asyncio.AbstractEventLoop, Tuple[Any, AsyncIterator]] = (
+        PrivateAttr(default_factory=dict)
+    )
+    _asemaphore: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = (
+        PrivateAttr(default=None)
+    )
+    _hedge_executor: Optional[ThreadPoolExecutor] = PrivateAttr(default=None)
+    ## encoding of compressed requests per url, once an endpoint refused one
+    _request_encodings: Dict[str, Optional[str]] = PrivateAttr(default_factory=dict)
 
     @classmethod
     def is_lc_serializable(cls) -> bool:
@@ -130,6 +310,10 @@ class NVEModel(BaseModel):
                 )
         return headers_
 
+    @validator("compression")
+    def _validate_compression(cls, v: Optional[str]) -> Optional[str]:
+        return _check_encoding(v)
+
     @validator("base_url")
     def _validate_base_url(cls, v: str) -> str:
         if v is not None:
@@ -159,6 +343,46 @@ class NVEModel(BaseModel):
             )
         return payload
 
+    def __prepare_request(self, inputs: dict) -> dict:
+        """Request arguments for inputs, with authorization and an encoded body"""
+        request = {**inputs, "headers": {**inputs["headers"]}}
+        if "json" in request:
+            request["data"] = self.json_dumps_fn(request.pop("json"))
+            request["headers"]["Content-Type"] = "application/json"
+            encoding = self._request_encodings.get(request["url"], self.compression)
+            if encoding and len(request["data"]) >= self.compression_threshold:
+                request["data"] = _compress(request["data"], encoding)
+                request["headers"]["Content-Encoding"] = encoding
+        return self.__add_authorization(request)
+
+    def _renegotiate(
+        self, inputs: dict, request: dict, status: int, headers: Any
+    ) -> Optional[dict]:
+        """
+        The request to send again when an endpoint refused the encoding of a
+        compressed request (HTTP 415), None otherwise. Later requests to the
+        endpoint use an encoding it accepts, or none.
+        """
+        encoding = request["headers"].get("Content-Encoding")
+        if status != 415 or encoding is None:
+            return None
+        fallback = _fallback_encoding(headers.get("Accept-Encoding"), encoding)
+        logger.debug(f"{request['url']} refused {encoding}, falling back to {fallback}")
+        self._request_encodings[request["url"]] = fallback
+        return self.__prepare_request(inputs)
+
+    def _send(self, inputs: dict, request: dict, timeout: Any) -> Tuple[Response, dict]:
+        """Post a request, and again if its encoding was refused, with the request"""
+        session = self._get_session()
+        response = session.post(**request, timeout=timeout)
+        retry = self._renegotiate(
+            inputs, request, response.status_code, response.headers
+        )
+        if retry is None:
+            return response, request
+        response.close()
+        return session.post(**retry, timeout=timeout), retry
+
     @property
     def available_models(self) -> list[Model]:
         """List the available models that can be invoked."""
@@ -179,9 +403,10 @@ class NVEModel(BaseModel):
         #  ]
         # }
         assert response.status_code == 200, "Failed to get models"
-        assert "data" in response.json(), "No data found in response"
+        result = self.json_loads_fn(response.content)
+        assert "data" in result, "No data found in response"
         self._available_models = []
-        for element in response.json()["data"]:
+        for element in result["data"]:
             assert "id" in element, f"No id found in {element}"
             if not (model := determine_model(element["id"])):
                 # model is not in table of known models, but it exists
@@ -195,76 +420,318 @@ class NVEModel(BaseModel):
     ####################################################################################
     ## Core utilities for posting and getting from NV Endpoints
 
+    def __getstate__(self) -> Dict[Any, Any]:
+        ## sessions hold open connections (and async ones an event loop)
+        state = super().__getstate__()
+        state["__private_attribute_values__"] = {
+            **state["__private_attribute_values__"],
+            "_session": None,
+            "_asessions": {},
+            "_asemaphore": None,
+            "_hedge_executor": None,
+        }
+        return state
+
+    def _get_session(self) -> Any:
+        """
+        Return the session shared by all requests of this client, creating it on
+        first use. Reusing one session keeps connections alive across calls, which
+        matters most when many requests are in flight (e.g. `batch`).
+        """
+        if self._session is None:
+            with _SESSION_LOCK:
+                if self._session is None:
+                    if self.http2:
+                        session = HTTP2Session(max_connections=self.max_connections)
+                    else:
+                        session = self.get_session_fn()
+                    if isinstance(session, requests.Session):
+                        ## losing hedged attempts close the connection they wait on
+                        adapter_cls = (
+                            HTTPAdapter if self.hedging is None else _AbortableAdapter
+                        )
+                        adapter = adapter_cls(
+                            pool_connections=self.max_connections,
+                            pool_maxsize=self.max_connections,
+                        )
+                        session.mount("http://", adapter)
+                        session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def _get_asession(self, **kwargs: Any) -> Any:
+        """
+        Return a new aiohttp session for a request. With `http2`, all requests
+        on the running event loop share one HTTP/2 client instead, so that they
+        are multiplexed over its connections.
+        """
+        if not self.http2:
+            return self.get_asession_fn(**kwargs)
+        loop = asyncio.get_running_loop()
+        if loop not in self._asessions:
+            ## clients are bound to the event loop they were first used on
+            client = AsyncHTTP2Session(max_connections=self.max_connections).client
+            guard = _close_with_loop(client, self._asessions)
+            asyncio.ensure_future(guard.__anext__())
+            ## the loop only holds a weak reference to the guard
+            self._asessions[loop] = (client, guard)
+        return AsyncHTTP2Session(client=self._asessions[loop][0])
+
+    @property
+    def _timeouts(self) -> Timeouts:
+        return self.timeouts or _DEFAULT_TIMEOUTS
+
+    def _deadline(self) -> Optional[float]:
+        """Monotonic time by which a request must complete, None without a total"""
+        total = self._timeouts.total
+        return None if total is None else time.monotonic() + total
+
+    def _remaining(
+        self, timeout: Optional[float], deadline: Optional[float]
+    ) -> Optional[float]:
+        """timeout, cut short by the time left until deadline"""
+        if deadline is None:
+            return timeout
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise self._deadline_error()
+        return left if timeout is None else min(timeout, left)
+
+    def _deadline_error(self) -> TimeoutError:
+        return TimeoutError(
+            f"Total timeout of {self._timeouts.total}s reached "
+            "without a complete response."
+        )
+
+    def _first_byte_timeout(
+        self, deadline: Optional[float] = None
+    ) -> Tuple[Optional[float], Optional[float]]:
+        """(connect, read) timeout of `requests` for the response headers"""
+        first_byte = self._timeouts.first_byte
+        if first_byte is None:
+            first_byte = self.timeout
+        return self._timeouts.connect, self._remaining(first_byte, deadline)
+
+    def _idle_timeout(self, deadline: Optional[float] = None) -> Optional[float]:
+        """Timeout for the next chunk of a streamed response"""
+        idle = self._timeouts.idle
+        return self._remaining(self.timeout if idle is None else idle, deadline)
+
+    @staticmethod
+    def _set_read_timeout(response: Response, timeout: Optional[float]) -> None:
+        """
+        Apply timeout to the remaining reads of a streamed `requests` response.
+        If the socket can't be reached, reads keep the timeout of the request.
+        """
+        if (settimeout := getattr(response.raw, "settimeout", None)) is not None:
+            settimeout(timeout)  # HTTP2Session
+            return
+        sock = getattr(getattr(response.raw, "connection", None), "sock", None)
+        if sock is None:
+            ## when the server closes the connection after this response, only the
+            ## response still holds the socket
+            sock = _private_response_socket(response.raw)
+        if isinstance(sock, socket.socket):
+            sock.settimeout(timeout)
+        else:
+            logger.debug(
+                f"No socket found for the response of {response.url}, its reads "
+                "keep the first byte timeout"
+            )
+
     def _post(
         self,
         invoke_url: str,
         payload: Optional[dict] = {},
+        span: Optional[RequestSpan] = None,
+        deadline: Optional[float] = None,
     ) -> Tuple[Response, Any]:
         """Method for posting to the AI Foundation Model Function API."""
-        self.last_inputs = {
-            "url": invoke_url,
-            "headers": self.headers["call"],
-            "json": self.payload_fn(payload),
-            "stream": False,
-        }
-        session = self.get_session_fn()
-        self.last_response = response = session.post(
-            **self.__add_authorization(deepcopy(self.last_inputs))
-        )
-        self._try_raise(response)
+        replica, url = self._route(invoke_url)
+        try:
+            self.last_inputs = inputs = {
+                "url": url,
+                "headers": self.headers["call"],
+                "json": self.payload_fn(payload),
+                "stream": False,
+            }
+            session = self._get_session()
+            request = self.__prepare_request(inputs)
+            if span is not None:
+                span.url = url
+                span.request_bytes = len(request["data"])
+                span.mark("send")
+            response, request = self._send(
+                inputs, request, self._first_byte_timeout(deadline)
+            )
+            self.last_response = response
+            if span is not None:
+                span.request_bytes = len(request["data"])
+                self._trace_response(span, response)
+            self._try_raise(response)
+        except Exception as e:
+            self._release(invoke_url, replica, None, e)
+            raise
+        self._release(invoke_url, replica, response.elapsed.total_seconds(), None)
         return response, session
 
+    def _route(self, invoke_url: str) -> Tuple[Optional[str], str]:
+        """
+        (replica, url) for a request, the replica is None without balancing.
+        Raises `CircuitOpenError` while the circuit of invoke_url is open.
+        """
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.admit(invoke_url)
+        if self.load_balancer is None or not invoke_url.startswith(self.base_url):
+            return None, invoke_url
+        replica = self.load_balancer.acquire()
+        return replica, replica + invoke_url[len(self.base_url) :]
+
+    def _release(
+        self,
+        invoke_url: str,
+        replica: Optional[str],
+        latency: Optional[float],
+        error: Optional[BaseException],
+    ) -> None:
+        """Report the outcome of a request admitted by `_route`"""
+        ## a losing hedged attempt fails because it was abandoned, not the endpoint
+        failed = (
+            error is not None
+            and _is_endpoint_failure(error)
+            and not _attempt_abandoned()
+        )
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(invoke_url, latency, failed)
+        if replica is not None and self.load_balancer is not None:
+            self.load_balancer.release(replica, latency, not failed)
+
     def _get(
         self,
         invoke_url: str,
         payload: Optional[dict] = {},
     ) -> Tuple[Response, Any]:
         """Method for getting from the AI Foundation Model Function API."""
-        self.last_inputs = {
-            "url": invoke_url,
-            "headers": self.headers["call"],
-            "stream": False,
-        }
-        if payload:
-            self.last_inputs["json"] = self.payload_fn(payload)
+        replica, url = self._route(invoke_url)
+        try:
+            self.last_inputs = {
+                "url": url,
+                "headers": self.headers["call"],
+                "stream": False,
+            }
+            if payload:
+                self.last_inputs["json"] = self.payload_fn(payload)
+
+            session = self._get_session()
+            self.last_response = response = session.get(
+                **self.__prepare_request(self.last_inputs),
+                timeout=self._first_byte_timeout(),
+            )
+            self._try_raise(response)
+        except Exception as e:
+            self._release(invoke_url, replica, None, e)
+            raise
+        self._release(invoke_url, replica, response.elapsed.total_seconds(), None)
+        return response, session
 
-        session = self.get_session_fn()
-        self.last_response = response = session.get(
-            **self.__add_authorization(deepcopy(self.last_inputs))
+    def _hedged_post(
+        self,
+        invoke_url: str,
+        payload: dict,
+        span: Optional[RequestSpan] = None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[Response, Any]:
+        """`_post`, with a duplicate request if the hedging policy calls for one"""
+        if self.hedging is None:
+            return self._post(invoke_url, payload, span=span, deadline=deadline)
+
+        attempts = (_Attempt(), _Attempt())
+
+        def attempt(index: int) -> Tuple[Response, Any]:
+            ## runs in a context of its own, see HedgingPolicy.call
+            _ATTEMPT.set(attempts[index])
+            if index == 0:
+                return self._post(invoke_url, payload, span=span, deadline=deadline)
+            if span is not None:
+                span.mark("hedge")
+            return self._post(invoke_url, payload, deadline=deadline)
+
+        return self.hedging.call(
+            invoke_url,
+            attempt,
+            discard=lambda result: result[0].close(),
+            executor=self._get_hedge_executor(),
+            abandon=lambda index: attempts[index].abandon(),
         )
-        self._try_raise(response)
-        return response, session
 
-    def _wait(self, response: Response, session: Any) -> Response:
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        """
+        Return the pool running the hedged attempts of this client, sized like its
+        connection pool so that its requests never queue behind other clients'.
+        """
+        if self._hedge_executor is None:
+            with _SESSION_LOCK:
+                if self._hedge_executor is None:
+                    self._hedge_executor = ThreadPoolExecutor(
+                        max_workers=self.max_connections,
+                        thread_name_prefix="nvidia-hedge",
+                    )
+        return self._hedge_executor
+
+    @staticmethod
+    def _trace_response(span: RequestSpan, response: Response) -> None:
+        """Mark the arrival of the headers of a response on a span"""
+        send = span.phases.get("send", 0.0)
+        span.mark("first_byte", offset=send + response.elapsed.total_seconds())
+        span.record_response(response.status_code, response.headers)
+
+    def _wait(
+        self,
+        response: Response,
+        session: Any,
+        span: Optional[RequestSpan] = None,
+        deadline: Optional[float] = None,
+    ) -> Response:
         """
         Any request may return a 202 status code, which means the request is still
         processing. This method will wait for a response using the request id.
 
         see https://docs.nvidia.com/cloud-functions/user-guide/latest/cloud-function/api.html#http-polling
         """
-        start_time = time.time()
+        if deadline is None:
+            deadline = self._deadline()
+        poll_deadline = self._poll_deadline(deadline)
         # note: the local NIM does not return a 202 status code
         #       (per RL 22may2024 circa 24.05)
         while (
             response.status_code == 202
         ):  # todo: there are no tests that reach this point
             time.sleep(self.interval)
-            if (time.time() - start_time) > self.timeout:
+            if time.monotonic() > poll_deadline:
                 raise TimeoutError(
                     f"Timeout reached without a successful response."
                     f"\nLast response: {str(response)}"
                 )
-            assert (
-                "NVCF-REQID" in response.headers
-            ), "Received 202 response with no request id to follow"
+            assert "NVCF-REQID" in response.headers, (
+                "Received 202 response with no request id to follow"
+            )
             request_id = response.headers.get("NVCF-REQID")
             self.last_response = response = session.get(
                 self.polling_endpoint.format(request_id=request_id),
                 headers=self.headers["call"],
+                timeout=self._first_byte_timeout(deadline),
             )
+            if span is not None:
+                span.polls += 1
+                span.record_response(response.status_code, response.headers)
+                span.mark("poll", status_code=response.status_code)
         self._try_raise(response)
         return response
 
+    def _poll_deadline(self, deadline: Optional[float]) -> float:
+        """Monotonic time to give up polling, after `timeout` without a total"""
+        return time.monotonic() + self.timeout if deadline is None else deadline
+
     def _try_raise(self, response: Response) -> None:
         """Try to raise an error from a response"""
         try:
@@ -280,7 +747,7 @@ class NVEModel(BaseModel):
                 rd = response.__dict__
                 if "status_code" in rd:
                     if "headers" in rd and "WWW-Authenticate" in rd["headers"]:
-                        rd["detail"] = rd.get("headers").get("WWW-Authenticate")
+                        rd["detail"] = rd["headers"]["WWW-Authenticate"]
                         rd["detail"] = rd["detail"].replace(", ", "\n")
                 else:
                     rd = rd.get("_content", rd)
@@ -308,7 +775,9 @@ class NVEModel(BaseModel):
             if str(status) == "401":
                 body += "\nPlease check or regenerate your API key."
             # todo: raise as an HTTPError
-            raise Exception(f"{header}\n{body}") from None
+            raise _HTTPError(
+                f"{header}\n{body}", getattr(response, "status_code", None)
+            ) from None
 
     ####################################################################################
     ## Simple query interface to show the set of model options
@@ -320,19 +789,20 @@ class NVEModel(BaseModel):
         request: str = "get",
     ) -> dict:
         """Simple method for an end-to-end get query. Returns result dictionary"""
+        deadline = self._deadline()
         if request == "get":
             response, session = self._get(invoke_url, payload)
         else:
-            response, session = self._post(invoke_url, payload)
-        response = self._wait(response, session)
+            response, session = self._post(invoke_url, payload, deadline=deadline)
+        response = self._wait(response, session, deadline=deadline)
         output = self._process_response(response)[0]
         return output
 
     def _process_response(self, response: Union[str, Response]) -> List[dict]:
         """General-purpose response processing for single responses and streams"""
-        if hasattr(response, "json"):  ## For single response (i.e. non-streaming)
+        if not isinstance(response, str):  ## For single response (non-streaming)
             try:
-                return [response.json()]
+                return [self.json_loads_fn(response.content)]
             except json.JSONDecodeError:
                 response = str(response.__dict__)
         if isinstance(response, str):  ## For set of responses (i.e. streaming)
@@ -340,7 +810,7 @@ class NVEModel(BaseModel):
             for msg in response.split("\n\n"):
                 if "{" not in msg:
                     continue
-                msg_list += [json.loads(msg[msg.find("{") :])]
+                msg_list += [self.json_loads_fn(msg[msg.find("{") :])]
             return msg_list
         raise ValueError(f"Received ill-formed response: {response}")
 
@@ -366,8 +836,40 @@ class NVEModel(BaseModel):
         invoke_url = self._get_invoke_url(invoke_url)
         if payload.get("stream", False) is True:
             payload = {**payload, "stream": False}
-        response, session = self._post(invoke_url, payload)
-        return self._wait(response, session)
+        span = _request_span(payload, invoke_url, stream=False)
+        if span is None:
+            return self._request(payload, invoke_url)
+        try:
+            return self._request(payload, invoke_url, span)
+        except Exception as e:
+            span.end(error=e)
+            raise
+        finally:
+            span.end()
+
+    def _request(
+        self,
+        payload: dict,
+        invoke_url: str,
+        span: Optional[RequestSpan] = None,
+    ) -> Response:
+        """Post and wait for the response, recording metrics and trace events"""
+        metrics = _request_metrics(payload, invoke_url)
+        deadline = self._deadline()
+        response, session = self._hedged_post(invoke_url, payload, span, deadline)
+        if metrics is None and span is None:
+            return self._wait(response, session, deadline=deadline)
+        request_bytes = len(cast(bytes, response.request.body or b""))
+        queued_at = time.perf_counter() if response.status_code == 202 else None
+        response = self._wait(response, session, span=span, deadline=deadline)
+        if span is not None:
+            span.response_bytes = len(response.content)
+            span.mark("last_byte")
+        if metrics is not None:
+            if queued_at is not None:
+                metrics.observe("queue_time_seconds", time.perf_counter() - queued_at)
+            metrics.finish(request_bytes, len(response.content))
+        return response
 
     def get_req_generation(
         self,
@@ -381,6 +883,105 @@ class NVEModel(BaseModel):
         output, _ = self.postprocess(response, stop=stop)
         return output
 
+    def get_req_generations(
+        self,
+        payload: dict = {},
+        invoke_url: Optional[str] = None,
+        stop: Optional[Sequence[str]] = None,
+    ) -> List[dict]:
+        """
+        Method for an end-to-end post query returning one output per choice.
+
+        When the payload asks for `n` choices but the endpoint returns fewer (some
+        endpoints ignore `n`), the missing choices are requested concurrently as
+        single-choice requests, each with its own seed when one is set. The token
+        usage, of the response or summed over the requests that reported one, is
+        reported once, on the first output.
+        """
+        invoke_url = self._get_invoke_url(invoke_url)
+        if payload.get("stream", False) is True:
+            payload = {**payload, "stream": False}
+        metrics = _request_metrics(payload, invoke_url)
+        span = _request_span(payload, invoke_url, stream=False)
+        try:
+            response = self._request(payload, invoke_url, span)
+            outputs = self._parse_generations(response, stop, span)
+        except Exception as e:
+            if span is not None:
+                span.end(error=e)
+            raise
+        if span is not None:
+            span.end()
+        if metrics is not None:
+            usage = outputs[0].get("token_usage") or {}
+            metrics.throughput(usage.get("completion_tokens"))
+        missing = (payload.get("n") or 1) - len(outputs)
+        if missing > 0:
+            payloads = self._fallback_payloads(payload, missing)
+            ## each request runs in a copy of this context to keep metrics/tracing on
+            contexts = [copy_context() for _ in range(missing)]
+            with ThreadPoolExecutor(
+                max_workers=min(missing, self.max_connections)
+            ) as executor:
+                extra = list(
+                    executor.map(
+                        lambda ctx, extra_payload: ctx.run(
+                            self.get_req_generation,
+                            extra_payload,
+                            invoke_url,
+                            stop=stop,
+                        ),
+                        contexts,
+                        payloads,
+                    )
+                )
+            outputs = self._merge_generations(outputs, extra)
+        return outputs
+
+    def _parse_generations(
+        self,
+        response: Response,
+        stop: Optional[Sequence[str]],
+        span: Optional[RequestSpan],
+    ) -> List[dict]:
+        """One output per choice of a response, timing the parse on the span"""
+        parse_start = time.perf_counter()
+        choices = self.postprocess_choices(response, stop=stop)
+        if span is not None:
+            span.parse_seconds = time.perf_counter() - parse_start
+            span.mark("parse")
+        outputs = [msg for _, msg, _ in choices]
+        ## the usage covers the whole response, report it once
+        for output in outputs[1:]:
+            output.pop("token_usage", None)
+        return outputs
+
+    @staticmethod
+    def _fallback_payloads(payload: dict, missing: int) -> List[dict]:
+        """Single-choice payloads requesting the choices an endpoint left out"""
+        single_payload = {k: v for k, v in payload.items() if k != "n"}
+        ## the same seed would sample the same completion again
+        seed = payload.get("seed")
+        return [
+            single_payload if seed is None else {**single_payload, "seed": seed + i}
+            for i in range(1, missing + 1)
+        ]
+
+    @staticmethod
+    def _merge_generations(outputs: List[dict], extra: List[dict]) -> List[dict]:
+        """
+        outputs followed by extra, with the usage reported by any of them summed
+        on the first output
+        """
+        usage: Dict[str, Any] = {}
+        for out in outputs[:1] + extra:
+            for k, v in (out.pop("token_usage", None) or {}).items():
+                if isinstance(v, (int, float)):
+                    usage[k] = usage.get(k, 0) + v
+        if usage:
+            outputs[0]["token_usage"] = usage
+        return outputs + extra
+
     def postprocess(
         self, response: Union[str, Response], stop: Optional[Sequence[str]] = None
     ) -> Tuple[dict, bool]:
@@ -392,8 +993,32 @@ class NVEModel(BaseModel):
         msg, is_stopped = self._early_stop_msg(msg, is_stopped, stop=stop)
         return msg, is_stopped
 
-    def _aggregate_msgs(self, msg_list: Sequence[dict]) -> Tuple[dict, bool]:
-        """Dig out relevant details of aggregated message"""
+    def postprocess_choices(
+        self, response: Union[str, Response], stop: Optional[Sequence[str]] = None
+    ) -> List[Tuple[int, dict, bool]]:
+        """Like `postprocess`, but yields (index, msg, is_stopped) for every choice."""
+        msg_list = self._process_response(response)
+        outputs = []
+        for index in self._choice_indices(msg_list):
+            msg, is_stopped = self._aggregate_msgs(msg_list, index=index)
+            msg, is_stopped = self._early_stop_msg(msg, is_stopped, stop=stop)
+            outputs.append((index, msg, is_stopped))
+        return outputs
+
+    @staticmethod
+    def _choice_indices(msg_list: Sequence[dict]) -> List[int]:
+        """Sorted choice indices found in the messages, [0] if there are none"""
+        indices = {
+            choice.get("index", 0)
+            for msg in msg_list
+            for choice in msg.get("choices", None) or []
+        }
+        return sorted(indices) or [0]
+
+    def _aggregate_msgs(
+        self, msg_list: Sequence[dict], index: int = 0
+    ) -> Tuple[dict, bool]:
+        """Dig out relevant details of aggregated message for a choice index"""
         content_buffer: Dict[str, Any] = dict()
         content_holder: Dict[Any, Any] = dict()
         usage_holder: Dict[Any, Any] = dict()  ####
@@ -401,8 +1026,16 @@ class NVEModel(BaseModel):
         for msg in msg_list:
             usage_holder = msg.get("usage", {})  ####
             if "choices" in msg:
-                ## Tease out ['choices'][0]...['delta'/'message']
-                msg = msg.get("choices", [{}])[0]
+                ## Tease out ['choices'][index]...['delta'/'message']
+                ## (deltas of other choices are never merged into this one)
+                choices = [
+                    choice
+                    for choice in msg.get("choices", None) or []
+                    if choice.get("index", 0) == index
+                ]
+                if not choices:
+                    continue
+                msg = choices[0]
                 is_stopped = msg.get("finish_reason", "") == "stop"
                 msg = msg.get("delta", msg.get("message", msg.get("text", "")))
                 if not isinstance(msg, dict):
@@ -438,6 +1071,56 @@ class NVEModel(BaseModel):
     ####################################################################################
     ## Streaming interface to allow you to iterate through progressive generations
 
+    def _postprocess_stream_line(
+        self,
+        line: bytes,
+        state: _StreamState,
+        stop: Optional[Sequence[str]] = None,
+    ) -> List[dict]:
+        """Messages carried by one line of a stream, skipping finished choices"""
+        msgs: List[dict] = []
+        if not line or line.strip() == b"data: [DONE]":
+            return msgs
+        for index, msg, is_stopped in self.postprocess_choices(
+            line.decode("utf-8"), stop=stop
+        ):
+            if "token_usage" in msg:
+                state.has_usage = True
+            if index in state.stopped:
+                ## usage trails the final delta (`stream_options.include_usage`)
+                if "token_usage" in msg:
+                    msgs.append({"token_usage": msg["token_usage"]})
+                continue
+            if state.n > 1:
+                ## tag deltas so multi-choice consumers can demux
+                msg["index"] = index
+            msgs.append(msg)
+            if is_stopped:
+                state.stopped.add(index)
+        return msgs
+
+    def _parse_stream_line(
+        self,
+        line: bytes,
+        state: _StreamState,
+        stop: Optional[Sequence[str]],
+        metrics: Optional[_RequestMetrics],
+        span: Optional[RequestSpan],
+    ) -> List[dict]:
+        """`_postprocess_stream_line`, accounting for the line in metrics and trace"""
+        if metrics is None and span is None:
+            return self._postprocess_stream_line(line, state, stop=stop)
+        parse_start = time.perf_counter()
+        msgs = self._postprocess_stream_line(line, state, stop=stop)
+        if span is not None:
+            span.parse_seconds += time.perf_counter() - parse_start
+            span.response_bytes = (span.response_bytes or 0) + len(line)
+            if "first_token" not in span.phases and any(m.get("content") for m in msgs):
+                span.mark("first_token")
+        if metrics is not None:
+            metrics.stream_line(line, msgs)
+        return msgs
+
     def get_req_stream(
         self,
         payload: dict = {},
@@ -447,32 +1130,295 @@ class NVEModel(BaseModel):
         invoke_url = self._get_invoke_url(invoke_url)
         if payload.get("stream", True) is False:
             payload = {**payload, "stream": True}
-        self.last_inputs = {
-            "url": invoke_url,
-            "headers": self.headers["stream"],
-            "json": self.payload_fn(payload),
-            "stream": True,
-        }
-
-        response = self.get_session_fn().post(
-            **self.__add_authorization(deepcopy(self.last_inputs))
-        )
-        self._try_raise(response)
+        replica, url = self._route(invoke_url)
+        span: Optional[RequestSpan] = None
+        try:
+            self.last_inputs = inputs = {
+                "url": url,
+                "headers": self.headers["stream"],
+                "json": self.payload_fn(payload),
+                "stream": True,
+            }
+
+            metrics = _request_metrics(payload, invoke_url)
+            span = _request_span(payload, url, stream=True)
+            request = self.__prepare_request(inputs)
+            deadline = self._deadline()
+            if span is not None:
+                span.request_bytes = len(request["data"])
+                span.mark("send")
+            response, request = self._send(
+                inputs, request, self._first_byte_timeout(deadline)
+            )
+            if span is not None:
+                span.request_bytes = len(request["data"])
+                self._trace_response(span, response)
+            self._try_raise(response)
+            self._set_read_timeout(response, self._idle_timeout(deadline))
+        except Exception as e:
+            if span is not None:
+                span.end(error=e)
+            self._release(invoke_url, replica, None, e)
+            raise
+        latency = response.elapsed.total_seconds()
         call = self.copy()
 
         def out_gen() -> Generator[dict, Any, Any]:
             ## Good for client, since it allows self.last_inputs
-            for line in response.iter_lines():
-                if line and line.strip() != b"data: [DONE]":
-                    line = line.decode("utf-8")
-                    msg, final_line = call.postprocess(line, stop=stop)
-                    yield msg
-                    if final_line:
+            state = _StreamState(payload)
+            error: Optional[BaseException] = None
+            try:
+                for line in response.iter_lines():
+                    msgs = call._parse_stream_line(line, state, stop, metrics, span)
+                    yield from msgs
+                    if state.done:
                         break
-                self._try_raise(response)
+                    self._try_raise(response)
+                    if deadline is not None:
+                        self._set_read_timeout(response, self._idle_timeout(deadline))
+            except requests.exceptions.ConnectionError as e:
+                ## reads are cut short at the deadline, report those as such
+                if deadline is None or time.monotonic() < deadline:
+                    error = e
+                    raise
+                error = self._deadline_error()
+                raise error from e
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                if error is not None:
+                    ## the connection is in an unknown state, do not reuse it
+                    response.close()
+                if metrics is not None:
+                    metrics.finish(len(request["data"]))
+                if span is not None:
+                    span.mark("last_byte")
+                    span.end(error=error)
+                self._release(invoke_url, replica, latency, error)
 
         return (r for r in out_gen())
 
+    ####################################################################################
+    ## Asynchronous generation interface, on the async sessions of the streams
+
+    def _get_asemaphore(self) -> asyncio.Semaphore:
+        """
+        Return the semaphore bounding the requests of this client in flight on the
+        running event loop to `max_connections`, like its connection pool does for
+        synchronous requests.
+        """
+        loop = asyncio.get_running_loop()
+        if self._asemaphore is None or self._asemaphore[0] is not loop:
+            self._asemaphore = (loop, asyncio.Semaphore(self.max_connections))
+        return self._asemaphore[1]
+
+    async def _aread(
+        self, method: Callable, request: dict, deadline: Optional[float]
+    ) -> Response:
+        """
+        Send a request with a method of an async session and read all of its
+        response, returned as a `requests.Response` so that raising and parsing
+        are shared with synchronous requests.
+        """
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self._timeouts.connect)
+        start = time.perf_counter()
+        result = await _wait_for(
+            method(**request, timeout=timeout),
+            self._first_byte_timeout(deadline)[1],
+            "response headers",
+        )
+        async with result:
+            elapsed = time.perf_counter() - start
+            content = await _wait_for(
+                result.read(), self._first_byte_timeout(deadline)[1], "response body"
+            )
+        response = Response()
+        response.status_code = result.status
+        response.headers = CaseInsensitiveDict(result.headers)
+        response.url = request["url"]
+        response.elapsed = timedelta(seconds=elapsed)
+        response._content = content
+        return response
+
+    async def _apost(
+        self,
+        session: Any,
+        invoke_url: str,
+        payload: dict,
+        span: Optional[RequestSpan] = None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[Response, dict]:
+        """`_post` through an async session, returns the response and the request"""
+        replica, url = self._route(invoke_url)
+        try:
+            self.last_inputs = inputs = {
+                "url": url,
+                "headers": self.headers["call"],
+                "json": self.payload_fn(payload),
+            }
+            request = self.__prepare_request(inputs)
+            if span is not None:
+                span.url = url
+                span.request_bytes = len(request["data"])
+                span.mark("send")
+            response = await self._aread(session.post, request, deadline)
+            retry = self._renegotiate(
+                inputs, request, response.status_code, response.headers
+            )
+            if retry is not None:
+                request = retry
+                if span is not None:
+                    span.request_bytes = len(request["data"])
+                response = await self._aread(session.post, request, deadline)
+            self.last_response = response
+            if span is not None:
+                self._trace_response(span, response)
+            self._try_raise(response)
+        except Exception as e:
+            self._release(invoke_url, replica, None, e)
+            raise
+        self._release(invoke_url, replica, response.elapsed.total_seconds(), None)
+        return response, request
+
+    async def _await(
+        self,
+        response: Response,
+        session: Any,
+        span: Optional[RequestSpan] = None,
+        deadline: Optional[float] = None,
+    ) -> Response:
+        """`_wait` through an async session"""
+        if deadline is None:
+            deadline = self._deadline()
+        poll_deadline = self._poll_deadline(deadline)
+        while response.status_code == 202:
+            await asyncio.sleep(self.interval)
+            if time.monotonic() > poll_deadline:
+                raise TimeoutError(
+                    f"Timeout reached without a successful response."
+                    f"\nLast response: {str(response)}"
+                )
+            assert "NVCF-REQID" in response.headers, (
+                "Received 202 response with no request id to follow"
+            )
+            request_id = response.headers.get("NVCF-REQID")
+            poll = {
+                "url": self.polling_endpoint.format(request_id=request_id),
+                "headers": self.headers["call"],
+            }
+            self.last_response = response = await self._aread(
+                session.get, poll, deadline
+            )
+            if span is not None:
+                span.polls += 1
+                span.record_response(response.status_code, response.headers)
+                span.mark("poll", status_code=response.status_code)
+        self._try_raise(response)
+        return response
+
+    async def _arequest(
+        self,
+        payload: dict,
+        invoke_url: str,
+        span: Optional[RequestSpan] = None,
+    ) -> Response:
+        """
+        `_request` through an async session, with at most `max_connections`
+        requests of this client in flight on the event loop. Requests are not
+        hedged.
+        """
+        metrics = _request_metrics(payload, invoke_url)
+        deadline = self._deadline()
+        session_kwargs = {}
+        if span is not None:
+            session_kwargs["trace_configs"] = [_aiohttp_trace_config(span)]
+        async with self._get_asemaphore():
+            async with self._get_asession(**session_kwargs) as session:
+                response, request = await self._apost(
+                    session, invoke_url, payload, span, deadline
+                )
+                queued_at = time.perf_counter() if response.status_code == 202 else None
+                response = await self._await(response, session, span, deadline)
+        if span is not None:
+            span.response_bytes = len(response.content)
+            span.mark("last_byte")
+        if metrics is not None:
+            if queued_at is not None:
+                metrics.observe("queue_time_seconds", time.perf_counter() - queued_at)
+            metrics.finish(len(request["data"]), len(response.content))
+        return response
+
+    async def aget_req(
+        self,
+        payload: dict = {},
+        invoke_url: Optional[str] = None,
+    ) -> Response:
+        """Asynchronously post to the API."""
+        invoke_url = self._get_invoke_url(invoke_url)
+        if payload.get("stream", False) is True:
+            payload = {**payload, "stream": False}
+        span = _request_span(payload, invoke_url, stream=False)
+        if span is None:
+            return await self._arequest(payload, invoke_url)
+        try:
+            return await self._arequest(payload, invoke_url, span)
+        except Exception as e:
+            span.end(error=e)
+            raise
+        finally:
+            span.end()
+
+    async def aget_req_generation(
+        self,
+        payload: dict = {},
+        invoke_url: Optional[str] = None,
+        stop: Optional[Sequence[str]] = None,
+    ) -> dict:
+        """Asynchronous `get_req_generation`"""
+        invoke_url = self._get_invoke_url(invoke_url)
+        response = await self.aget_req(payload, invoke_url)
+        output, _ = self.postprocess(response, stop=stop)
+        return output
+
+    async def aget_req_generations(
+        self,
+        payload: dict = {},
+        invoke_url: Optional[str] = None,
+        stop: Optional[Sequence[str]] = None,
+    ) -> List[dict]:
+        """
+        Asynchronous `get_req_generations`, the missing choices are requested
+        concurrently on the event loop.
+        """
+        invoke_url = self._get_invoke_url(invoke_url)
+        if payload.get("stream", False) is True:
+            payload = {**payload, "stream": False}
+        metrics = _request_metrics(payload, invoke_url)
+        span = _request_span(payload, invoke_url, stream=False)
+        try:
+            response = await self._arequest(payload, invoke_url, span)
+            outputs = self._parse_generations(response, stop, span)
+        except Exception as e:
+            if span is not None:
+                span.end(error=e)
+            raise
+        if span is not None:
+            span.end()
+        if metrics is not None:
+            usage = outputs[0].get("token_usage") or {}
+            metrics.throughput(usage.get("completion_tokens"))
+        missing = (payload.get("n") or 1) - len(outputs)
+        if missing > 0:
+            extra = await asyncio.gather(
+                *(
+                    self.aget_req_generation(extra_payload, invoke_url, stop=stop)
+                    for extra_payload in self._fallback_payloads(payload, missing)
+                )
+            )
+            outputs = self._merge_generations(outputs, list(extra))
+        return outputs
+
     ####################################################################################
     ## Asynchronous streaming interface to allow multiple generations to happen at once.
 
@@ -485,24 +1431,136 @@ class NVEModel(BaseModel):
         invoke_url = self._get_invoke_url(invoke_url)
         if payload.get("stream", True) is False:
             payload = {**payload, "stream": True}
-        self.last_inputs = {
-            "url": invoke_url,
-            "headers": self.headers["stream"],
-            "json": self.payload_fn(payload),
-        }
-
-        async with self.get_asession_fn() as session:
-            async with session.post(
-                **self.__add_authorization(deepcopy(self.last_inputs))
-            ) as response:
-                self._try_raise(response)
-                async for line in response.content.iter_any():
-                    if line and line.strip() != b"data: [DONE]":
-                        line = line.decode("utf-8")
-                        msg, final_line = self.postprocess(line, stop=stop)
-                        yield msg
-                        if final_line:
+        replica, url = self._route(invoke_url)
+        try:
+            self.last_inputs = inputs = {
+                "url": url,
+                "headers": self.headers["stream"],
+                "json": self.payload_fn(payload),
+            }
+
+            metrics = _request_metrics(payload, invoke_url)
+            span = _request_span(payload, url, stream=True)
+            request = self.__prepare_request(inputs)
+        except Exception as e:
+            self._release(invoke_url, replica, None, e)
+            raise
+        session_kwargs = {}
+        if span is not None:
+            session_kwargs["trace_configs"] = [_aiohttp_trace_config(span)]
+            span.request_bytes = len(request["data"])
+            span.mark("send")
+        ## first byte and idle timeouts are enforced around each await below
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self._timeouts.connect)
+        deadline = self._deadline()
+        error: Optional[BaseException] = None
+        latency: Optional[float] = None
+        start = time.perf_counter()
+        try:
+            async with self._get_asession(**session_kwargs) as session:
+                response = await _wait_for(
+                    session.post(**request, timeout=timeout),
+                    self._first_byte_timeout(deadline)[1],
+                    "response headers",
+                )
+                retry = self._renegotiate(
+                    inputs, request, response.status, response.headers
+                )
+                if retry is not None:
+                    async with response:
+                        pass
+                    request = retry
+                    if span is not None:
+                        span.request_bytes = len(request["data"])
+                    response = await _wait_for(
+                        session.post(**request, timeout=timeout),
+                        self._first_byte_timeout(deadline)[1],
+                        "response headers",
+                    )
+                async with response:
+                    latency = time.perf_counter() - start
+                    if span is not None:
+                        span.mark("first_byte")
+                        span.record_response(response.status, response.headers)
+                    self._try_raise(response)
+                    state = _StreamState(payload)
+                    while line := await _wait_for(
+                        response.content.readany(),
+                        self._idle_timeout(deadline),
+                        "response chunk",
+                    ):
+                        for msg in self._parse_stream_line(
+                            line, state, stop, metrics, span
+                        ):
+                            yield msg
+                        if state.done:
                             break
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if metrics is not None:
+                metrics.finish(len(request["data"]))
+            if span is not None:
+                span.mark("last_byte")
+                span.end(error=error)
+            self._release(invoke_url, replica, latency, error)
+
+
+class _NVIDIAClientOptions(BaseModel):
+    """
+    Transport options shared by ChatNVIDIA, NVIDIAEmbeddings and NVIDIARerank.
+
+    - load_balancer: spread requests over several replicas of a local NIM,
+        `base_url` defaults to the first replica.
+    - circuit_breaker: raise `CircuitOpenError` at once, instead of sending
+        requests, while the endpoint is failing or slow.
+    - timeouts: connect, first byte, idle (between streamed chunks) and total
+        timeouts of a request.
+    - http2: multiplex requests and streams over few connections, requires
+        the `http2` extra, `pip install "langchain-nvidia-ai-endpoints[http2]"`.
+    - compression: "gzip" or "zstd", compress request bodies of at least
+        `compression_threshold` bytes (16384 by default), e.g. inlined images.
+        "zstd" requires `pip install zstandard`.
+    """
+
+    load_balancer: Optional[LoadBalancer] = Field(
+        None, description="Balancer over several replicas of a local NIM"
+    )
+    circuit_breaker: Optional[CircuitBreaker] = Field(
+        None, description="Fails requests fast while the endpoint is unhealthy"
+    )
+    timeouts: Optional[Timeouts] = Field(
+        None, description="Timeouts for each phase of a request"
+    )
+    http2: bool = Field(
+        False, description="Multiplex requests over HTTP/2, requires httpx[http2]"
+    )
+    compression: Optional[Literal["gzip", "zstd"]] = Field(
+        None, description="Encoding of large request bodies, zstd requires zstandard"
+    )
+    compression_threshold: int = Field(
+        16384, ge=0, description="Size from which request bodies are compressed (B)"
+    )
+
+    @root_validator(pre=True)
+    def _default_base_url(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+        balancer = values.get("load_balancer")
+        if isinstance(balancer, LoadBalancer) and "base_url" not in values:
+            values["base_url"] = balancer.base_urls[0]
+        return values
+
+    @property
+    def _client_options(self) -> Dict[str, Any]:
+        """Arguments of the _NVIDIAClient that carry the transport options"""
+        return {
+            "load_balancer": self.load_balancer,
+            "circuit_breaker": self.circuit_breaker,
+            "timeouts": self.timeouts,
+            "http2": self.http2,
+            "compression": self.compression,
+            "compression_threshold": self.compression_threshold,
+        }
 
 
 class _NVIDIAClient(BaseModel):
@@ -0,0 +1,156 @@
+"""Client-side load balancing across replicas of a self-hosted NIM."""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, List, Literal, Optional
+from urllib.parse import urlparse
+
+from langchain_core.pydantic_v1 import BaseModel, Field, PrivateAttr, validator
+
+"""
+### **Load Balancing**
+
+A `LoadBalancer` spreads requests over several replicas serving the same model.
+Each request goes to the healthy replica with the fewest requests in flight
+(`least_outstanding`), or with the lowest latency estimate weighted by requests in
+flight (`ewma`). A replica that fails `max_failures` requests in a row (connection
+errors, HTTP 429 and 5xx) is ejected for `ejection_time` seconds, then re-admitted;
+a failure right after re-admission ejects it again.
+
+```
+from langchain_nvidia_ai_endpoints import ChatNVIDIA
+from langchain_nvidia_ai_endpoints.balancing import LoadBalancer
+
+llm = ChatNVIDIA(
+    model="meta/llama3-8b-instruct",
+    load_balancer=LoadBalancer(
+        base_urls=["http://nim-0:8000/v1", "http://nim-1:8000/v1"],
+        strategy="ewma",
+    ),
+)
+```
+"""
+
+
+class _Replica:
+    """Health and load of one replica"""
+
+    __slots__ = ("url", "outstanding", "latency", "failures", "ejected_until")
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.outstanding = 0
+        self.latency: Optional[float] = None
+        self.failures = 0
+        self.ejected_until = 0.0
+
+
+class _BalancerState:
+    """Replica statistics, shared by all copies of a balancer"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.replicas: Dict[str, _Replica] = {}
+        self.turn = 0
+
+
+class LoadBalancer(BaseModel):
+    """
+    Picks a replica for every request and tracks replica health passively, from
+    the outcome of the requests themselves.
+    """
+
+    base_urls: List[str] = Field(..., min_items=1, description="Replica base urls")
+    strategy: Literal["least_outstanding", "ewma"] = Field("least_outstanding")
+    ewma_weight: float = Field(
+        0.3, gt=0, le=1, description="Weight of the newest latency in the average"
+    )
+    max_failures: int = Field(3, ge=1, description="Consecutive failures to eject")
+    ejection_time: float = Field(30.0, ge=0, description="Seconds out of rotation")
+
+    _state: _BalancerState = PrivateAttr(default_factory=_BalancerState)
+
+    @validator("base_urls", each_item=True)
+    def _validate_base_url(cls, v: str) -> str:
+        result = urlparse(v)
+        if not (result.scheme and result.netloc):
+            raise ValueError(
+                f"Invalid base_url, minimally needs scheme and netloc: {v}"
+            )
+        return v.rstrip("/")
+
+    def __getstate__(self) -> Dict[Any, Any]:
+        ## replica statistics are runtime state, not configuration
+        state = super().__getstate__()
+        state["__private_attribute_values__"] = {}
+        return state
+
+    def __setstate__(self, state: Dict[Any, Any]) -> None:
+        super().__setstate__(state)
+        self._init_private_attributes()
+
+    @property
+    def replicas(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of the load and health of every replica"""
+        now = time.monotonic()
+        with self._state.lock:
+            return {
+                url: {
+                    "outstanding": replica.outstanding,
+                    "latency": replica.latency,
+                    "failures": replica.failures,
+                    "ejected": replica.ejected_until > now,
+                }
+                for url, replica in self._state.replicas.items()
+                if url in self.base_urls
+            }
+
+    def acquire(self) -> str:
+        """Pick the base url of a replica and count a request in flight on it"""
+        state = self._state
+        now = time.monotonic()
+        with state.lock:
+            replicas = [
+                state.replicas.setdefault(url, _Replica(url)) for url in self.base_urls
+            ]
+            candidates = [r for r in replicas if r.ejected_until <= now]
+            if not candidates:
+                ## everything is ejected, try the replica that returns soonest
+                candidates = [min(replicas, key=lambda r: r.ejected_until)]
+            ## rotate the candidates so ties are broken round-robin
+            state.turn = (state.turn + 1) % len(candidates)
+            candidates = candidates[state.turn :] + candidates[: state.turn]
+            if self.strategy == "ewma":
+                ## unmeasured replicas score 0 so that each gets measured
+                replica = min(
+                    candidates, key=lambda r: (r.latency or 0.0) * (r.outstanding + 1)
+                )
+            else:
+                replica = min(candidates, key=lambda r: r.outstanding)
+            replica.outstanding += 1
+            return replica.url
+
+    def release(self, base_url: str, latency: Optional[float], ok: bool) -> None:
+        """Record the outcome of a request to a replica returned by `acquire`"""
+        state = self._state
+        with state.lock:
+            if (replica := state.replicas.get(base_url)) is None:
+                return
+            replica.outstanding = max(replica.outstanding - 1, 0)
+            if ok:
+                replica.failures = 0
+                if latency is not None:
+                    replica.latency = (
+                        latency
+                        if replica.latency is None
+                        else self.ewma_weight * latency
+                        + (1 - self.ewma_weight) * replica.latency
+                    )
+            else:
+                ## failures are not reset on ejection, so a replica that fails
+                ## again right after re-admission is ejected at once
+                replica.failures += 1
+                if replica.failures >= self.max_failures:
+                    replica.ejected_until = time.monotonic() + self.ejection_time
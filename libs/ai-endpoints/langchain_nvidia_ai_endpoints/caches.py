@@ -0,0 +1,187 @@
+"""Response caches for ChatNVIDIA."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from copy import deepcopy
+from typing import Callable, Iterator, List, Optional, Tuple
+
+"""
+### **Response Caching**
+
+Evaluation and regression jobs often replay identical prompts with a fixed `seed`
+or `temperature=0`. A response cache short-circuits those calls. The cache key is a
+canonical hash of the endpoint url and the request payload (model, messages,
+sampling parameters, stop words), so any change to the request, or sending it to
+another endpoint, is a cache miss.
+
+```
+from langchain_nvidia_ai_endpoints import ChatNVIDIA
+from langchain_nvidia_ai_endpoints.caches import (
+    InMemoryResponseCache,
+    SQLiteResponseCache,
+)
+
+## LRU in-memory cache, entries expire after an hour
+llm = ChatNVIDIA(response_cache=InMemoryResponseCache(maxsize=1024, ttl=3600))
+
+## Persistent cache shared across processes and runs
+llm = ChatNVIDIA(response_cache=SQLiteResponseCache("responses.db"))
+
+llm.invoke("Tell me a joke")  # hits the endpoint
+llm.invoke("Tell me a joke")  # served from the cache
+[chunk for chunk in llm.stream("Tell me a joke")]  # replayed from the cache
+```
+"""
+
+## Payload fields that change the transport, not the response
+_TRANSPORT_KEYS = ("stream", "stream_options")
+
+
+def get_cache_key(payload: dict, invoke_url: str) -> str:
+    """
+    Canonical hash of a request payload and the url it is posted to, independent
+    of key order and streaming.
+    """
+    canonical = {k: v for k, v in payload.items() if k not in _TRANSPORT_KEYS}
+    serialized = json.dumps(
+        {"url": invoke_url, "payload": canonical},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class BaseResponseCache(ABC):
+    """
+    Interface for ChatNVIDIA response caches.
+
+    Values are the list of output dicts of a request, one per choice. Caches must
+    hand out copies so callers can mutate what they receive. Expiry is measured
+    with `clock`, `time.time` by default.
+    """
+
+    def __init__(
+        self, ttl: Optional[float] = None, clock: Callable[[], float] = time.time
+    ) -> None:
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"ttl must be positive, given: {ttl}")
+        self.ttl = ttl
+        self.clock = clock
+
+    def _expires_at(self) -> Optional[float]:
+        return self.clock() + self.ttl if self.ttl is not None else None
+
+    @abstractmethod
+    def lookup(self, key: str) -> Optional[List[dict]]:
+        """Return the cached outputs for a key, or None if missing or expired."""
+
+    @abstractmethod
+    def update(self, key: str, value: List[dict]) -> None:
+        """Store the outputs for a key."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop all entries."""
+
+
+class InMemoryResponseCache(BaseResponseCache):
+    """Thread-safe LRU cache kept in process memory."""
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        super().__init__(ttl=ttl, clock=clock)
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, given: {maxsize}")
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, Tuple[Optional[float], List[dict]]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: str) -> Optional[List[dict]]:
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return deepcopy(value)
+
+    def update(self, key: str, value: List[dict]) -> None:
+        entry = (self._expires_at(), deepcopy(value))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteResponseCache(BaseResponseCache):
+    """Persistent cache stored in a local SQLite database."""
+
+    def __init__(
+        self,
+        database_path: str = ".langchain_nvidia_responses.db",
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        super().__init__(ttl=ttl, clock=clock)
+        self.database_path = database_path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses"
+                " (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection in a transaction, closed on exit"""
+        # a connection per operation keeps the cache usable from any thread
+        with closing(sqlite3.connect(self.database_path, timeout=30)) as conn, conn:
+            yield conn
+
+    def lookup(self, key: str) -> Optional[List[dict]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at < self.clock():
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+        return json.loads(value)
+
+    def update(self, key: str, value: List[dict]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (key, json.dumps(value), self._expires_at()),
+            )
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import logging
 import threading
+import weakref
 from collections import defaultdict
 from contextlib import contextmanager
 from contextvars import ContextVar
@@ -24,8 +25,11 @@ track token information similar to `get_openai_callback`. Additionally, you can
 custom price mappings as necessary (`price_map` argument), or provide a custom callback
 manager for advanced use-cases (`callback` argument).
 
-**NOTE:** This feature is currently not supported in streaming modes, but works fine
-for non-streaming `invoke/ainvoke` queries.
+Streaming (`stream/astream`) is tracked too: by default (`stream_usage=True`),
+`ChatNVIDIA` requests usage with the final streamed event and reports it once the stream
+ends. With `stream_usage=False`, for endpoints that reject `stream_options`, or if the
+endpoint does not report usage, completion tokens are estimated as one per streamed
+delta.
 
 ```
 from langchain_nvidia_ai_endpoints import ChatNVIDIA, NVIDIAEmbeddings
@@ -49,12 +53,10 @@ with get_usage_callback(price_map=price_map) as cb:
 
     llm_large.invoke("Tell me a joke")
     print(cb, end="\n\n")
-    # llm_large.invoke("Tell me a short joke")
-    # print(cb, end="\n\n")
-    # ## Tracking through streaming coming soon
-    # [_ for _ in llm_small.stream("Tell me a joke")]
-    # print(cb, end="\n[Should not change yet]\n\n")
-    ## Tracking for streaming supported
+    ## Tracking through streaming
+    [_ for _ in llm_small.stream("Tell me a joke")]
+    print(cb, end="\n\n")
+    ## Tracking for embeddings supported
     embedding.embed_query("What a nice day :D")
     print(cb, end="\n\n")
     # ## Sanity check. Should still be tracked fine
@@ -72,6 +74,24 @@ cb.model_usage
 DEFAULT_MODEL_COST_PER_1K_TOKENS: Dict[str, float] = {}
 
 
+def _new_usage() -> Dict[str, Any]:
+    return {
+        "total_tokens": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "successful_requests": 0,
+        "total_cost": 0.0,
+    }
+
+
+def _merge_usage(merged: defaultdict, shard: defaultdict) -> None:
+    """Add the per-model statistics of a shard to merged."""
+    for model_name, usage in list(shard.items()):
+        base = merged[model_name]
+        for key, value in list(usage.items()):
+            base[key] += value
+
+
 def standardize_model_name(
     model_name: str,
     price_map: dict = {},
@@ -143,22 +163,27 @@ def get_token_cost_for_model(
     return price_map[model_name] * (num_tokens / 1000)
 
 
+class _ShardOwner:
+    """Owns a thread's shard from its thread-local storage, so it is collected
+    when the thread ends."""
+
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self, shard: defaultdict) -> None:
+        self.shard = shard
+
+
+def _retire_shard(
+    handler_ref: weakref.ref, shard: defaultdict, generation: int
+) -> None:
+    if (handler := handler_ref()) is not None:
+        handler._retire_shard(shard, generation)
+
+
 class UsageCallbackHandler(BaseCallbackHandler):
     """Callback Handler that tracks OpenAI info."""
 
-    ## Per-model statistics
-    _model_usage: defaultdict = defaultdict(
-        lambda: {
-            "total_tokens": 0,
-            "prompt_tokens": 0,
-            "completion_tokens": 0,
-            "successful_requests": 0,
-            "total_cost": 0.0,
-        }
-    )
-
-    llm_output: dict = {}
-    price_map: dict = {k: v for k, v in DEFAULT_MODEL_COST_PER_1K_TOKENS.items()}
+    price_map: dict
 
     ## Aggregate statistics, compatible with OpenAICallbackHandler
     @property
@@ -188,26 +213,85 @@ class UsageCallbackHandler(BaseCallbackHandler):
 
     def __init__(self) -> None:
         super().__init__()
-        self._lock = threading.Lock()
+        self.price_map = {k: v for k, v in DEFAULT_MODEL_COST_PER_1K_TOKENS.items()}
+        ## Per-model statistics are sharded per thread: on_llm_end only ever
+        ## touches the calling thread's shard, so it needs no lock. Shards are
+        ## merged when read, and folded into `_retired` when their thread ends.
+        ## The lock guards shard registration, retirement, reads and reset.
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._shards: Dict[int, defaultdict] = {}
+        self._retired: defaultdict = defaultdict(_new_usage)
+        self._generation = 0
+
+    @property
+    def llm_output(self) -> dict:
+        """Output of the calling thread's current request, set by ChatNVIDIA."""
+        return getattr(self._local, "llm_output", None) or {}
+
+    @llm_output.setter
+    def llm_output(self, value: dict) -> None:
+        self._local.llm_output = value
 
     def __repr__(self) -> str:
+        usage = self._model_usage["total"]
         return (
-            f"Tokens Used: {self.total_tokens}\n"
-            f"\tPrompt Tokens: {self.prompt_tokens}\n"
-            f"\tCompletion Tokens: {self.completion_tokens}\n"
-            f"Successful Requests: {self.successful_requests}\n"
-            f"Total Cost (USD): ${self.total_cost:.8g}"
+            f"Tokens Used: {usage['total_tokens']}\n"
+            f"\tPrompt Tokens: {usage['prompt_tokens']}\n"
+            f"\tCompletion Tokens: {usage['completion_tokens']}\n"
+            f"Successful Requests: {usage['successful_requests']}\n"
+            f"Total Cost (USD): ${usage['total_cost']:.8g}"
         )
 
+    def _get_shard(self) -> defaultdict:
+        """The calling thread's shard, registered on first use after a reset."""
+        local = self._local
+        if getattr(local, "generation", None) != self._generation:
+            with self._lock:
+                shard: defaultdict = defaultdict(_new_usage)
+                local.owner = _ShardOwner(shard)
+                local.generation = self._generation
+                self._shards[id(shard)] = shard
+                weakref.finalize(
+                    local.owner,
+                    _retire_shard,
+                    weakref.ref(self),
+                    shard,
+                    self._generation,
+                )
+        return local.owner.shard
+
+    def _retire_shard(self, shard: defaultdict, generation: int) -> None:
+        """Fold the shard of an ended thread into the retired statistics."""
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._shards.pop(id(shard), None)
+            _merge_usage(self._retired, shard)
+
+    @property
+    def _model_usage(self) -> defaultdict:
+        """Per-model statistics merged across all shards."""
+        merged: defaultdict = defaultdict(_new_usage)
+        with self._lock:
+            for shard in [self._retired, *self._shards.values()]:
+                _merge_usage(merged, shard)
+        for usage in merged.values():
+            for key in usage.keys():
+                usage[key] = round(usage[key], 10)
+        return merged
+
     @property
     def model_usage(self) -> dict:
-        """Whether to call verbose callbacks even if verbose is False."""
+        """Per-model statistics, plus the aggregate under the "total" key."""
         return dict(self._model_usage)
 
     def reset(self) -> None:
         """Reset the model usage."""
         with self._lock:
-            self._model_usage.clear()
+            self._shards = {}
+            self._retired = defaultdict(_new_usage)
+            self._generation += 1
 
     @property
     def always_verbose(self) -> bool:
@@ -225,13 +309,22 @@ class UsageCallbackHandler(BaseCallbackHandler):
     def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
         if not response.llm_output:
             response.llm_output = {}
+            # streamed generations carry their usage in the generation_info
+            generation_info = (
+                response.generations[0][0].generation_info
+                if response.generations and response.generations[0]
+                else None
+            )
+            if generation_info and "token_usage" in generation_info:
+                response.llm_output = {**generation_info}
         if not self.llm_output:
             self.llm_output = {}
 
         response.llm_output = {**self.llm_output, **response.llm_output}
         self.llm_output = {}
 
-        if not response.llm_output:
+        if not response.llm_output or response.llm_output.get("cached"):
+            # cache hits spend no tokens
             return None
 
         # compute tokens and cost for this request
@@ -252,16 +345,14 @@ class UsageCallbackHandler(BaseCallbackHandler):
             completion_cost = 0
             prompt_cost = 0
 
-        # update shared state behind lock
-        with self._lock:
-            for base in (self._model_usage["total"], self._model_usage[model_name]):
-                base["total_tokens"] += token_usage.get("total_tokens", 0)
-                base["prompt_tokens"] += prompt_tokens
-                base["completion_tokens"] += completion_tokens
-                base["total_cost"] += prompt_cost + completion_cost
-                base["successful_requests"] += 1
-                for key in base.keys():
-                    base[key] = round(base[key], 10)
+        # update this thread's shard, no other thread writes to it
+        shard = self._get_shard()
+        for base in (shard["total"], shard[model_name]):
+            base["total_tokens"] += token_usage.get("total_tokens", 0)
+            base["prompt_tokens"] += prompt_tokens
+            base["completion_tokens"] += completion_tokens
+            base["total_cost"] += prompt_cost + completion_cost
+            base["successful_requests"] += 1
 
     def __copy__(self) -> "UsageCallbackHandler":
         """Return a copy of the callback handler."""
@@ -21,6 +21,7 @@ from typing import (
     Sequence,
     Type,
     Union,
+    overload,
 )
 
 import requests
@@ -40,11 +41,13 @@ from langchain_core.outputs import (
     ChatResult,
 )
 from langchain_core.pydantic_v1 import BaseModel, Field, PrivateAttr
-from langchain_core.runnables import Runnable
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.config import get_config_list
 from langchain_core.tools import BaseTool
 
-from langchain_nvidia_ai_endpoints._common import _NVIDIAClient
+from langchain_nvidia_ai_endpoints._common import _NVIDIAClient, _NVIDIAClientOptions
 from langchain_nvidia_ai_endpoints._statics import Model
+from langchain_nvidia_ai_endpoints.caches import BaseResponseCache, get_cache_key
 
 _CallbackManager = Union[AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun]
 _DictOrPydanticClass = Union[Dict[str, Any], Type[BaseModel]]
@@ -59,6 +62,8 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+_ROLE_CONVERT = {"ai": "assistant", "human": "user"}
+
 
 def _is_url(s: str) -> bool:
     try:
@@ -115,7 +120,7 @@ def _url_to_b64_string(image_source: str) -> str:
         raise ValueError(f"Unable to process the provided image source: {e}")
 
 
-class ChatNVIDIA(BaseChatModel):
+class ChatNVIDIA(BaseChatModel, _NVIDIAClientOptions):
     """NVIDIA chat model.
 
     Example:
@@ -142,6 +147,20 @@ class ChatNVIDIA(BaseChatModel):
     top_p: Optional[float] = Field(description="Top-p for distribution sampling")
     seed: Optional[int] = Field(description="The seed for deterministic results")
     stop: Optional[Sequence[str]] = Field(description="Stop words (cased)")
+    n: Optional[int] = Field(
+        None, ge=1, description="Number of chat completions to generate per prompt"
+    )
+    stream_usage: bool = Field(
+        True, description="Request token usage at the end of streamed responses"
+    )
+    response_cache: Optional[BaseResponseCache] = Field(
+        None, description="Cache for responses, keyed by the endpoint and payload"
+    )
+    max_concurrency: Optional[int] = Field(
+        None,
+        ge=1,
+        description="Maximum number of concurrent requests for batch/abatch",
+    )
 
     def __init__(self, **kwargs: Any):
         """
@@ -162,17 +181,39 @@ class ChatNVIDIA(BaseChatModel):
             top_p (float): Top-p for distribution sampling.
             seed (int): A seed for deterministic results.
             stop (list[str]): A list of cased stop words.
+            n (int): Number of chat completions to generate per prompt. All of
+                     them are returned in `ChatResult.generations`. Streams
+                     carry a single completion, so `n` is not sent for them.
+            stream_usage (bool): Request token usage at the end of streamed
+                                 responses (`stream_options.include_usage`).
+                                 On by default, turn it off for endpoints that
+                                 reject `stream_options`; usage is then
+                                 estimated as one token per streamed delta.
+            response_cache (BaseResponseCache): Cache for responses, keyed by a hash
+                                   of the endpoint url and request payload.
+                                   Cached responses are replayed by `stream`
+                                   as a single chunk.
+            max_concurrency (int): Maximum number of concurrent requests made by
+                                   `batch` and `abatch`, and the size of the
+                                   connection pool. Defaults to the size of
+                                   the connection pool (32).
 
         API Key:
         - The recommended way to provide the API key is through the `NVIDIA_API_KEY`
             environment variable.
         """
         super().__init__(**kwargs)
+        pool: Dict[str, Any] = {}
+        if self.max_concurrency:
+            # size the connection pool so a full batch never waits on a connection
+            pool["max_connections"] = self.max_concurrency
         self._client = _NVIDIAClient(
             base_url=self.base_url,
             model=self.model,
             api_key=kwargs.get("nvidia_api_key", kwargs.get("api_key", None)),
             infer_path="{base_url}/chat/completions",
+            **self._client_options,
+            **pool,
         )
         # todo: only store the model in one place
         # the model may be updated to a newer name during initialization
@@ -208,11 +249,125 @@ class ChatNVIDIA(BaseChatModel):
         **kwargs: Any,
     ) -> ChatResult:
         inputs = self._custom_preprocess(messages)
-        responses = self._get_generation(inputs=inputs, stop=stop, **kwargs)
-        self._set_callback_out(responses, run_manager)
-        message = ChatMessage(**self._custom_postprocess(responses))
-        generation = ChatGeneration(message=message)
-        return ChatResult(generations=[generation], llm_output=responses)
+        responses = self._get_generations(inputs=inputs, stop=stop, **kwargs)
+        return self._create_chat_result(responses, run_manager)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        inputs = self._custom_preprocess(messages)
+        responses = await self._aget_generations(inputs=inputs, stop=stop, **kwargs)
+        return self._create_chat_result(responses, run_manager)
+
+    def _create_chat_result(
+        self, responses: List[dict], run_manager: Optional[_CallbackManager]
+    ) -> ChatResult:
+        generations = []
+        for response in responses:
+            self._set_callback_out(response, run_manager)
+            message = ChatMessage(**self._custom_postprocess(response))
+            generations.append(ChatGeneration(message=message))
+        return ChatResult(generations=generations, llm_output=responses[0])
+
+    def _get_batch_configs(
+        self,
+        config: Optional[Union[RunnableConfig, List[RunnableConfig]]],
+        length: int,
+    ) -> List[RunnableConfig]:
+        """Bound the batch fan-out to the size of the shared connection pool."""
+        max_concurrency = self._client.client.max_connections
+        configs = get_config_list(config, length)
+        for conf in configs:
+            if not conf.get("max_concurrency"):
+                conf["max_concurrency"] = max_concurrency
+        return configs
+
+    @overload  # type: ignore[override]
+    def batch(
+        self,
+        inputs: List[LanguageModelInput],
+        config: Optional[Union[RunnableConfig, List[RunnableConfig]]] = None,
+        *,
+        return_exceptions: Literal[False] = False,
+        **kwargs: Any,
+    ) -> List[BaseMessage]: ...
+
+    @overload
+    def batch(
+        self,
+        inputs: List[LanguageModelInput],
+        config: Optional[Union[RunnableConfig, List[RunnableConfig]]] = None,
+        *,
+        return_exceptions: bool,
+        **kwargs: Any,
+    ) -> List[Union[BaseMessage, Exception]]: ...
+
+    def batch(
+        self,
+        inputs: List[LanguageModelInput],
+        config: Optional[Union[RunnableConfig, List[RunnableConfig]]] = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> Union[List[BaseMessage], List[Union[BaseMessage, Exception]]]:
+        """
+        Invoke the model on a list of inputs concurrently.
+
+        All requests share one pooled connection to the endpoint and at most
+        `max_concurrency` of them are in flight at any time. Results are returned
+        in input order. With `return_exceptions=True`, a failed request yields its
+        exception in place of a message instead of failing the whole batch.
+        """
+        return super().batch(
+            inputs,
+            self._get_batch_configs(config, len(inputs)),
+            return_exceptions=return_exceptions,
+            **kwargs,
+        )
+
+    @overload  # type: ignore[override]
+    async def abatch(
+        self,
+        inputs: List[LanguageModelInput],
+        config: Optional[Union[RunnableConfig, List[RunnableConfig]]] = None,
+        *,
+        return_exceptions: Literal[False] = False,
+        **kwargs: Any,
+    ) -> List[BaseMessage]: ...
+
+    @overload
+    async def abatch(
+        self,
+        inputs: List[LanguageModelInput],
+        config: Optional[Union[RunnableConfig, List[RunnableConfig]]] = None,
+        *,
+        return_exceptions: bool,
+        **kwargs: Any,
+    ) -> List[Union[BaseMessage, Exception]]: ...
+
+    async def abatch(
+        self,
+        inputs: List[LanguageModelInput],
+        config: Optional[Union[RunnableConfig, List[RunnableConfig]]] = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> Union[List[BaseMessage], List[Union[BaseMessage, Exception]]]:
+        """
+        Asynchronously invoke the model on a list of inputs concurrently.
+
+        See `batch` for concurrency, ordering and error handling.
+        """
+        return await super().abatch(
+            inputs,
+            self._get_batch_configs(config, len(inputs)),
+            return_exceptions=return_exceptions,
+            **kwargs,
+        )
 
     def _get_filled_chunk(self, **kwargs: Any) -> ChatGenerationChunk:
         """Fill the generation chunk."""
@@ -227,12 +382,36 @@ class ChatNVIDIA(BaseChatModel):
     ) -> Iterator[ChatGenerationChunk]:
         """Allows streaming to model!"""
         inputs = self._custom_preprocess(messages)
+        token_usage: Dict[str, Any] = {}
+        num_deltas = 0
+        cached = False
         for response in self._get_stream(inputs=inputs, stop=stop, **kwargs):
+            cached = cached or bool(response.get("cached"))
+            token_usage = response.get("token_usage") or token_usage
+            num_deltas += bool(response.get("content"))
             self._set_callback_out(response, run_manager)
             chunk = self._get_filled_chunk(**self._custom_postprocess(response))
             if run_manager:
                 run_manager.on_llm_new_token(chunk.text, chunk=chunk)
             yield chunk
+        if not token_usage and num_deltas:
+            # the endpoint reported no usage, estimate one token per delta
+            token_usage = {"completion_tokens": num_deltas, "total_tokens": num_deltas}
+        # the usage of the whole stream rides on a final empty chunk, where
+        # UsageCallbackHandler.on_llm_end picks it up from the generation_info
+        generation_info: Dict[str, Any] = {
+            "token_usage": token_usage,
+            "model_name": self.model,
+        }
+        if cached:
+            generation_info["cached"] = True
+        chunk = ChatGenerationChunk(
+            message=ChatMessageChunk(role="assistant", content=""),
+            generation_info=generation_info,
+        )
+        if run_manager:
+            run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+        yield chunk
 
     def _set_callback_out(
         self,
@@ -283,12 +462,11 @@ class ChatNVIDIA(BaseChatModel):
 
     def _preprocess_msg(self, msg: BaseMessage) -> Dict[str, str]:  # todo: remove
         if isinstance(msg, BaseMessage):
-            role_convert = {"ai": "assistant", "human": "user"}
             if isinstance(msg, ChatMessage):
                 role = msg.role
             else:
                 role = msg.type
-            role = role_convert.get(role, role)
+            role = _ROLE_CONVERT.get(role, role)
             content = self._process_content(msg.content)
             return {"role": role, "content": content}
         raise ValueError(f"Invalid message: {repr(msg)} of type {type(msg)}")
@@ -312,16 +490,45 @@ class ChatNVIDIA(BaseChatModel):
     ######################################################################################
     ## Core client-side interfaces
 
-    def _get_generation(
+    def _get_generations(
         self,
         inputs: Sequence[Dict],
         **kwargs: Any,
-    ) -> dict:
-        """Call to client generate method with call scope"""
+    ) -> List[dict]:
+        """Call to client generate method with call scope, one output per choice"""
         kwargs["stop"] = kwargs.get("stop", self.stop)
         payload = self._get_payload(inputs=inputs, stream=False, **kwargs)
-        out = self._client.client.get_req_generation(payload=payload)
-        return out
+        if self.response_cache is None:
+            return self._client.client.get_req_generations(payload=payload)
+        key = self._get_cache_key(payload)
+        if (out := self.response_cache.lookup(key)) is None:
+            out = self._client.client.get_req_generations(payload=payload)
+            self.response_cache.update(key, out)
+            return out
+        # hits spend no tokens, usage callbacks skip outputs marked as cached
+        return [{**output, "cached": True} for output in out]
+
+    def _get_cache_key(self, payload: dict) -> str:
+        """Response cache key of a payload posted to the endpoint of this model"""
+        return get_cache_key(payload, self._client.client._get_invoke_url())
+
+    async def _aget_generations(
+        self,
+        inputs: Sequence[Dict],
+        **kwargs: Any,
+    ) -> List[dict]:
+        """Call to client agenerate method with call scope, one output per choice"""
+        kwargs["stop"] = kwargs.get("stop", self.stop)
+        payload = self._get_payload(inputs=inputs, stream=False, **kwargs)
+        client = self._client.client
+        if self.response_cache is None:
+            return await client.aget_req_generations(payload=payload)
+        key = self._get_cache_key(payload)
+        if (out := self.response_cache.lookup(key)) is None:
+            out = await client.aget_req_generations(payload=payload)
+            self.response_cache.update(key, out)
+            return out
+        return [{**output, "cached": True} for output in out]
 
     def _get_stream(  # todo: remove
         self,
@@ -330,8 +537,29 @@ class ChatNVIDIA(BaseChatModel):
     ) -> Iterator:
         """Call to client stream method with call scope"""
         kwargs["stop"] = kwargs.get("stop") or self.stop
-        payload = self._get_payload(inputs=inputs, stream=True, **kwargs)
-        return self._client.client.get_req_stream(payload=payload)
+        if self.stream_usage:
+            kwargs.setdefault("stream_options", {"include_usage": True})
+        payload = self._get_stream_payload(inputs=inputs, **kwargs)
+        if self.response_cache is None:
+            return self._client.client.get_req_stream(payload=payload)
+        key = self._get_cache_key(payload)
+        if (out := self.response_cache.lookup(key)) is not None:
+            # replay the cached message as a single synthetic chunk
+            return iter([{**out[0], "cached": True}])
+        return self._cache_stream(key, self._client.client.get_req_stream(payload))
+
+    def _cache_stream(self, key: str, stream: Iterator[dict]) -> Iterator[dict]:
+        """Pass a stream through, caching the aggregated message once it completes"""
+        aggregate: Dict[str, Any] = {}
+        for msg in stream:
+            for k, v in msg.items():
+                if k == "content" and k in aggregate:
+                    aggregate[k] = (aggregate[k] or "") + (v or "")
+                elif v is not None or k not in aggregate:
+                    aggregate[k] = v
+            yield msg
+        if self.response_cache is not None:
+            self.response_cache.update(key, [aggregate])
 
     def _get_astream(  # todo: remove
         self,
@@ -340,9 +568,17 @@ class ChatNVIDIA(BaseChatModel):
     ) -> AsyncIterator:
         """Call to client astream methods with call scope"""
         kwargs["stop"] = kwargs.get("stop") or self.stop
-        payload = self._get_payload(inputs=inputs, stream=True, **kwargs)
+        if self.stream_usage:
+            kwargs.setdefault("stream_options", {"include_usage": True})
+        payload = self._get_stream_payload(inputs=inputs, **kwargs)
         return self._client.client.get_req_astream(payload=payload)
 
+    def _get_stream_payload(self, inputs: Sequence[Dict], **kwargs: Any) -> dict:
+        """Payload of a stream, which carries a single choice (n is not sent)"""
+        payload = self._get_payload(inputs=inputs, stream=True, **kwargs)
+        payload.pop("n", None)
+        return payload
+
     def _get_payload(
         self, inputs: Sequence[Dict], **kwargs: Any
     ) -> dict:  # todo: remove
@@ -354,6 +590,7 @@ class ChatNVIDIA(BaseChatModel):
             "top_p": self.top_p,
             "seed": self.seed,
             "stop": self.stop,
+            "n": self.n,
         }
         # if model_name := self._get_binding_model():
         #     attr_kwargs["model"] = model_name
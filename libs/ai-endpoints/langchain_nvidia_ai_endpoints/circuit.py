@@ -0,0 +1,189 @@
+"""Circuit breaking, to fail fast on endpoints that are down or degraded."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Literal, Optional, Tuple
+
+from langchain_core.pydantic_v1 import BaseModel, Field, PrivateAttr, root_validator
+
+"""
+### **Circuit Breaking**
+
+A `CircuitBreaker` tracks the outcome of the last `window` requests to every
+endpoint. Once at least `min_calls` have completed and the share of failures
+(connection errors, timeouts, HTTP 429 and 5xx) reaches `failure_rate`, or the
+share of calls slower than `slow_call_duration` reaches `slow_call_rate`, the
+circuit opens: requests to the endpoint raise `CircuitOpenError` at once, so
+fallbacks (e.g. `with_fallbacks`) take over without waiting for a timeout.
+
+After `open_time` seconds the circuit is half-open and lets `half_open_calls`
+probes through. A failed or slow probe opens it again, `half_open_calls`
+successful probes close it.
+
+```
+from langchain_nvidia_ai_endpoints import ChatNVIDIA
+from langchain_nvidia_ai_endpoints.circuit import CircuitBreaker
+
+breaker = CircuitBreaker(failure_rate=0.5, slow_call_duration=10.0)
+llm = ChatNVIDIA(circuit_breaker=breaker).with_fallbacks([backup_llm])
+```
+"""
+
+_CircuitState = Literal["closed", "open", "half_open"]
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to an endpoint whose circuit is open"""
+
+    def __init__(self, endpoint: str, retry_after: float) -> None:
+        super().__init__(
+            f"Circuit open for {endpoint}, not sending requests for "
+            f"another {retry_after:.2f}s"
+        )
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class _Circuit:
+    """State of the circuit of one endpoint"""
+
+    def __init__(self, window: int) -> None:
+        ## (failed, slow) of the most recent calls
+        self.outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window)
+        self.state: _CircuitState = "closed"
+        self.opened_at = 0.0
+        self.probes = 0
+        self.probe_successes = 0
+
+
+class _BreakerState:
+    """Circuits of all endpoints, shared by all copies of a breaker"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.circuits: Dict[str, _Circuit] = {}
+
+
+class CircuitBreaker(BaseModel):
+    """
+    Per-endpoint circuit breaker. An endpoint is the url requests are made to,
+    before any load balancing, so an open circuit means all replicas are failing.
+    """
+
+    failure_rate: float = Field(
+        0.5, gt=0, le=1, description="Share of failed calls that opens the circuit"
+    )
+    slow_call_duration: Optional[float] = Field(
+        None, gt=0, description="Seconds after which a call counts as slow"
+    )
+    slow_call_rate: float = Field(
+        1.0, gt=0, le=1, description="Share of slow calls that opens the circuit"
+    )
+    window: int = Field(20, ge=1, description="Calls considered per endpoint")
+    min_calls: int = Field(10, ge=1, description="Calls needed to open the circuit")
+    open_time: float = Field(30.0, ge=0, description="Seconds before probing again")
+    half_open_calls: int = Field(1, ge=1, description="Probes needed to close")
+
+    _state: _BreakerState = PrivateAttr(default_factory=_BreakerState)
+
+    @root_validator(skip_on_failure=True)
+    def _validate_min_calls(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+        ## the window never holds more than `window` calls to count
+        if values["min_calls"] > values["window"]:
+            raise ValueError(
+                f"min_calls ({values['min_calls']}) must not exceed window "
+                f"({values['window']}), the circuit could never open"
+            )
+        return values
+
+    def __getstate__(self) -> Dict[Any, Any]:
+        ## circuits are runtime state, not configuration
+        state = super().__getstate__()
+        state["__private_attribute_values__"] = {}
+        return state
+
+    def __setstate__(self, state: Dict[Any, Any]) -> None:
+        super().__setstate__(state)
+        self._init_private_attributes()
+
+    def state(self, endpoint: str) -> _CircuitState:
+        """State of the circuit of endpoint, "closed" for unknown endpoints"""
+        with self._state.lock:
+            if (circuit := self._state.circuits.get(endpoint)) is None:
+                return "closed"
+            self._advance(circuit, time.monotonic())
+            return circuit.state
+
+    def _advance(self, circuit: _Circuit, now: float) -> None:
+        elapsed = now - circuit.opened_at
+        if circuit.state == "open" and elapsed >= self.open_time:
+            circuit.state = "half_open"
+            circuit.opened_at = now
+            circuit.probes = circuit.probe_successes = 0
+        elif circuit.state == "half_open" and elapsed >= self.open_time:
+            ## probes that never reported back (e.g. an abandoned stream) must not
+            ## keep the circuit half-open forever
+            circuit.opened_at = now
+            circuit.probes = circuit.probe_successes
+
+    def _open(self, circuit: _Circuit, now: float) -> None:
+        circuit.state = "open"
+        circuit.opened_at = now
+        circuit.outcomes.clear()
+
+    def admit(self, endpoint: str) -> None:
+        """
+        Let a request to endpoint through, or raise `CircuitOpenError`. Every
+        admitted request must be reported back with `record`.
+        """
+        state = self._state
+        now = time.monotonic()
+        with state.lock:
+            if (circuit := state.circuits.get(endpoint)) is None:
+                circuit = state.circuits[endpoint] = _Circuit(self.window)
+            self._advance(circuit, now)
+            if circuit.state == "closed":
+                return
+            if circuit.state == "half_open" and circuit.probes < self.half_open_calls:
+                circuit.probes += 1
+                return
+            retry_after = max(circuit.opened_at + self.open_time - now, 0.0)
+        raise CircuitOpenError(endpoint, retry_after)
+
+    def record(self, endpoint: str, latency: Optional[float], failed: bool) -> None:
+        """Record the outcome of a request admitted by `admit`"""
+        slow = (
+            self.slow_call_duration is not None
+            and latency is not None
+            and latency > self.slow_call_duration
+        )
+        state = self._state
+        now = time.monotonic()
+        with state.lock:
+            if (circuit := state.circuits.get(endpoint)) is None:
+                return
+            if circuit.state == "half_open":
+                if failed or slow:
+                    self._open(circuit, now)
+                else:
+                    circuit.probe_successes += 1
+                    if circuit.probe_successes >= self.half_open_calls:
+                        circuit.state = "closed"
+                return
+            if circuit.state == "open":
+                ## a request admitted before the circuit opened
+                return
+            circuit.outcomes.append((failed, slow))
+            if len(circuit.outcomes) < self.min_calls:
+                return
+            calls = len(circuit.outcomes)
+            failures = sum(failed for failed, _ in circuit.outcomes)
+            slow_calls = sum(slow for _, slow in circuit.outcomes)
+            if (
+                failures >= self.failure_rate * calls
+                or slow_calls >= self.slow_call_rate * calls
+            ):
+                self._open(circuit, now)
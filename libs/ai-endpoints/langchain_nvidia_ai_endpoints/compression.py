@@ -0,0 +1,82 @@
+"""Compression of request bodies."""
+
+from __future__ import annotations
+
+import gzip
+from typing import Callable, Dict, Optional
+
+"""
+### **Request Compression**
+
+Large request bodies, e.g. batches of long passages to embed or images inlined
+in a chat message, can be compressed before upload with `compression="gzip"`
+or `compression="zstd"` (requires `pip install zstandard`). Only bodies of at
+least `compression_threshold` bytes are compressed, small requests gain little.
+
+Not every endpoint accepts compressed requests. One that refuses the encoding
+(HTTP 415) is sent the request again, using an encoding from the response's
+`Accept-Encoding` header or none at all, and is not sent that encoding again.
+
+```
+from langchain_nvidia_ai_endpoints import NVIDIAEmbeddings
+
+embedder = NVIDIAEmbeddings(compression="gzip", compression_threshold=16384)
+```
+"""
+
+
+def _gzip(data: bytes) -> bytes:
+    ## the level of zlib's default, level 9 costs a lot more time for little gain
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+## Encodings by preference
+_COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {}
+try:
+    import zstandard  # type: ignore
+
+    def _zstd(data: bytes) -> bytes:
+        return zstandard.compress(data, 3)
+
+    _COMPRESSORS["zstd"] = _zstd
+except ImportError:
+    pass
+_COMPRESSORS["gzip"] = _gzip
+
+
+def _check_encoding(encoding: Optional[str]) -> Optional[str]:
+    """The encoding, if requests can be compressed with it here"""
+    if encoding is not None and encoding not in _COMPRESSORS:
+        raise ImportError(
+            f"{encoding} compression requires zstandard, "
+            "please install it with `pip install zstandard`."
+        )
+    return encoding
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    return _COMPRESSORS[encoding](data)
+
+
+def _fallback_encoding(accept_encoding: Optional[str], refused: str) -> Optional[str]:
+    """
+    Encoding to use once `refused` was refused, from the `Accept-Encoding` header
+    of the refusal. None when the endpoint only takes uncompressed requests.
+    """
+    offered = set()
+    for item in (accept_encoding or "").split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    pass
+        if coding and quality > 0:
+            offered.add(coding.lower())
+    for encoding in _COMPRESSORS:
+        if encoding != refused and encoding in offered:
+            return encoding
+    return None
@@ -5,14 +5,15 @@ from typing import Any, List, Literal, Optional
 
 from langchain_core.embeddings import Embeddings
 from langchain_core.outputs.llm_result import LLMResult
-from langchain_core.pydantic_v1 import BaseModel, Field, PrivateAttr, validator
+from langchain_core.pydantic_v1 import Field, PrivateAttr, validator
 
-from langchain_nvidia_ai_endpoints._common import _NVIDIAClient
+from langchain_nvidia_ai_endpoints._common import _NVIDIAClient, _NVIDIAClientOptions
 from langchain_nvidia_ai_endpoints._statics import Model
 from langchain_nvidia_ai_endpoints.callbacks import usage_callback_var
+from langchain_nvidia_ai_endpoints.hedging import HedgingPolicy
 
 
-class NVIDIAEmbeddings(BaseModel, Embeddings):
+class NVIDIAEmbeddings(_NVIDIAClientOptions, Embeddings):
     """
     Client to NVIDIA embeddings models.
 
@@ -45,6 +46,9 @@ class NVIDIAEmbeddings(BaseModel, Embeddings):
     model_type: Optional[Literal["passage", "query"]] = Field(
         None, description="(DEPRECATED) The type of text to be embedded."
     )
+    hedging: Optional[HedgingPolicy] = Field(
+        None, description="Policy for hedging slow requests, off by default"
+    )
 
     def __init__(self, **kwargs: Any):
         """
@@ -63,6 +67,8 @@ class NVIDIAEmbeddings(BaseModel, Embeddings):
             trucate (str): "NONE", "START", "END", truncate input text if it exceeds
                             the model's context length. Default is "NONE", which raises
                             an error if an input is too long.
+            hedging (HedgingPolicy): Send a duplicate of requests that are slower
+                than usual and use whichever answers first. Off by default.
 
         API Key:
         - The recommended way to provide the API key is through the `NVIDIA_API_KEY`
@@ -74,6 +80,8 @@ class NVIDIAEmbeddings(BaseModel, Embeddings):
             model=self.model,
             api_key=kwargs.get("nvidia_api_key", kwargs.get("api_key", None)),
             infer_path="{base_url}/embeddings",
+            **self._client_options,
+            hedging=self.hedging,
         )
         # todo: only store the model in one place
         # the model may be updated to a newer name during initialization
@@ -143,7 +151,7 @@ class NVIDIAEmbeddings(BaseModel, Embeddings):
             payload=payload,
         )
         response.raise_for_status()
-        result = response.json()
+        result = self._client.client.json_loads_fn(response.content)
         data = result.get("data", result)
         if not isinstance(data, list):
             raise ValueError(f"Expected data with a list of embeddings. Got: {data}")
@@ -0,0 +1,308 @@
+"""Hedged requests to cut the tail latency of short calls."""
+
+from __future__ import annotations
+
+import math
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, TypeVar
+
+from langchain_core.pydantic_v1 import BaseModel, Field, PrivateAttr
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+"""
+### **Hedged Requests**
+
+A hedged request is sent a second time when the first copy has not answered
+within a delay derived from recently observed latencies (by default their 95th
+percentile). Whichever copy answers first is used and the other is discarded. A
+token budget caps the extra load at `max_extra_load` (e.g. 5%) of all requests.
+
+Hedging applies to non-streaming requests and is offered by `NVIDIAEmbeddings`
+and `NVIDIARerank`, whose calls are short and idempotent. The losing copy is
+released as soon as the other one answers: if it is still waiting for its
+response its connection is closed, if it has not been sent it never is. Over
+HTTP/2 (`http2=True`) connections are shared by many requests, so a losing copy
+that was sent runs to completion and only its response is closed.
+
+```
+from langchain_nvidia_ai_endpoints import NVIDIAEmbeddings, NVIDIARerank
+from langchain_nvidia_ai_endpoints.hedging import HedgingPolicy
+
+policy = HedgingPolicy(percentile=95, max_extra_load=0.05)
+embedder = NVIDIAEmbeddings(hedging=policy)
+ranker = NVIDIARerank(hedging=policy)
+```
+"""
+
+_T = TypeVar("_T")
+
+## Runs attempts of callers that bring no executor of their own
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = ThreadPoolExecutor(
+                    max_workers=64, thread_name_prefix="nvidia-hedge"
+                )
+    return _EXECUTOR
+
+
+class _Attempt:
+    """
+    Connections an attempt is waiting on for a response, so that the attempt
+    can be abandoned once the other one won. Connections are only tracked
+    between sending a request and receiving its response headers, while no
+    other request can be using them.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.waiting: Set[HTTPConnection] = set()
+        self.abandoned = False
+
+    def track(self, conn: HTTPConnection) -> None:
+        with self.lock:
+            if self.abandoned:
+                raise ConnectionAbortedError("Hedged attempt abandoned")
+            self.waiting.add(conn)
+
+    def untrack(self, conn: HTTPConnection) -> None:
+        with self.lock:
+            self.waiting.discard(conn)
+
+    def abandon(self) -> None:
+        """Stop waiting for responses, the requests fail with connection errors"""
+        with self.lock:
+            self.abandoned = True
+            for conn in self.waiting:
+                if conn.sock is not None:
+                    try:
+                        ## wakes up the thread blocked on the socket, also under TLS
+                        socket.socket.shutdown(conn.sock, socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+
+
+## The attempt the requests of the running thread are sent for, if hedged
+_ATTEMPT: ContextVar[Optional[_Attempt]] = ContextVar("_ATTEMPT", default=None)
+
+
+def _attempt_abandoned() -> bool:
+    """Whether the running attempt lost, so its errors say nothing of the endpoint"""
+    attempt = _ATTEMPT.get()
+    return attempt is not None and attempt.abandoned
+
+
+class _AbortableConnection(HTTPConnection):
+    """Connection that the attempt sending a request on it can abort"""
+
+    def request(self, *args: Any, **kwargs: Any) -> None:
+        if (attempt := _ATTEMPT.get()) is not None:
+            attempt.track(self)
+        try:
+            super().request(*args, **kwargs)
+        except BaseException:
+            if attempt is not None:
+                attempt.untrack(self)
+            raise
+
+    def getresponse(self, *args: Any, **kwargs: Any) -> Any:
+        try:
+            return super().getresponse(*args, **kwargs)
+        finally:
+            if (attempt := _ATTEMPT.get()) is not None:
+                attempt.untrack(self)
+
+
+class _AbortableHTTPSConnection(_AbortableConnection, HTTPSConnection):
+    pass
+
+
+class _AbortableHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _AbortableConnection
+
+
+class _AbortableHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _AbortableHTTPSConnection
+
+
+class _AbortableAdapter(HTTPAdapter):
+    """`HTTPAdapter` whose requests losing hedged attempts can abort"""
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _AbortableHTTPConnectionPool,
+            "https": _AbortableHTTPSConnectionPool,
+        }
+
+
+class _HedgingState:
+    """Observed latencies and hedge budget, shared by all copies of a policy"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.tokens = 0.0
+        self.hedges: Dict[str, int] = defaultdict(int)
+        self.abandoned: Dict[str, int] = defaultdict(int)
+
+
+class HedgingPolicy(BaseModel):
+    """
+    When and how often to hedge a request.
+
+    Until `min_samples` latencies have been observed for an endpoint the hedge
+    delay is `initial_delay`; after that it is the `percentile` of the last
+    `window` latencies, clamped to [`min_delay`, `max_delay`].
+    """
+
+    percentile: float = Field(95.0, gt=0, lt=100)
+    initial_delay: float = Field(0.5, ge=0, description="Delay before enough samples")
+    min_delay: float = Field(0.01, ge=0)
+    max_delay: float = Field(5.0, ge=0)
+    max_extra_load: float = Field(
+        0.05, gt=0, le=1, description="Upper bound on hedges per request"
+    )
+    window: int = Field(256, ge=1, description="Latencies kept per endpoint")
+    min_samples: int = Field(20, ge=1)
+
+    _state: _HedgingState = PrivateAttr(default_factory=_HedgingState)
+
+    def __getstate__(self) -> Dict[Any, Any]:
+        ## observed latencies and the budget are runtime state, not configuration
+        state = super().__getstate__()
+        state["__private_attribute_values__"] = {}
+        return state
+
+    def __setstate__(self, state: Dict[Any, Any]) -> None:
+        super().__setstate__(state)
+        self._init_private_attributes()
+
+    @property
+    def hedges(self) -> Dict[str, int]:
+        """Number of hedges sent, per endpoint"""
+        with self._state.lock:
+            return dict(self._state.hedges)
+
+    @property
+    def abandoned(self) -> Dict[str, int]:
+        """Number of attempts abandoned while pending as the other won, per endpoint"""
+        with self._state.lock:
+            return dict(self._state.abandoned)
+
+    def delay(self, endpoint: str) -> float:
+        """Seconds to wait for a response before hedging a request to endpoint"""
+        with self._state.lock:
+            latencies = sorted(self._state.latencies.get(endpoint, ()))
+        if len(latencies) < self.min_samples:
+            delay = self.initial_delay
+        else:
+            rank = math.ceil(self.percentile / 100 * len(latencies)) - 1
+            delay = latencies[max(rank, 0)]
+        return min(max(delay, self.min_delay), self.max_delay)
+
+    def observe(self, endpoint: str, latency: float) -> None:
+        """Record the latency of a successful attempt"""
+        state = self._state
+        with state.lock:
+            if (latencies := state.latencies.get(endpoint)) is None:
+                latencies = state.latencies[endpoint] = deque(maxlen=self.window)
+            latencies.append(latency)
+
+    def _credit(self) -> None:
+        ## every request earns a fraction of a hedge, saved up to a small burst
+        burst = max(1.0, self.max_extra_load * self.window)
+        state = self._state
+        with state.lock:
+            state.tokens = min(state.tokens + self.max_extra_load, burst)
+
+    def _try_acquire(self, endpoint: str) -> bool:
+        state = self._state
+        with state.lock:
+            if state.tokens < 1:
+                return False
+            state.tokens -= 1
+            state.hedges[endpoint] += 1
+            return True
+
+    def call(
+        self,
+        endpoint: str,
+        attempt: Callable[[int], _T],
+        discard: Callable[[_T], None] = lambda _: None,
+        executor: Optional[Executor] = None,
+        abandon: Callable[[int], None] = lambda _: None,
+    ) -> _T:
+        """
+        Run `attempt(0)` and, if it is still pending after the hedge delay and the
+        budget allows, `attempt(1)`. Returns the first successful result. A loser
+        that has not started is cancelled, one that is running is stopped with
+        `abandon(index)`, and whatever it returns is handed to `discard`. Errors
+        of the first attempt that arrive before the delay are raised without
+        hedging.
+
+        Attempts run on `executor`, a shared pool by default. The hedge delay and
+        the observed latencies count from when an attempt starts running, so time
+        spent waiting for a worker neither triggers hedges nor raises the delay.
+        """
+        self._credit()
+        if executor is None:
+            executor = _executor()
+        started = threading.Event()
+
+        def timed(index: int) -> _T:
+            if index == 0:
+                started.set()
+            start = time.perf_counter()
+            result = attempt(index)
+            self.observe(endpoint, time.perf_counter() - start)
+            return result
+
+        primary = executor.submit(copy_context().run, timed, 0)
+        started.wait()
+        done, _ = wait([primary], timeout=self.delay(endpoint))
+        if done or not self._try_acquire(endpoint):
+            return primary.result()
+
+        def discard_loser(future: Future) -> None:
+            if not future.cancelled() and future.exception() is None:
+                discard(future.result())
+
+        futures: List[Future] = [
+            primary,
+            executor.submit(copy_context().run, timed, 1),
+        ]
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for index, future in enumerate(futures):
+                if future.done() and future.exception() is None:
+                    loser = futures[1 - index]
+                    if not loser.done():
+                        with self._state.lock:
+                            self._state.abandoned[endpoint] += 1
+                        if not loser.cancel():
+                            abandon(1 - index)
+                    loser.add_done_callback(discard_loser)
+                    return future.result()
+        ## both attempts failed, report the error of the original request
+        return primary.result()
@@ -0,0 +1,310 @@
+"""HTTP/2 transport, multiplexing many requests over few connections."""
+
+from __future__ import annotations
+
+import datetime
+import time
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Iterator, Optional, Type
+
+import aiohttp
+import requests
+from multidict import CIMultiDict, CIMultiDictProxy
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from yarl import URL
+
+if TYPE_CHECKING:
+    import httpx
+
+"""
+### **HTTP/2**
+
+Over HTTP/1.1 every request in flight needs a connection of its own. With
+`http2=True` requests are sent through `httpx` over HTTP/2 instead, which
+multiplexes all concurrent requests and streams to a host over a single
+connection. This needs the `http2` extra,
+`pip install "langchain-nvidia-ai-endpoints[http2]"`.
+
+```
+from langchain_nvidia_ai_endpoints import ChatNVIDIA
+
+llm = ChatNVIDIA(model="meta/llama3-8b-instruct", http2=True)
+```
+
+HTTP/2 is negotiated during the TLS handshake, so `http://` urls (e.g. a local
+NIM) stay on HTTP/1.1 unless the server speaks HTTP/2 without TLS and the
+session is created with `http1=False`.
+
+`HTTP2Session` and `AsyncHTTP2Session` can also be passed as `get_session_fn`
+and `get_asession_fn` of a client. They implement the parts of the `requests`
+and `aiohttp` sessions that the client uses. Errors are raised as the
+equivalent `requests` and `aiohttp` errors, so retries, circuit breaking and
+load balancing treat them alike. DNS and connection phases are not traced.
+"""
+
+
+def _httpx() -> Any:
+    try:
+        import httpx
+    except ImportError as e:
+        raise ImportError(
+            "The HTTP/2 transport requires httpx, "
+            "please install it with "
+            '`pip install "langchain-nvidia-ai-endpoints[http2]"`.'
+        ) from e
+    return httpx
+
+
+def _timeout(timeout: Any) -> Any:
+    """httpx timeout for a requests-style (connect, read) or aiohttp timeout"""
+    httpx = _httpx()
+    if isinstance(timeout, aiohttp.ClientTimeout):
+        return httpx.Timeout(
+            timeout.total, connect=timeout.sock_connect, read=timeout.sock_read
+        )
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(None, connect=connect, read=read)
+    return httpx.Timeout(timeout)
+
+
+def _requests_error(error: Exception) -> Exception:
+    """The requests exception equivalent to an httpx exception"""
+    httpx = _httpx()
+    if isinstance(error, httpx.ConnectTimeout):
+        return requests.exceptions.ConnectTimeout(str(error))
+    if isinstance(error, httpx.TimeoutException):
+        return requests.exceptions.ReadTimeout(f"Read timed out. ({error})")
+    if isinstance(error, httpx.TransportError):
+        return requests.exceptions.ConnectionError(str(error))
+    return error
+
+
+class _RawStream:
+    """Stands in for the urllib3 response of a streamed `requests.Response`"""
+
+    def __init__(self, response: httpx.Response) -> None:
+        self._response = response
+
+    def stream(self, chunk_size: int, decode_content: bool = True) -> Iterator[bytes]:
+        try:
+            yield from self._response.iter_bytes()
+        except Exception as e:
+            ## like requests, report reads of the body timing out as connection errors
+            error = _requests_error(e)
+            if isinstance(error, requests.exceptions.ReadTimeout):
+                error = requests.exceptions.ConnectionError(str(error))
+            raise error from e
+
+    def settimeout(self, timeout: Optional[float]) -> None:
+        """Timeout of the following reads, httpx looks it up on every read"""
+        self._response.request.extensions["timeout"]["read"] = timeout
+
+    def close(self) -> None:
+        self._response.close()
+
+
+class HTTP2Session:
+    """A `requests.Session` look-alike sending requests through httpx"""
+
+    def __init__(
+        self,
+        max_connections: int = 32,
+        http2: bool = True,
+        http1: bool = True,
+        client: Optional[httpx.Client] = None,
+    ) -> None:
+        httpx = _httpx()
+        self.client = client or httpx.Client(
+            http2=http2,
+            http1=http1,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[dict] = None,
+        data: Optional[bytes] = None,
+        stream: bool = False,
+        timeout: Any = None,
+        **kwargs: Any,
+    ) -> Response:
+        request = self.client.build_request(
+            method, url, headers=headers, content=data, timeout=_timeout(timeout)
+        )
+        start = time.perf_counter()
+        try:
+            result = self.client.send(request, stream=True)
+        except Exception as e:
+            raise _requests_error(e) from e
+
+        response = Response()
+        response.status_code = result.status_code
+        response.headers = CaseInsensitiveDict(result.headers)
+        response.reason = result.reason_phrase
+        response.url = str(result.url)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.elapsed = datetime.timedelta(seconds=time.perf_counter() - start)
+        response.request = requests.Request(
+            method, url, headers=dict(request.headers), data=data
+        ).prepare()
+        response.raw = _RawStream(result)
+        if not stream:
+            try:
+                response._content = result.read()
+            except Exception as e:
+                raise _requests_error(e) from e
+            finally:
+                result.close()
+        return response
+
+    def post(self, url: str, **kwargs: Any) -> Response:
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any) -> Response:
+        return self.request("GET", url, **kwargs)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class _StreamReader:
+    """Stands in for the `content` of an aiohttp response"""
+
+    def __init__(self, response: httpx.Response) -> None:
+        self._chunks = response.aiter_bytes()
+
+    async def readany(self) -> bytes:
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return b""
+        except Exception as e:
+            raise _aiohttp_error(e) from e
+
+
+def _aiohttp_error(error: Exception) -> Exception:
+    """The aiohttp exception equivalent to an httpx exception"""
+    httpx = _httpx()
+    if isinstance(error, httpx.TimeoutException):
+        return TimeoutError(str(error))
+    if isinstance(error, httpx.TransportError):
+        return aiohttp.ClientConnectionError(str(error))
+    return error
+
+
+class _AsyncResponse:
+    """An `aiohttp.ClientResponse` look-alike for a streamed httpx response"""
+
+    def __init__(self, response: httpx.Response) -> None:
+        self._response = response
+        self.status = response.status_code
+        self.headers = CIMultiDictProxy(CIMultiDict(response.headers.multi_items()))
+        self.content = _StreamReader(response)
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            url = URL(str(self._response.url))
+            request_info = aiohttp.RequestInfo(
+                url,
+                self._response.request.method,
+                CIMultiDictProxy(CIMultiDict(self._response.request.headers)),
+                url,
+            )
+            raise aiohttp.ClientResponseError(
+                request_info,
+                (),
+                status=self.status,
+                message=self._response.reason_phrase,
+                headers=self.headers,
+            )
+
+    async def read(self) -> bytes:
+        try:
+            return await self._response.aread()
+        except Exception as e:
+            raise _aiohttp_error(e) from e
+
+    async def release(self) -> None:
+        await self._response.aclose()
+
+    async def __aenter__(self) -> _AsyncResponse:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.release()
+
+
+class AsyncHTTP2Session:
+    """
+    An `aiohttp.ClientSession` look-alike sending requests through httpx. Without
+    a client, it uses one of its own and closes it on exit.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 32,
+        http2: bool = True,
+        http1: bool = True,
+        client: Optional[httpx.AsyncClient] = None,
+        **kwargs: Any,  # e.g. trace_configs, not supported
+    ) -> None:
+        httpx = _httpx()
+        self._owns_client = client is None
+        self.client = client or httpx.AsyncClient(
+            http2=http2,
+            http1=http1,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[dict] = None,
+        data: Optional[bytes] = None,
+        timeout: Any = None,
+        **kwargs: Any,
+    ) -> _AsyncResponse:
+        request = self.client.build_request(
+            method, url, headers=headers, content=data, timeout=_timeout(timeout)
+        )
+        try:
+            return _AsyncResponse(await self.client.send(request, stream=True))
+        except Exception as e:
+            raise _aiohttp_error(e) from e
+
+    async def post(self, url: str, **kwargs: Any) -> _AsyncResponse:
+        return await self.request("POST", url, **kwargs)
+
+    async def get(self, url: str, **kwargs: Any) -> _AsyncResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def close(self) -> None:
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def __aenter__(self) -> AsyncHTTP2Session:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.close()
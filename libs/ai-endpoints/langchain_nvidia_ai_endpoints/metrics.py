@@ -0,0 +1,341 @@
+"""Latency and throughput metrics for NVIDIA AI Foundation Model requests."""
+
+from __future__ import annotations
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+"""
+### **Latency/Throughput Metrics**
+
+Every request made by `ChatNVIDIA`, `NVIDIAEmbeddings` and `NVIDIARerank` inside a
+`get_metrics_callback()` block is recorded into histograms keyed by metric, model
+and endpoint. Outside of such a block nothing is measured.
+
+```
+from langchain_nvidia_ai_endpoints import ChatNVIDIA
+from langchain_nvidia_ai_endpoints.metrics import get_metrics_callback
+
+llm = ChatNVIDIA()
+with get_metrics_callback() as cb:
+    for chunk in llm.stream("Tell me a joke"):
+        ...
+    print(cb.to_prometheus())
+```
+
+Recorded metrics:
+ - `request_latency_seconds`: request sent to last byte received
+ - `queue_time_seconds`: time spent polling a request accepted with HTTP 202
+ - `time_to_first_token_seconds`: request sent to first content delta (streaming)
+ - `inter_token_latency_seconds`: gap between content deltas (streaming)
+ - `request_bytes`, `response_bytes`: payload sizes on the wire
+ - `tokens_per_second`: completion tokens over generation time
+
+Samples can be pushed elsewhere (e.g. an OpenTelemetry meter) by implementing a
+`MetricsExporter` and calling `cb.export()`. Bucket boundaries are explicit so they
+map onto OpenTelemetry explicit-bucket histograms as they are.
+"""
+
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+SIZE_BUCKETS: Tuple[float, ...] = tuple(float(4**i * 256) for i in range(9))
+RATE_BUCKETS: Tuple[float, ...] = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+## metric name -> (bucket boundaries, help text)
+METRICS: Dict[str, Tuple[Tuple[float, ...], str]] = {
+    "request_latency_seconds": (
+        LATENCY_BUCKETS,
+        "Time from sending a request to receiving its last byte",
+    ),
+    "queue_time_seconds": (
+        LATENCY_BUCKETS,
+        "Time spent polling a request accepted with HTTP 202",
+    ),
+    "time_to_first_token_seconds": (
+        LATENCY_BUCKETS,
+        "Time from sending a streaming request to its first content delta",
+    ),
+    "inter_token_latency_seconds": (
+        LATENCY_BUCKETS,
+        "Time between consecutive content deltas of a stream",
+    ),
+    "request_bytes": (SIZE_BUCKETS, "Size of request bodies"),
+    "response_bytes": (SIZE_BUCKETS, "Size of response bodies"),
+    "tokens_per_second": (RATE_BUCKETS, "Completion tokens per second of generation"),
+}
+
+
+@dataclass(frozen=True)
+class HistogramSample:
+    """Snapshot of one histogram; `counts` holds one entry per bucket plus +Inf"""
+
+    name: str
+    model: str
+    endpoint: str
+    buckets: Tuple[float, ...]
+    counts: Tuple[int, ...]
+    sum: float
+    count: int
+
+
+class _Histogram:
+    """Fixed-bucket histogram, counts are per bucket (not cumulative)"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsExporter(ABC):
+    """Receives histogram snapshots from `MetricsCallbackHandler.export`."""
+
+    @abstractmethod
+    def export(self, samples: List[HistogramSample]) -> None:
+        """Publish the samples."""
+
+
+class PrometheusExporter(MetricsExporter):
+    """Keeps the latest export rendered in the Prometheus text format."""
+
+    def __init__(self, namespace: str = "nvidia") -> None:
+        self.namespace = namespace
+        self.text = ""
+
+    def export(self, samples: List[HistogramSample]) -> None:
+        self.text = render_prometheus(samples, namespace=self.namespace)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render_prometheus(samples: List[HistogramSample], namespace: str = "nvidia") -> str:
+    """Render samples in the Prometheus text exposition format"""
+    lines: List[str] = []
+    described = set()
+    for sample in samples:
+        name = f"{namespace}_{sample.name}" if namespace else sample.name
+        if name not in described:
+            described.add(name)
+            help_text = METRICS.get(sample.name, ((), sample.name))[1]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+        labels = (
+            f'model="{_escape_label(sample.model)}",'
+            f'endpoint="{_escape_label(sample.endpoint)}"'
+        )
+        cumulative = 0
+        for bound, count in zip(sample.buckets + (float("inf"),), sample.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _format_value(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {_format_value(sample.sum)}")
+        lines.append(f"{name}_count{{{labels}}} {sample.count}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Callback Handler that records request latency and throughput histograms."""
+
+    def __init__(
+        self,
+        buckets: Optional[Dict[str, Sequence[float]]] = None,
+        exporters: Sequence[MetricsExporter] = (),
+    ) -> None:
+        super().__init__()
+        self._lock = threading.Lock()
+        self._buckets = {name: spec[0] for name, spec in METRICS.items()}
+        for name, bounds in (buckets or {}).items():
+            self._buckets[name] = tuple(sorted(bounds))
+        self.exporters = list(exporters)
+        self._histograms: Dict[Tuple[str, str, str], _Histogram] = {}
+
+    def __repr__(self) -> str:
+        return f"MetricsCallbackHandler({len(self._histograms)} histograms)"
+
+    @property
+    def always_verbose(self) -> bool:
+        """Whether to call verbose callbacks even if verbose is False."""
+        return True
+
+    def observe(self, name: str, value: float, model: str, endpoint: str) -> None:
+        """Record one observation of a metric for a model and endpoint"""
+        key = (name, model, endpoint)
+        with self._lock:
+            if (histogram := self._histograms.get(key)) is None:
+                buckets = self._buckets.get(name, LATENCY_BUCKETS)
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def collect(self) -> List[HistogramSample]:
+        """Snapshot of all histograms, sorted by metric, model and endpoint"""
+        with self._lock:
+            return [
+                HistogramSample(
+                    name=key[0],
+                    model=key[1],
+                    endpoint=key[2],
+                    buckets=histogram.buckets,
+                    counts=tuple(histogram.counts),
+                    sum=histogram.sum,
+                    count=histogram.count,
+                )
+                for key, histogram in sorted(self._histograms.items())
+            ]
+
+    def export(self) -> None:
+        """Push a snapshot to every registered exporter"""
+        samples = self.collect()
+        for exporter in self.exporters:
+            exporter.export(samples)
+
+    def to_prometheus(self, namespace: str = "nvidia") -> str:
+        """All histograms in the Prometheus text exposition format"""
+        return render_prometheus(self.collect(), namespace=namespace)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def __copy__(self) -> "MetricsCallbackHandler":
+        """Return a copy of the callback handler."""
+        return self
+
+    def __deepcopy__(self, memo: Any) -> "MetricsCallbackHandler":
+        """Return a deep copy of the callback handler."""
+        return self
+
+
+metrics_callback_var: ContextVar[Optional[MetricsCallbackHandler]] = ContextVar(
+    "metrics_callback", default=None
+)
+
+register_configure_hook(metrics_callback_var, True)
+
+
+@contextmanager
+def get_metrics_callback(
+    callback: Optional[MetricsCallbackHandler] = None,
+) -> Generator[MetricsCallbackHandler, None, None]:
+    """Record latency and throughput metrics of the requests made in the block.
+
+    Example:
+        >>> with get_metrics_callback() as cb:
+        ...     llm.invoke("Hello")
+        ...     print(cb.to_prometheus())
+    """
+    if not callback:
+        callback = MetricsCallbackHandler()
+    token = metrics_callback_var.set(callback)
+    try:
+        yield callback
+    finally:
+        metrics_callback_var.reset(token)
+
+
+class _RequestMetrics:
+    """Timings of one request, reported to a handler as they are measured"""
+
+    def __init__(self, handler: MetricsCallbackHandler, model: str, endpoint: str):
+        self.handler = handler
+        self.model = model
+        self.endpoint = endpoint
+        self.start = time.perf_counter()
+        self.first_token: Optional[float] = None
+        self.last_token: Optional[float] = None
+        self.num_deltas = 0
+        self.completion_tokens: Optional[int] = None
+        self.response_bytes = 0
+
+    def observe(self, name: str, value: float) -> None:
+        self.handler.observe(name, value, self.model, self.endpoint)
+
+    def stream_line(self, line: bytes, msgs: List[dict]) -> None:
+        """Account for one line of a stream and the messages parsed from it"""
+        self.response_bytes += len(line)
+        for msg in msgs:
+            if msg.get("content"):
+                now = time.perf_counter()
+                if self.last_token is None:
+                    self.first_token = now
+                    self.observe("time_to_first_token_seconds", now - self.start)
+                else:
+                    self.observe("inter_token_latency_seconds", now - self.last_token)
+                self.last_token = now
+                self.num_deltas += 1
+            if usage := msg.get("token_usage"):
+                self.completion_tokens = usage.get("completion_tokens")
+
+    def throughput(self, completion_tokens: Optional[int]) -> None:
+        """Record tokens/sec over the time since generation started"""
+        if not completion_tokens:
+            return
+        elapsed = time.perf_counter() - (self.first_token or self.start)
+        if elapsed > 0:
+            self.observe("tokens_per_second", completion_tokens / elapsed)
+
+    def finish(
+        self,
+        request_bytes: Optional[int] = None,
+        response_bytes: Optional[int] = None,
+    ) -> None:
+        """Record the totals of a finished request"""
+        self.observe("request_latency_seconds", time.perf_counter() - self.start)
+        if request_bytes is not None:
+            self.observe("request_bytes", request_bytes)
+        self.observe(
+            "response_bytes",
+            self.response_bytes if response_bytes is None else response_bytes,
+        )
+        if self.first_token is not None:
+            self.throughput(self.completion_tokens or self.num_deltas)
+
+
+def _request_metrics(payload: dict, endpoint: str) -> Optional[_RequestMetrics]:
+    """Metrics recorder for a request, None (no overhead) unless metrics are on"""
+    if (handler := metrics_callback_var.get()) is None:
+        return None
+    return _RequestMetrics(handler, str(payload.get("model", "")), endpoint)
@@ -7,8 +7,9 @@ from langchain_core.documents import Document
 from langchain_core.documents.compressor import BaseDocumentCompressor
 from langchain_core.pydantic_v1 import BaseModel, Field, PrivateAttr
 
-from langchain_nvidia_ai_endpoints._common import _NVIDIAClient
+from langchain_nvidia_ai_endpoints._common import _NVIDIAClient, _NVIDIAClientOptions
 from langchain_nvidia_ai_endpoints._statics import Model
+from langchain_nvidia_ai_endpoints.hedging import HedgingPolicy
 
 
 class Ranking(BaseModel):
@@ -16,7 +17,7 @@ class Ranking(BaseModel):
     logit: float
 
 
-class NVIDIARerank(BaseDocumentCompressor):
+class NVIDIARerank(BaseDocumentCompressor, _NVIDIAClientOptions):
     """
     LangChain Document Compressor that uses the NVIDIA NeMo Retriever Reranking API.
     """
@@ -41,6 +42,9 @@ class NVIDIARerank(BaseDocumentCompressor):
     max_batch_size: int = Field(
         _default_batch_size, ge=1, description="The maximum batch size."
     )
+    hedging: Optional[HedgingPolicy] = Field(
+        None, description="Policy for hedging slow requests, off by default"
+    )
 
     def __init__(self, **kwargs: Any):
         """
@@ -56,6 +60,8 @@ class NVIDIARerank(BaseDocumentCompressor):
             nvidia_api_key (str): The API key to use for connecting to the hosted NIM.
             api_key (str): Alternative to nvidia_api_key.
             base_url (str): The base URL of the NIM to connect to.
+            hedging (HedgingPolicy): Send a duplicate of requests that are slower
+                than usual and use whichever answers first. Off by default.
 
         API Key:
         - The recommended way to provide the API key is through the `NVIDIA_API_KEY`
@@ -67,6 +73,8 @@ class NVIDIARerank(BaseDocumentCompressor):
             model=self.model,
             api_key=kwargs.get("nvidia_api_key", kwargs.get("api_key", None)),
             infer_path="{base_url}/ranking",
+            **self._client_options,
+            hedging=self.hedging,
         )
         # todo: only store the model in one place
         # the model may be updated to a newer name during initialization
@@ -101,7 +109,7 @@ class NVIDIARerank(BaseDocumentCompressor):
         if response.status_code != 200:
             response.raise_for_status()
         # todo: handle errors
-        rankings = response.json()["rankings"]
+        rankings = self._client.client.json_loads_fn(response.content)["rankings"]
         # todo: callback support
         return [Ranking(**ranking) for ranking in rankings[: self.top_n]]
 
@@ -0,0 +1,51 @@
+"""Timeouts for the phases of a request."""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from langchain_core.pydantic_v1 import BaseModel, Field
+
+"""
+### **Timeouts**
+
+`Timeouts` bounds each phase of a request separately:
+
+- `connect`: establishing the connection
+- `first_byte`: from sending the request until the response headers arrive
+- `idle`: between two chunks of a streamed response
+- `total`: the whole request, including polling for HTTP 202 responses and
+  reading every chunk of a stream
+
+`first_byte` and `idle` default to the client's `timeout` (60s). Without a
+`total`, no request has an overall deadline: each phase is bounded on its own,
+polling for HTTP 202 responses gives up after `timeout`, and a long generation
+that keeps producing tokens is never cut short.
+
+```
+from langchain_nvidia_ai_endpoints import ChatNVIDIA
+from langchain_nvidia_ai_endpoints.timeouts import Timeouts
+
+llm = ChatNVIDIA(timeouts=Timeouts(connect=3, first_byte=30, idle=10))
+```
+"""
+
+
+class Timeouts(BaseModel):
+    """
+    Seconds allowed for each phase of a request. Unset `first_byte` and `idle`
+    fall back to the client's `timeout`.
+    """
+
+    connect: Optional[float] = Field(
+        10.0, gt=0, description="Seconds to establish a connection"
+    )
+    first_byte: Optional[float] = Field(
+        None, gt=0, description="Seconds until the response headers arrive"
+    )
+    idle: Optional[float] = Field(
+        None, gt=0, description="Seconds allowed between two chunks of a stream"
+    )
+    total: Optional[float] = Field(
+        None, gt=0, description="Seconds for the whole request"
+    )
@@ -0,0 +1,256 @@
+"""Request-level tracing for NVIDIA AI Foundation Model requests."""
+
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    ContextManager,
+    Deque,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    TypeVar,
+    overload,
+)
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+"""
+### **Request Tracing**
+
+Inside a `trace_requests()` block every request made by `ChatNVIDIA`,
+`NVIDIAEmbeddings` and `NVIDIARerank` produces a `RequestSpan`: timestamped phase
+events, the NVCF request id, HTTP 202 polls and payload sizes. By default spans are
+kept in a bounded in-memory ring buffer for post-mortem inspection.
+
+```
+from langchain_nvidia_ai_endpoints import ChatNVIDIA
+from langchain_nvidia_ai_endpoints.tracing import trace_requests
+
+llm = ChatNVIDIA()
+with trace_requests() as tracer:
+    llm.invoke("Tell me a joke")
+
+span = tracer.spans[-1]
+span.nvcf_request_id  # quote this when reporting a slow or failed call
+span.phases           # {"send": 0.001, "first_byte": 0.84, "last_byte": 0.84, ...}
+```
+
+Phase events, as offsets in seconds from the start of the span:
+ - `dns_start`, `dns_end`, `connect_start`, `connect_end`: name resolution and
+   connection setup (TLS included) of new connections, async streaming only
+ - `send`: request encoded, about to be sent
+ - `first_byte`: response headers received
+ - `poll`: one status poll of a request accepted with HTTP 202
+ - `first_token`: first content delta of a stream
+ - `last_byte`: response body fully received
+ - `parse`: response decoded, see `parse_seconds` for the time spent decoding
+
+Implement `RequestTracer` to forward spans elsewhere, e.g. to OpenTelemetry.
+"""
+
+
+@dataclass
+class TraceEvent:
+    """A phase of a request, `offset` is in seconds from the start of its span"""
+
+    name: str
+    offset: float
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class RequestSpan:
+    """Everything recorded about one request"""
+
+    url: str
+    model: str
+    stream: bool
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    start_time: float = field(default_factory=time.time)
+    events: List[TraceEvent] = field(default_factory=list)
+    nvcf_request_id: Optional[str] = None
+    status_code: Optional[int] = None
+    polls: int = 0
+    request_bytes: Optional[int] = None
+    response_bytes: Optional[int] = None
+    parse_seconds: float = 0.0
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    _start: float = field(default_factory=time.perf_counter, repr=False)
+    _tracer: Optional[RequestTracer] = field(default=None, repr=False)
+
+    @property
+    def phases(self) -> Dict[str, float]:
+        """Offset of the last event of each name"""
+        return {event.name: event.offset for event in self.events}
+
+    def mark(
+        self, name: str, offset: Optional[float] = None, **attributes: Any
+    ) -> None:
+        """Record a phase event, by default at the current time"""
+        if offset is None:
+            offset = time.perf_counter() - self._start
+        event = TraceEvent(name=name, offset=offset, attributes=attributes)
+        self.events.append(event)
+        if self._tracer is not None:
+            self._tracer.on_event(self, event)
+
+    def record_response(self, status_code: int, headers: Any) -> None:
+        """Keep the status and the NVCF request id of a response"""
+        self.status_code = status_code
+        self.nvcf_request_id = headers.get("NVCF-REQID", self.nvcf_request_id)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        """Close the span and hand it to the tracer"""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        if self._tracer is not None:
+            self._tracer.on_span_end(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain representation, e.g. for structured logging"""
+        return {
+            "span_id": self.span_id,
+            "url": self.url,
+            "model": self.model,
+            "stream": self.stream,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "nvcf_request_id": self.nvcf_request_id,
+            "status_code": self.status_code,
+            "polls": self.polls,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "parse_seconds": self.parse_seconds,
+            "error": self.error,
+            "events": [
+                {"name": e.name, "offset": e.offset, **e.attributes}
+                for e in self.events
+            ],
+        }
+
+
+class RequestTracer:
+    """Base tracer, receives events as they happen and spans once they end."""
+
+    def on_event(self, span: RequestSpan, event: TraceEvent) -> None:
+        """Called for every phase event of a span."""
+
+    def on_span_end(self, span: RequestSpan) -> None:
+        """Called once a span is complete."""
+
+
+class RingBufferTracer(RequestTracer):
+    """Keeps the most recent `capacity` spans in memory."""
+
+    def __init__(self, capacity: int = 256) -> None:
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, given: {capacity}")
+        self._spans: Deque[RequestSpan] = deque(maxlen=capacity)
+
+    @property
+    def spans(self) -> List[RequestSpan]:
+        """Completed spans, oldest first"""
+        return list(self._spans)
+
+    def on_span_end(self, span: RequestSpan) -> None:
+        self._spans.append(span)
+
+    def find(self, nvcf_request_id: str) -> Optional[RequestSpan]:
+        """The most recent span with the given NVCF request id"""
+        for span in reversed(self.spans):
+            if span.nvcf_request_id == nvcf_request_id:
+                return span
+        return None
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+
+class LoggingTracer(RequestTracer):
+    """Logs every completed span as a structured record."""
+
+    def __init__(self, level: int = logging.DEBUG) -> None:
+        self.level = level
+
+    def on_span_end(self, span: RequestSpan) -> None:
+        logger.log(self.level, "NVIDIA request span", extra={"span": span.to_dict()})
+
+
+request_tracer_var: ContextVar[Optional[RequestTracer]] = ContextVar(
+    "request_tracer", default=None
+)
+
+
+_Tracer = TypeVar("_Tracer", bound=RequestTracer)
+
+
+@overload
+def trace_requests() -> ContextManager[RingBufferTracer]: ...
+
+
+@overload
+def trace_requests(tracer: _Tracer) -> ContextManager[_Tracer]: ...
+
+
+@contextmanager
+def trace_requests(
+    tracer: Optional[RequestTracer] = None,
+) -> Generator[Any, None, None]:
+    """Trace the requests made in the block, into a ring buffer by default.
+
+    Example:
+        >>> with trace_requests() as tracer:
+        ...     llm.invoke("Hello")
+        >>> tracer.spans[-1].phases
+    """
+    if tracer is None:
+        tracer = RingBufferTracer()
+    token = request_tracer_var.set(tracer)
+    try:
+        yield tracer
+    finally:
+        request_tracer_var.reset(token)
+
+
+def _request_span(payload: dict, url: str, stream: bool) -> Optional[RequestSpan]:
+    """Span for a request, None (no overhead) unless tracing is on"""
+    if (tracer := request_tracer_var.get()) is None:
+        return None
+    return RequestSpan(
+        url=url,
+        model=str(payload.get("model", "")),
+        stream=stream,
+        _tracer=tracer,
+    )
+
+
+def _aiohttp_trace_config(span: RequestSpan) -> aiohttp.TraceConfig:
+    """aiohttp hooks marking name resolution and connection setup on a span"""
+
+    def _marker(name: str) -> Any:
+        async def on_signal(*args: Any) -> None:
+            span.mark(name)
+
+        return on_signal
+
+    config = aiohttp.TraceConfig()
+    config.on_dns_resolvehost_start.append(_marker("dns_start"))
+    config.on_dns_resolvehost_end.append(_marker("dns_end"))
+    config.on_connection_create_start.append(_marker("connect_start"))
+    config.on_connection_create_end.append(_marker("connect_end"))
+    return config
@@ -0,0 +1,112 @@
+"""
+Compare invoking ChatNVIDIA prompt by prompt with `batch` and `abatch`.
+
+Starts a local OpenAI-compatible chat completions server that answers every
+request after `--delay` seconds, then sends the same prompts through
+`ChatNVIDIA.invoke` one at a time, through `batch` and through `abatch`, and
+reports wall time, requests per second and the number of connections the server
+saw.
+
+    python scripts/benchmark_batching.py --prompts 256 --max-concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, List, Set, Tuple
+
+from langchain_nvidia_ai_endpoints import ChatNVIDIA
+
+CONNECTIONS: Set[Tuple[str, int]] = set()
+
+
+def make_handler(delay: float) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self) -> None:
+            CONNECTIONS.add(self.client_address)
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(delay)
+            content = request["messages"][-1]["content"]
+            body = json.dumps(
+                {
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": 1,
+                        "completion_tokens": 1,
+                        "total_tokens": 2,
+                    },
+                }
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    return Handler
+
+
+def start_server(port: int, delay: float) -> Callable[[], None]:
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(delay))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+
+def report(name: str, wall: float, prompts: int) -> None:
+    print(  # noqa: T201
+        f"{name:<12} wall {wall:6.2f}s  {prompts / wall:8.1f} req/s  "
+        f"connections {len(CONNECTIONS)}"
+    )
+    CONNECTIONS.clear()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--prompts", type=int, default=256)
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--delay", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    stop = start_server(args.port, args.delay)
+    llm = ChatNVIDIA(
+        base_url=f"http://127.0.0.1:{args.port}/v1",
+        model="mock-model",
+        max_concurrency=args.max_concurrency,
+    )
+    prompts = [f"prompt {i}" for i in range(args.prompts)]
+    try:
+        start = time.perf_counter()
+        results: List[Any] = [llm.invoke(prompt) for prompt in prompts]
+        report("invoke", time.perf_counter() - start, len(prompts))
+
+        start = time.perf_counter()
+        results = llm.batch(prompts)
+        report("batch", time.perf_counter() - start, len(prompts))
+        assert [r.content for r in results] == prompts
+
+        start = time.perf_counter()
+        results = asyncio.run(llm.abatch(prompts))
+        report("abatch", time.perf_counter() - start, len(prompts))
+        assert [r.content for r in results] == prompts
+    finally:
+        stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Compare HTTP/1.1 and HTTP/2 transports with many concurrent streams.
+
+Starts a local HTTP/2 server (cleartext, prior knowledge) that streams chat
+completion chunks, then runs the same number of concurrent streams through
+ChatNVIDIA over requests (HTTP/1.1) and over HTTP2Session, both from threads
+and from asyncio, and reports wall time, time to first token and the number of
+connections the server saw.
+
+    pip install "httpx[http2]" hypercorn
+    python scripts/benchmark_http2.py --streams 200
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+import aiohttp
+import httpx
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+
+from langchain_nvidia_ai_endpoints import ChatNVIDIA
+from langchain_nvidia_ai_endpoints.http2 import AsyncHTTP2Session, HTTP2Session
+
+CONNECTIONS: Set[Tuple[str, int]] = set()
+
+
+def _event(content: str) -> bytes:
+    delta = {"choices": [{"index": 0, "delta": {"content": content}}]}
+    return f"data: {json.dumps(delta)}\n\n".encode()
+
+
+def make_app(tokens: int, token_delay: float) -> Callable:
+    async def app(scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        CONNECTIONS.add(tuple(scope["client"]))
+        while (await receive()).get("more_body"):
+            pass
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream")],
+            }
+        )
+        for i in range(tokens):
+            await asyncio.sleep(token_delay)
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": _event(f"{i} "),
+                    "more_body": True,
+                }
+            )
+        await send({"type": "http.response.body", "body": b"data: [DONE]\n\n"})
+
+    return app
+
+
+def start_server(port: int, tokens: int, token_delay: float) -> Callable[[], None]:
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.accesslog = None
+    loop = asyncio.new_event_loop()
+    stop = asyncio.Event()
+    app = make_app(tokens, token_delay)
+
+    def run() -> None:
+        loop.run_until_complete(serve(app, config, shutdown_trigger=stop.wait))
+
+    def shutdown() -> None:
+        loop.call_soon_threadsafe(stop.set)
+
+    threading.Thread(target=run, daemon=True).start()
+    time.sleep(1.0)
+    return shutdown
+
+
+def report(name: str, wall: float, first_tokens: List[float]) -> None:
+    first_tokens.sort()
+    p99 = first_tokens[int(0.99 * (len(first_tokens) - 1))]
+    print(  # noqa: T201
+        f"{name:<24} wall {wall:6.2f}s  "
+        f"first token p50 {statistics.median(first_tokens) * 1000:7.1f}ms "
+        f"p99 {p99 * 1000:7.1f}ms  connections {len(CONNECTIONS)}"
+    )
+    CONNECTIONS.clear()
+
+
+def run_threads(name: str, llm: ChatNVIDIA, streams: int) -> None:
+    def one(_: int) -> float:
+        start = time.perf_counter()
+        first = None
+        for _chunk in llm.stream("hello"):
+            if first is None:
+                first = time.perf_counter() - start
+        return first or 0.0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=streams) as executor:
+        first_tokens = list(executor.map(one, range(streams)))
+    report(name, time.perf_counter() - start, first_tokens)
+
+
+async def run_async(name: str, llm: ChatNVIDIA, streams: int) -> None:
+    client = llm._client.client
+
+    async def one() -> float:
+        start = time.perf_counter()
+        first = None
+        async for _msg in client.get_req_astream({"messages": [], "stream": True}):
+            if first is None:
+                first = time.perf_counter() - start
+        return first or 0.0
+
+    start = time.perf_counter()
+    first_tokens = list(await asyncio.gather(*(one() for _ in range(streams))))
+    report(name, time.perf_counter() - start, first_tokens)
+
+
+async def main_async(base_url: str, streams: int) -> None:
+    ## one connector shared by all sessions, as each request opens a session
+    connector = aiohttp.TCPConnector(limit=streams)
+    http1 = ChatNVIDIA(base_url=base_url, model="mock-model")
+    http1._client.client.get_asession_fn = partial(
+        aiohttp.ClientSession, connector=connector, connector_owner=False
+    )
+    await run_async("aiohttp (HTTP/1.1)", http1, streams)
+    await connector.close()
+
+    async with httpx.AsyncClient(http2=True, http1=False) as shared:
+        http2 = ChatNVIDIA(base_url=base_url, model="mock-model")
+        http2._client.client.get_asession_fn = partial(AsyncHTTP2Session, client=shared)
+        await run_async("httpx async (HTTP/2)", http2, streams)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    stop = start_server(args.port, args.tokens, args.token_delay)
+    base_url = f"http://127.0.0.1:{args.port}/v1"
+    try:
+        http1 = ChatNVIDIA(
+            base_url=base_url, model="mock-model", max_concurrency=args.streams
+        )
+        run_threads("requests (HTTP/1.1)", http1, args.streams)
+
+        http2 = ChatNVIDIA(base_url=base_url, model="mock-model")
+        http2._client.client.get_session_fn = partial(
+            HTTP2Session, http1=False, max_connections=4
+        )
+        run_threads("HTTP2Session (HTTP/2)", http2, args.streams)
+
+        asyncio.run(main_async(base_url, args.streams))
+    finally:
+        stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare the JSON codecs NVEModel can use on embedding and streaming traffic.
+
+Times the stdlib json module and, when they are installed, orjson and msgspec
+on decoding a large embedding response, decoding per-token SSE events and
+encoding an embedding request, then the codec NVEModel selected by default.
+
+    pip install orjson msgspec
+    python scripts/benchmark_json.py --vectors 256 --dim 4096
+"""
+
+import argparse
+import json
+import random
+import timeit
+from typing import Any, Callable, Dict, Tuple
+
+from langchain_nvidia_ai_endpoints._common import _json_dumps, _json_loads
+
+Codec = Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]
+
+
+def codecs() -> Dict[str, Codec]:
+    found: Dict[str, Codec] = {
+        "json": (lambda obj: json.dumps(obj).encode("utf-8"), json.loads),
+    }
+    try:
+        import orjson
+
+        found["orjson"] = (
+            lambda obj: orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+            orjson.loads,
+        )
+    except ImportError:
+        pass
+    try:
+        import msgspec  # type: ignore
+
+        found["msgspec"] = (msgspec.json.encode, msgspec.json.decode)
+    except ImportError:
+        pass
+    found["default"] = (_json_dumps, _json_loads)
+    return found
+
+
+def best(fn: Callable[[], Any], number: int) -> float:
+    """Fastest time of one call, over 5 rounds of `number` calls"""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--vectors", type=int, default=256)
+    parser.add_argument("--dim", type=int, default=4096)
+    parser.add_argument("--events", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    response = json.dumps(
+        {
+            "data": [
+                {"embedding": [rng.uniform(-1, 1) for _ in range(args.dim)], "index": i}
+                for i in range(args.vectors)
+            ],
+            "usage": {"prompt_tokens": 8, "total_tokens": 8},
+        }
+    ).encode("utf-8")
+    events = [
+        json.dumps(
+            {"choices": [{"index": 0, "delta": {"content": f" token{i}"}}]}
+        ).encode("utf-8")
+        for i in range(args.events)
+    ]
+    request = {
+        "model": "nvidia/nv-embedqa-e5-v5",
+        "input": [" ".join(["passage"] * 200)] * args.vectors,
+        "input_type": "passage",
+        "logit_bias": {123: -100},
+    }
+
+    print(  # noqa: T201
+        f"{'codec':<8} {'embeddings decode':>18} {'SSE events decode':>18} "
+        f"{'request encode':>15}"
+    )
+    for name, (dumps, loads) in codecs().items():
+        decode = best(lambda: loads(response), 3)
+        stream = best(lambda: [loads(event) for event in events], 10)
+        encode = best(lambda: dumps(request), 20)
+        print(  # noqa: T201
+            f"{name:<8} {decode * 1000:15.1f} ms {stream * 1000:15.2f} ms "
+            f"{encode * 1000:12.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Time building the payload of a ChatNVIDIA request from a long conversation.
+
+Builds a synthetic conversation of `--turns` human/AI turns, where every
+`--image-every`th human turn carries an inline base64 image next to its text,
+then times converting the whole history into the request payload, as every
+call of the model does before sending it.
+
+    python scripts/benchmark_preprocess.py --turns 200 --image-every 10
+"""
+
+import argparse
+import base64
+import random
+import timeit
+from typing import List
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from langchain_nvidia_ai_endpoints import ChatNVIDIA
+
+
+def conversation(turns: int, image_every: int, image_bytes: int) -> List[BaseMessage]:
+    rng = random.Random(0)
+    image = "data:image/png;base64," + base64.b64encode(
+        rng.randbytes(image_bytes)
+    ).decode("utf-8")
+    history: List[BaseMessage] = []
+    for turn in range(turns):
+        text = f"question {turn}: " + " ".join(["lorem"] * rng.randint(10, 60))
+        if image_every and turn % image_every == 0:
+            history.append(
+                HumanMessage(
+                    content=[
+                        {"type": "text", "text": text},
+                        {"type": "image_url", "image_url": {"url": image}},
+                    ]
+                )
+            )
+        else:
+            history.append(HumanMessage(content=text))
+        history.append(AIMessage(content=f"answer {turn}: " + "ipsum " * 40))
+    return history
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--image-every", type=int, default=10)
+    parser.add_argument("--image-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    llm = ChatNVIDIA(base_url="http://127.0.0.1:8000/v1", model="mock-model")
+    history = conversation(args.turns, args.image_every, args.image_bytes)
+
+    def build() -> dict:
+        return llm._get_payload(
+            inputs=llm._custom_preprocess(history), stream=False, stop=None
+        )
+
+    seconds = min(timeit.repeat(build, number=args.number, repeat=5)) / args.number
+    print(  # noqa: T201
+        f"{len(history)} messages: {seconds * 1e6:8.1f} us per payload"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,10 @@
+import gc
+import gzip
 import inspect
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Generator, List, Optional, Tuple
 
 import pytest
 
@@ -13,3 +19,52 @@ import langchain_nvidia_ai_endpoints
 )
 def public_class(request: pytest.FixtureRequest) -> type:
     return request.param
+
+
+## handler(request, json body) -> (status, json response), or None if the handler
+## wrote the response itself
+ServerHandler = Callable[[BaseHTTPRequestHandler, Any], Optional[Tuple[int, Any]]]
+
+
+@pytest.fixture
+def local_server() -> Generator[Callable[[ServerHandler], str], None, None]:
+    """Start real HTTP servers on localhost, returns their base url"""
+    servers: List[ThreadingHTTPServer] = []
+
+    def start(handler: ServerHandler) -> str:
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                data = self.rfile.read(length)
+                if self.headers.get("Content-Encoding") == "gzip":
+                    data = gzip.decompress(data)
+                body = json.loads(data) if length else None
+                if (reply := handler(self, body)) is not None:
+                    status, obj = reply
+                    data = json.dumps(obj).encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), RequestHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}/v1"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    ## collect the clients' pooled connections now, rather than warn about them
+    ## being unclosed in a later test
+    gc.collect()
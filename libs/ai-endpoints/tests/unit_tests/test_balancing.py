@@ -0,0 +1,145 @@
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+import pytest
+
+from langchain_nvidia_ai_endpoints import ChatNVIDIA, NVIDIAEmbeddings
+from langchain_nvidia_ai_endpoints.balancing import LoadBalancer
+
+
+def _replica(
+    name: str, calls: Counter, delay: float = 0.0, status: int = 200
+) -> Callable[[Any, Any], Optional[Tuple[int, Any]]]:
+    """Handler of a fake NIM replica, answering both embeddings and chat"""
+
+    def handler(request: Any, body: Any) -> Optional[Tuple[int, Any]]:
+        calls[name] += 1
+        time.sleep(delay)
+        if status != 200:
+            return status, {"title": f"{name} failed"}
+        if request.path.endswith("/embeddings"):
+            return 200, {"data": [{"embedding": [float(len(name))], "index": 0}]}
+        events = [
+            {"choices": [{"index": 0, "delta": {"content": name}}]},
+            {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]},
+        ]
+        data = "".join(f"data: {json.dumps(e)}\n\n" for e in events).encode()
+        request.send_response(200)
+        request.send_header("Content-Type", "text/event-stream")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+        return None
+
+    return handler
+
+
+def test_round_robin_when_idle(local_server: Callable) -> None:
+    calls: Counter = Counter()
+    balancer = LoadBalancer(
+        base_urls=[local_server(_replica(name, calls)) for name in "ab"]
+    )
+    embedder = NVIDIAEmbeddings(load_balancer=balancer)
+    assert embedder.base_url == balancer.base_urls[0]
+    for _ in range(4):
+        embedder.embed_query("hello")
+    assert calls == {"a": 2, "b": 2}
+    assert all(r["outstanding"] == 0 for r in balancer.replicas.values())
+
+
+def test_least_outstanding(local_server: Callable) -> None:
+    calls: Counter = Counter()
+    balancer = LoadBalancer(
+        base_urls=[local_server(_replica(name, calls, delay=0.1)) for name in "abc"]
+    )
+    embedder = NVIDIAEmbeddings(load_balancer=balancer)
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        list(executor.map(embedder.embed_query, ["hello"] * 6))
+    assert calls == {"a": 2, "b": 2, "c": 2}
+
+
+def test_ewma_prefers_fast_replica(local_server: Callable) -> None:
+    calls: Counter = Counter()
+    balancer = LoadBalancer(
+        base_urls=[
+            local_server(_replica("slow", calls, delay=0.1)),
+            local_server(_replica("fast", calls)),
+        ],
+        strategy="ewma",
+    )
+    llm = ChatNVIDIA(load_balancer=balancer)
+    contents = ["".join(str(c.content) for c in llm.stream("hi")) for _ in range(6)]
+    ## each replica is measured once, then the fast one takes the traffic
+    assert calls == {"slow": 1, "fast": 5}
+    assert contents.count("fast") == 5
+    slow, fast = (balancer.replicas[url]["latency"] for url in balancer.base_urls)
+    assert slow > fast
+
+
+def test_ejection_and_readmission(local_server: Callable) -> None:
+    calls: Counter = Counter()
+    bad, good = (
+        local_server(_replica("bad", calls, status=503)),
+        local_server(_replica("good", calls)),
+    )
+    balancer = LoadBalancer(base_urls=[bad, good], max_failures=2, ejection_time=0.3)
+    embedder = NVIDIAEmbeddings(load_balancer=balancer)
+    failures = 0
+    for _ in range(8):
+        try:
+            embedder.embed_query("hello")
+        except Exception as e:
+            assert "bad failed" in str(e)
+            failures += 1
+    assert failures == 2
+    assert balancer.replicas[bad]["ejected"]
+    assert calls == {"bad": 2, "good": 6}
+
+    time.sleep(0.35)
+    assert not balancer.replicas[bad]["ejected"]
+    with pytest.raises(Exception, match="bad failed"):
+        for _ in range(2):
+            embedder.embed_query("hello")
+    ## one more failure after re-admission ejects it again
+    assert balancer.replicas[bad]["ejected"]
+
+
+def test_client_errors_do_not_eject(local_server: Callable) -> None:
+    calls: Counter = Counter()
+    balancer = LoadBalancer(
+        base_urls=[local_server(_replica("a", calls, status=400))], max_failures=1
+    )
+    embedder = NVIDIAEmbeddings(load_balancer=balancer)
+    with pytest.raises(Exception, match="a failed"):
+        embedder.embed_query("hello")
+    assert not balancer.replicas[balancer.base_urls[0]]["ejected"]
+
+
+@pytest.mark.parametrize("method", ["invoke", "stream", "astream"])
+async def test_encoding_error_releases_replica(method: str) -> None:
+    balancer = LoadBalancer(base_urls=["http://localhost:8888/v1"])
+    llm = ChatNVIDIA(load_balancer=balancer)
+
+    def json_dumps(obj: Any) -> bytes:
+        raise TypeError("not serialisable")
+
+    llm._client.client.json_dumps_fn = json_dumps
+    with pytest.raises(TypeError):
+        if method == "invoke":
+            llm.invoke("hello")
+        elif method == "stream":
+            list(llm.stream("hello"))
+        else:
+            [chunk async for chunk in llm._client.client.get_req_astream({})]
+    assert balancer.replicas["http://localhost:8888/v1"]["outstanding"] == 0
+
+
+def test_invalid_base_urls() -> None:
+    with pytest.raises(ValueError):
+        LoadBalancer(base_urls=[])
+    with pytest.raises(ValueError):
+        LoadBalancer(base_urls=["localhost:8000"])
+    assert LoadBalancer(base_urls=["http://a/v1/"]).base_urls == ["http://a/v1"]
@@ -0,0 +1,165 @@
+from pathlib import Path
+
+import pytest
+from requests_mock import Mocker
+
+from langchain_nvidia_ai_endpoints import ChatNVIDIA
+from langchain_nvidia_ai_endpoints.caches import (
+    InMemoryResponseCache,
+    SQLiteResponseCache,
+    get_cache_key,
+)
+from langchain_nvidia_ai_endpoints.callbacks import get_usage_callback
+
+
+def test_cache_key_canonical() -> None:
+    payload = {"model": "m", "messages": [{"role": "user", "content": "hi"}]}
+    reordered = {"messages": payload["messages"], "model": "m", "stream": True}
+    url = "http://localhost:8888/v1/chat/completions"
+    assert get_cache_key(payload, url) == get_cache_key(reordered, url)
+    assert get_cache_key(payload, url) != get_cache_key({**payload, "seed": 1}, url)
+    other = "http://localhost:9999/v1/chat/completions"
+    assert get_cache_key(payload, url) != get_cache_key(payload, other)
+
+
+def test_in_memory_lru() -> None:
+    cache = InMemoryResponseCache(maxsize=2)
+    cache.update("a", [{"content": "A"}])
+    cache.update("b", [{"content": "B"}])
+    assert cache.lookup("a") == [{"content": "A"}]
+    cache.update("c", [{"content": "C"}])
+    assert cache.lookup("b") is None
+    assert len(cache) == 2
+
+
+def test_in_memory_returns_copies() -> None:
+    cache = InMemoryResponseCache()
+    cache.update("a", [{"content": "A"}])
+    cache.lookup("a")[0]["content"] = "mutated"  # type: ignore
+    assert cache.lookup("a") == [{"content": "A"}]
+
+
+@pytest.mark.parametrize("ttl", [0, -1])
+def test_invalid_ttl(ttl: float) -> None:
+    with pytest.raises(ValueError):
+        InMemoryResponseCache(ttl=ttl)
+
+
+def test_ttl_expiry(tmp_path: Path) -> None:
+    now = [1000.0]
+
+    def clock() -> float:
+        return now[0]
+
+    for cache in [
+        InMemoryResponseCache(ttl=10, clock=clock),
+        SQLiteResponseCache(str(tmp_path / "cache.db"), ttl=10, clock=clock),
+    ]:
+        cache.update("a", [{"content": "A"}])
+        now[0] += 5
+        assert cache.lookup("a") == [{"content": "A"}]
+        now[0] += 10
+        assert cache.lookup("a") is None
+
+
+def test_sqlite_persistent(tmp_path: Path) -> None:
+    path = str(tmp_path / "cache.db")
+    SQLiteResponseCache(path).update("a", [{"content": "A"}])
+    assert SQLiteResponseCache(path).lookup("a") == [{"content": "A"}]
+
+
+def test_chat_cache_replay(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        "http://localhost:8888/v1/chat/completions",
+        json={
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "cached"},
+                    "finish_reason": "stop",
+                }
+            ]
+        },
+    )
+    llm = ChatNVIDIA(
+        base_url="http://localhost:8888/v1",
+        seed=42,
+        response_cache=InMemoryResponseCache(),
+    )
+    assert llm.invoke("hello").content == "cached"
+    assert llm.invoke("hello").content == "cached"
+    assert [chunk.content for chunk in llm.stream("hello") if chunk.content] == [
+        "cached"
+    ]
+    assert requests_mock.call_count == 1
+    llm.invoke("something else")
+    assert requests_mock.call_count == 2
+
+
+def test_chat_cache_keyed_by_endpoint(requests_mock: Mocker) -> None:
+    for port in (8888, 9999):
+        requests_mock.post(
+            f"http://localhost:{port}/v1/chat/completions",
+            json={
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": f"{port}"},
+                        "finish_reason": "stop",
+                    }
+                ]
+            },
+        )
+    cache = InMemoryResponseCache()
+    first, second = (
+        ChatNVIDIA(base_url=f"http://localhost:{port}/v1", response_cache=cache)
+        for port in (8888, 9999)
+    )
+    assert first.invoke("hello").content == "8888"
+    assert second.invoke("hello").content == "9999"
+    assert requests_mock.call_count == 2
+
+
+def test_chat_cache_filled_by_stream(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        "http://localhost:8888/v1/chat/completions",
+        text='data: {"choices": [{"index": 0, "delta": {"role": "assistant", '
+        '"content": "stre"}}]}\n\n'
+        'data: {"choices": [{"index": 0, "delta": {"content": "amed"}, '
+        '"finish_reason": "stop"}]}\n\n'
+        "data: [DONE]\n\n",
+    )
+    llm = ChatNVIDIA(
+        base_url="http://localhost:8888/v1",
+        response_cache=InMemoryResponseCache(),
+    )
+    assert "".join(str(chunk.content) for chunk in llm.stream("hello")) == "streamed"
+    assert llm.invoke("hello").content == "streamed"
+    assert requests_mock.call_count == 1
+
+
+def test_chat_cache_hits_spend_no_tokens(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        "http://localhost:8888/v1/chat/completions",
+        json={
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "cached"},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7},
+        },
+    )
+    llm = ChatNVIDIA(
+        base_url="http://localhost:8888/v1",
+        response_cache=InMemoryResponseCache(),
+    )
+    with get_usage_callback() as cb:
+        cb.reset()
+        llm.invoke("hello")
+        llm.invoke("hello")
+        list(llm.stream("hello"))
+        assert cb.total_tokens == 7
+        assert cb.successful_requests == 1
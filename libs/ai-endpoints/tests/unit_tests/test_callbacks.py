@@ -0,0 +1,136 @@
+import gc
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import pytest
+from langchain_core.outputs import LLMResult
+from requests_mock import Mocker
+
+from langchain_nvidia_ai_endpoints import ChatNVIDIA
+from langchain_nvidia_ai_endpoints.callbacks import (
+    UsageCallbackHandler,
+    get_usage_callback,
+)
+
+
+def _sse(events: List[dict]) -> str:
+    return "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+
+
+_DELTAS = [
+    {"choices": [{"index": 0, "delta": {"role": "assistant", "content": "Hi"}}]},
+    {"choices": [{"index": 0, "delta": {"content": " there"}}]},
+    {"choices": [{"index": 0, "delta": {"content": ""}, "finish_reason": "stop"}]},
+]
+
+
+@pytest.mark.parametrize("method", ["stream", "astream"])
+async def test_stream_usage(requests_mock: Mocker, method: str) -> None:
+    usage = {"prompt_tokens": 7, "completion_tokens": 2, "total_tokens": 9}
+    requests_mock.post(
+        "http://localhost:8888/v1/chat/completions",
+        text=_sse(_DELTAS + [{"choices": [], "usage": usage}]),
+    )
+    # usage is requested by default
+    llm = ChatNVIDIA(base_url="http://localhost:8888/v1")
+    with get_usage_callback() as cb:
+        cb.reset()
+        if method == "stream":
+            content = "".join(str(chunk.content) for chunk in llm.stream("hello"))
+        else:
+            content = "".join([str(chunk.content) async for chunk in llm.astream("hi")])
+        assert content == "Hi there"
+        assert cb.prompt_tokens == 7
+        assert cb.completion_tokens == 2
+        assert cb.total_tokens == 9
+        assert cb.successful_requests == 1
+    payload = requests_mock.last_request.json()
+    assert payload["stream_options"] == {"include_usage": True}
+
+
+@pytest.mark.parametrize("stream_usage", [True, False])
+def test_stream_usage_estimated(requests_mock: Mocker, stream_usage: bool) -> None:
+    # the endpoint reports no usage, or it is not requested
+    requests_mock.post("http://localhost:8888/v1/chat/completions", text=_sse(_DELTAS))
+    llm = ChatNVIDIA(base_url="http://localhost:8888/v1", stream_usage=stream_usage)
+    with get_usage_callback() as cb:
+        cb.reset()
+        list(llm.stream("hello"))
+        assert cb.completion_tokens == 2
+        assert cb.successful_requests == 1
+    assert ("stream_options" in requests_mock.last_request.json()) == stream_usage
+
+
+def _llm_result(model_name: str) -> LLMResult:
+    return LLMResult(
+        generations=[[]],
+        llm_output={
+            "model_name": model_name,
+            "token_usage": {
+                "prompt_tokens": 3,
+                "completion_tokens": 2,
+                "total_tokens": 5,
+            },
+        },
+    )
+
+
+def test_usage_concurrent_threads() -> None:
+    cb = UsageCallbackHandler()
+    cb.price_map["model-a"] = 0.001
+
+    def work(i: int) -> None:
+        for _ in range(100):
+            cb.on_llm_end(_llm_result("model-a" if i % 2 else "model-b"))
+
+    with ThreadPoolExecutor(max_workers=64) as executor:
+        list(executor.map(work, range(64)))
+
+    assert cb.successful_requests == 6400
+    assert cb.total_tokens == 6400 * 5
+    assert cb.model_usage["model-a"]["prompt_tokens"] == 3200 * 3
+    assert cb.model_usage["model-b"]["completion_tokens"] == 3200 * 2
+    assert cb.total_cost == pytest.approx(3200 * 5 * 0.001 / 1000)
+
+    cb.reset()
+    assert cb.successful_requests == 0
+    cb.on_llm_end(_llm_result("model-a"))
+    assert cb.successful_requests == 1
+
+
+def test_usage_shards_of_ended_threads_are_folded() -> None:
+    cb = UsageCallbackHandler()
+    threads = [
+        threading.Thread(target=cb.on_llm_end, args=(_llm_result("model-a"),))
+        for _ in range(50)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    gc.collect()
+    assert len(cb._shards) == 0
+    assert cb.successful_requests == 50
+    assert cb.model_usage["model-a"]["total_tokens"] == 50 * 5
+
+
+def test_llm_output_per_thread() -> None:
+    cb = UsageCallbackHandler()
+    cb.llm_output = {"model_name": "model-a"}
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(cb.llm_output))
+    thread.start()
+    thread.join()
+    assert seen == [{}]
+    assert cb.llm_output == {"model_name": "model-a"}
+
+
+def test_usage_per_instance() -> None:
+    first, second = UsageCallbackHandler(), UsageCallbackHandler()
+    first.price_map["model-a"] = 1.0
+    first.on_llm_end(_llm_result("model-a"))
+    assert first.total_tokens == 5
+    assert second.total_tokens == 0
+    assert "model-a" not in second.price_map
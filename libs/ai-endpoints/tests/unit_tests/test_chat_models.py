@@ -1,7 +1,17 @@
 """Test chat model integration."""
 
 
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from typing import Any, Callable, Tuple
+
 import pytest
+import requests
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from requests_mock import Mocker
 
 from langchain_nvidia_ai_endpoints.chat_models import ChatNVIDIA
 
@@ -21,3 +31,238 @@ def test_integration_initialization() -> None:
 def test_unavailable() -> None:
     with pytest.raises(ValueError):
         ChatNVIDIA(model="not-a-real-model")
+
+
+def _mock_chat_completions(requests_mock: Mocker, url: str) -> None:
+    def echo(request: Any, context: Any) -> dict:
+        content = request.json()["messages"][-1]["content"]
+        if content == "fail":
+            context.status_code = 500
+            return {"detail": "boom"}
+        return {
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": f"echo: {content}"},
+                    "finish_reason": "stop",
+                }
+            ]
+        }
+
+    requests_mock.post(url, json=echo)
+
+
+def test_batch_ordered_shared_session(requests_mock: Mocker) -> None:
+    _mock_chat_completions(requests_mock, "http://localhost:8888/v1/chat/completions")
+    llm = ChatNVIDIA(base_url="http://localhost:8888/v1", max_concurrency=4)
+    sessions = []
+
+    def get_session() -> requests.Session:
+        sessions.append(requests.Session())
+        return sessions[-1]
+
+    llm._client.client.get_session_fn = get_session
+    prompts = [f"prompt {i}" for i in range(20)]
+    results = llm.batch(prompts)
+    assert [r.content for r in results] == [f"echo: {p}" for p in prompts]
+    assert len(sessions) == 1
+    assert llm._client.client.max_connections == 4
+
+
+def _choice(index: int, content: str) -> dict:
+    return {
+        "index": index,
+        "message": {"role": "assistant", "content": content},
+        "finish_reason": "stop",
+    }
+
+
+def _echo(request: BaseHTTPRequestHandler, body: Any) -> Tuple[int, dict]:
+    content = body["messages"][-1]["content"]
+    if content == "fail":
+        return 500, {"detail": "boom"}
+    return 200, {"choices": [_choice(0, f"echo: {content}")]}
+
+
+async def test_abatch_return_exceptions(local_server: Callable) -> None:
+    llm = ChatNVIDIA(base_url=local_server(_echo))
+    results = await llm.abatch(["a", "fail", "b"], return_exceptions=True)
+    assert isinstance(results[0], BaseMessage) and results[0].content == "echo: a"
+    assert isinstance(results[1], Exception)
+    assert isinstance(results[2], BaseMessage) and results[2].content == "echo: b"
+
+
+async def test_abatch_native_async_bounded(local_server: Callable) -> None:
+    lock = threading.Lock()
+    in_flight = [0, 0]  # current, most
+
+    def handler(request: BaseHTTPRequestHandler, body: Any) -> Tuple[int, dict]:
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        return _echo(request, body)
+
+    llm = ChatNVIDIA(base_url=local_server(handler), max_concurrency=3)
+    prompts = [f"prompt {i}" for i in range(12)]
+    results = await llm.abatch(prompts, RunnableConfig(max_concurrency=12))
+    assert [r.content for r in results] == [f"echo: {p}" for p in prompts]
+    assert in_flight[1] == 3
+    assert llm._client.client.max_connections == 3
+    assert llm._client.client._session is None  # not run on the sync session
+
+
+def test_generate_n_choices(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        "http://localhost:8888/v1/chat/completions",
+        json={
+            "choices": [_choice(i, f"choice {i}") for i in range(3)],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 6, "total_tokens": 11},
+        },
+    )
+    llm = ChatNVIDIA(base_url="http://localhost:8888/v1", n=3)
+    result = llm.generate([[HumanMessage(content="hello")]])
+    assert [g.text for g in result.generations[0]] == [f"choice {i}" for i in range(3)]
+    assert requests_mock.call_count == 1
+    assert requests_mock.last_request.json()["n"] == 3
+    # the usage of the response is reported once, not once per choice
+    usages = [
+        g.message.response_metadata.get("token_usage")  # type: ignore
+        for g in result.generations[0]
+    ]
+    assert usages == [
+        {"prompt_tokens": 5, "completion_tokens": 6, "total_tokens": 11},
+        None,
+        None,
+    ]
+
+
+def test_generate_n_client_side_fallback(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        "http://localhost:8888/v1/chat/completions",
+        json={
+            "choices": [_choice(0, "only one")],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7},
+        },
+    )
+    llm = ChatNVIDIA(base_url="http://localhost:8888/v1", seed=7)
+    result = llm._generate([HumanMessage(content="hello")], n=3)
+    assert [g.text for g in result.generations] == ["only one"] * 3
+    assert requests_mock.call_count == 3
+    assert "n" not in requests_mock.request_history[-1].json()
+    seeds = {request.json()["seed"] for request in requests_mock.request_history}
+    assert seeds == {7, 8, 9}
+    assert result.llm_output is not None
+    assert result.llm_output["token_usage"]["total_tokens"] == 21
+    for generation in result.generations[1:]:
+        assert "token_usage" not in generation.message.response_metadata  # type: ignore
+
+
+def test_generate_n_fallback_partial_usage(requests_mock: Mocker) -> None:
+    usage = {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7}
+    requests_mock.post(
+        "http://localhost:8888/v1/chat/completions",
+        [
+            {"json": {"choices": [_choice(0, "first")], "usage": usage}},
+            {"json": {"choices": [_choice(0, "no usage")]}},
+            {"json": {"choices": [_choice(0, "last")], "usage": usage}},
+        ],
+    )
+    llm = ChatNVIDIA(base_url="http://localhost:8888/v1", max_concurrency=1)
+    result = llm._generate([HumanMessage(content="hello")], n=3)
+    assert sorted(g.text for g in result.generations) == ["first", "last", "no usage"]
+    # a response without usage does not drop the usage of the others
+    assert result.llm_output is not None
+    assert result.llm_output["token_usage"] == {
+        "prompt_tokens": 10,
+        "completion_tokens": 4,
+        "total_tokens": 14,
+    }
+
+
+def test_stream_n_choices_demux(requests_mock: Mocker) -> None:
+    events = [
+        {"choices": [{"index": 0, "delta": {"role": "assistant", "content": "A"}}]},
+        {"choices": [{"index": 1, "delta": {"role": "assistant", "content": "X"}}]},
+        {"choices": [{"index": 0, "delta": {"content": "B"}, "finish_reason": None}]},
+        {"choices": [{"index": 1, "delta": {"content": "Y"}, "finish_reason": "stop"}]},
+        {"choices": [{"index": 0, "delta": {"content": ""}, "finish_reason": "stop"}]},
+    ]
+    requests_mock.post(
+        "http://localhost:8888/v1/chat/completions",
+        text="".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n",
+    )
+    llm = ChatNVIDIA(base_url="http://localhost:8888/v1", n=2)
+    contents: dict = {}
+    for msg in llm._client.client.get_req_stream(payload={"n": 2}):
+        contents[msg["index"]] = contents.get(msg["index"], "") + msg["content"]
+    assert contents == {0: "AB", 1: "XY"}
+
+
+def test_stream_does_not_send_n(requests_mock: Mocker) -> None:
+    events = [
+        {"choices": [{"index": 0, "delta": {"role": "assistant", "content": "A"}}]},
+        {"choices": [{"index": 0, "delta": {"content": "B"}, "finish_reason": "stop"}]},
+    ]
+    requests_mock.post(
+        "http://localhost:8888/v1/chat/completions",
+        text="".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n",
+    )
+    llm = ChatNVIDIA(base_url="http://localhost:8888/v1", n=2)
+    assert "".join(chunk.content for chunk in llm.stream("hello")) == "AB"  # type: ignore
+    assert requests_mock.last_request is not None
+    assert "n" not in requests_mock.last_request.json()
+
+
+def test_preprocess_multi_part_content(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = []
+
+    def fake_b64(image_source: str) -> str:
+        calls.append(image_source)
+        return "data:image/png;base64,AAAA"
+
+    monkeypatch.setattr(
+        "langchain_nvidia_ai_endpoints.chat_models._url_to_b64_string", fake_b64
+    )
+    llm = ChatNVIDIA(base_url="http://localhost:8888/v1")
+    history = [
+        HumanMessage(
+            content=[
+                {"type": "text", "text": "describe"},
+                {"type": "image_url", "image_url": {"url": "data:image/png;base64,A"}},
+            ]
+        ),
+        HumanMessage(
+            content=[
+                {"type": "text", "text": "and"},
+                {"type": "image_url", "image_url": {"url": "https://host/img.png"}},
+            ]
+        ),
+        HumanMessage(content=["42", {"type": "text", "text": " more"}]),
+    ]
+    assert llm._custom_preprocess(history) == [
+        {"role": "user", "content": 'describe<img src="data:image/png;base64,AAAA" />'},
+        {"role": "user", "content": 'and<img src="data:image/png;base64,AAAA" />'},
+        {"role": "user", "content": "42 more"},
+    ]
+    assert calls == ["data:image/png;base64,A", "https://host/img.png"]
+
+
+def test_preprocess_non_serialisable_content() -> None:
+    class Text:
+        def __str__(self) -> str:
+            return "text"
+
+    llm = ChatNVIDIA(base_url="http://localhost:8888/v1")
+    message = HumanMessage(content=[{"type": "text", "text": Text()}])
+    assert llm._custom_preprocess([message]) == [{"role": "user", "content": "text"}]
+
+
+def test_payload_non_str_keys(requests_mock: Mocker) -> None:
+    _mock_chat_completions(requests_mock, "http://localhost:8888/v1/chat/completions")
+    llm = ChatNVIDIA(base_url="http://localhost:8888/v1")
+    assert llm.invoke("hello", logit_bias={123: -100}).content == "echo: hello"
+    assert requests_mock.last_request is not None
+    assert requests_mock.last_request.json()["logit_bias"] == {"123": -100}
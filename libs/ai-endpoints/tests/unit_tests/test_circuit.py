@@ -0,0 +1,138 @@
+import pickle
+import time
+
+import pytest
+from langchain_core.language_models import FakeListChatModel
+from requests_mock import Mocker
+
+from langchain_nvidia_ai_endpoints import ChatNVIDIA, NVIDIAEmbeddings
+from langchain_nvidia_ai_endpoints.circuit import CircuitBreaker, CircuitOpenError
+
+BASE_URL = "http://localhost:8888/v1"
+CHAT_URL = f"{BASE_URL}/chat/completions"
+EMBEDDINGS_URL = f"{BASE_URL}/embeddings"
+
+
+def _fail(embedder: NVIDIAEmbeddings, times: int) -> None:
+    for _ in range(times):
+        with pytest.raises(Exception, match="Unavailable"):
+            embedder.embed_query("hello")
+
+
+def test_opens_and_fails_fast(requests_mock: Mocker) -> None:
+    requests_mock.post(EMBEDDINGS_URL, status_code=503, json={"title": "Unavailable"})
+    breaker = CircuitBreaker(min_calls=4, window=4)
+    embedder = NVIDIAEmbeddings(base_url=BASE_URL, circuit_breaker=breaker)
+    _fail(embedder, 4)
+    assert breaker.state(EMBEDDINGS_URL) == "open"
+    with pytest.raises(CircuitOpenError) as exc_info:
+        embedder.embed_query("hello")
+    assert exc_info.value.endpoint == EMBEDDINGS_URL
+    assert 0 < exc_info.value.retry_after <= breaker.open_time
+    assert requests_mock.call_count == 4
+
+
+def test_failure_rate(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        EMBEDDINGS_URL,
+        [
+            {"json": {"data": [{"embedding": [0.1], "index": 0}]}},
+            {"status_code": 500, "json": {"title": "Unavailable"}},
+        ]
+        * 5,
+    )
+    breaker = CircuitBreaker(failure_rate=0.6, min_calls=4, window=10)
+    embedder = NVIDIAEmbeddings(base_url=BASE_URL, circuit_breaker=breaker)
+    for _ in range(5):
+        embedder.embed_query("hello")
+        _fail(embedder, 1)
+    ## half of the calls failed, below the threshold
+    assert breaker.state(EMBEDDINGS_URL) == "closed"
+
+
+def test_client_errors_do_not_open(requests_mock: Mocker) -> None:
+    requests_mock.post(EMBEDDINGS_URL, status_code=400, json={"title": "Bad"})
+    breaker = CircuitBreaker(min_calls=1)
+    embedder = NVIDIAEmbeddings(base_url=BASE_URL, circuit_breaker=breaker)
+    for _ in range(3):
+        with pytest.raises(Exception, match="Bad"):
+            embedder.embed_query("hello")
+    assert breaker.state(EMBEDDINGS_URL) == "closed"
+
+
+def test_half_open(requests_mock: Mocker) -> None:
+    requests_mock.post(EMBEDDINGS_URL, status_code=503, json={"title": "Unavailable"})
+    breaker = CircuitBreaker(min_calls=2, open_time=0.05, half_open_calls=2)
+    embedder = NVIDIAEmbeddings(base_url=BASE_URL, circuit_breaker=breaker)
+    _fail(embedder, 2)
+    time.sleep(0.06)
+    assert breaker.state(EMBEDDINGS_URL) == "half_open"
+    ## a failed probe opens the circuit again
+    _fail(embedder, 1)
+    assert breaker.state(EMBEDDINGS_URL) == "open"
+
+    time.sleep(0.06)
+    requests_mock.post(
+        EMBEDDINGS_URL, json={"data": [{"embedding": [0.1], "index": 0}]}
+    )
+    embedder.embed_query("hello")
+    assert breaker.state(EMBEDDINGS_URL) == "half_open"
+    embedder.embed_query("hello")
+    assert breaker.state(EMBEDDINGS_URL) == "closed"
+
+
+def test_half_open_limits_probes() -> None:
+    breaker = CircuitBreaker(min_calls=1, open_time=0.05)
+    breaker.admit("url")
+    breaker.record("url", None, failed=True)
+    time.sleep(0.06)
+    breaker.admit("url")
+    ## the probe has not reported back yet
+    with pytest.raises(CircuitOpenError):
+        breaker.admit("url")
+    ## an abandoned probe frees its slot after open_time
+    time.sleep(0.06)
+    breaker.admit("url")
+
+
+def test_slow_calls() -> None:
+    breaker = CircuitBreaker(slow_call_duration=1.0, slow_call_rate=0.5, min_calls=4)
+    for latency in [0.1, 2.0, 0.1]:
+        breaker.admit("url")
+        breaker.record("url", latency, failed=False)
+    assert breaker.state("url") == "closed"
+    breaker.admit("url")
+    breaker.record("url", 2.0, failed=False)
+    assert breaker.state("url") == "open"
+    assert breaker.state("other") == "closed"
+
+
+def test_stream_and_fallback(requests_mock: Mocker) -> None:
+    requests_mock.post(CHAT_URL, status_code=502, json={"title": "Unavailable"})
+    breaker = CircuitBreaker(min_calls=2)
+    llm = ChatNVIDIA(base_url=BASE_URL, circuit_breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(Exception, match="Unavailable"):
+            list(llm.stream("hello"))
+    with pytest.raises(CircuitOpenError):
+        llm.invoke("hello")
+    chain = llm.with_fallbacks([FakeListChatModel(responses=["backup"])])
+    assert chain.invoke("hello").content == "backup"
+    assert requests_mock.call_count == 2
+
+
+def test_min_calls_within_window() -> None:
+    with pytest.raises(ValueError, match="min_calls"):
+        CircuitBreaker(window=5, min_calls=10)
+    assert CircuitBreaker(window=5, min_calls=5).min_calls == 5
+
+
+def test_pickle() -> None:
+    breaker = CircuitBreaker(min_calls=1)
+    breaker.admit("url")
+    breaker.record("url", None, failed=True)
+    restored = pickle.loads(pickle.dumps(breaker))
+    assert restored == breaker
+    assert restored.state("url") == "closed"
+    embedder = NVIDIAEmbeddings(api_key="BOGUS", circuit_breaker=breaker)
+    assert pickle.loads(pickle.dumps(embedder)).circuit_breaker == breaker
@@ -0,0 +1,130 @@
+import gzip
+import importlib.util
+import json
+from typing import Any, Callable, Optional, Tuple
+
+import pytest
+from requests_mock import Mocker
+
+from langchain_nvidia_ai_endpoints import ChatNVIDIA, NVIDIAEmbeddings
+from langchain_nvidia_ai_endpoints.compression import _fallback_encoding
+
+URL = "http://localhost:8888/v1/embeddings"
+
+
+@pytest.fixture
+def embedder() -> NVIDIAEmbeddings:
+    return NVIDIAEmbeddings(
+        base_url="http://localhost:8888/v1",
+        compression="gzip",
+        compression_threshold=1024,
+    )
+
+
+def _embeddings(count: int) -> dict:
+    return {"data": [{"embedding": [0.1], "index": i} for i in range(count)]}
+
+
+def test_compresses_large_bodies(
+    requests_mock: Mocker, embedder: NVIDIAEmbeddings
+) -> None:
+    requests_mock.post(URL, json=_embeddings(2))
+    texts = ["a long passage " * 100, "another long passage " * 100]
+    embedder.embed_documents(texts)
+    request = requests_mock.last_request
+    assert request.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(request.body))["input"] == texts
+
+    requests_mock.post(URL, json=_embeddings(1))
+    embedder.embed_query("short")
+    request = requests_mock.last_request
+    assert "Content-Encoding" not in request.headers
+    assert json.loads(request.body)["input"] == ["short"]
+
+
+def test_accept_encoding(requests_mock: Mocker) -> None:
+    requests_mock.post(URL, json=_embeddings(1))
+    NVIDIAEmbeddings(base_url="http://localhost:8888/v1").embed_query("hello")
+    assert "gzip" in requests_mock.last_request.headers["Accept-Encoding"]
+    assert "Content-Encoding" not in requests_mock.last_request.headers
+
+
+def test_refused_encoding(requests_mock: Mocker, embedder: NVIDIAEmbeddings) -> None:
+    requests_mock.post(
+        URL,
+        [
+            {"status_code": 415, "headers": {"Accept-Encoding": "identity"}},
+            {"json": _embeddings(1)},
+        ],
+    )
+    text = "a long passage " * 100
+    assert embedder.embed_query(text) == [0.1]
+    first, second = requests_mock.request_history
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert "Content-Encoding" not in second.headers
+    assert json.loads(second.body)["input"] == [text]
+    ## the endpoint is not sent compressed requests again
+    embedder.embed_query(text)
+    assert "Content-Encoding" not in requests_mock.last_request.headers
+    assert requests_mock.call_count == 3
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, refused, expected",
+    [
+        (None, "gzip", None),
+        ("identity", "gzip", None),
+        ("gzip, identity", "gzip", None),
+        ("gzip;q=1.0", "zstd", "gzip"),
+        ("GZIP", "zstd", "gzip"),
+        ("gzip;q=0", "zstd", None),
+    ],
+)
+def test_fallback_encoding(
+    accept_encoding: Optional[str], refused: str, expected: Optional[str]
+) -> None:
+    assert _fallback_encoding(accept_encoding, refused) == expected
+
+
+def _refuses_compression(request: Any, body: Any) -> Optional[Tuple[int, Any]]:
+    if request.headers.get("Content-Encoding"):
+        return 415, {"title": "Unsupported Media Type"}
+    request.send_response(200)
+    request.send_header("Content-Type", "text/event-stream")
+    request.send_header("Transfer-Encoding", "chunked")
+    request.end_headers()
+    delta = {"choices": [{"index": 0, "delta": {"content": body["messages"][0]}}]}
+    data = f"data: {json.dumps(delta)}\n\n".encode()
+    request.wfile.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(data), data))
+    return None
+
+
+@pytest.mark.parametrize("compression", ["gzip", None])
+def test_stream(local_server: Callable, compression: Optional[str]) -> None:
+    llm = ChatNVIDIA(
+        base_url=local_server(_refuses_compression),
+        compression=compression,
+        compression_threshold=0,
+    )
+    client = llm._client.client
+    chunks = list(client.get_req_stream({"messages": ["hi"]}))
+    assert [chunk["content"] for chunk in chunks] == ["hi"]
+    if compression:
+        assert client._request_encodings == {client.last_inputs["url"]: None}
+
+
+async def test_astream(local_server: Callable) -> None:
+    client = ChatNVIDIA(
+        base_url=local_server(_refuses_compression),
+        compression="gzip",
+        compression_threshold=0,
+    )._client.client
+    chunks = [msg async for msg in client.get_req_astream({"messages": ["hi"]})]
+    assert [chunk["content"] for chunk in chunks] == ["hi"]
+
+
+def test_zstd_requires_zstandard() -> None:
+    if importlib.util.find_spec("zstandard") is not None:
+        pytest.skip("zstandard is installed")
+    with pytest.raises(ImportError, match="zstandard"):
+        NVIDIAEmbeddings(base_url="http://localhost:8888/v1", compression="zstd")
@@ -1,3 +1,4 @@
+import json
 from typing import Any, Generator, Literal
 
 import pytest
@@ -93,4 +94,30 @@ def test_embed_model_type_deprecated(model_type: Literal["query", "passage"]) ->
         x.model_type = model_type
 
 
+def test_embed_json_codec(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        "http://localhost:8888/v1/embeddings",
+        json={
+            "data": [
+                {"embedding": [0.3], "index": 1},
+                {"embedding": [0.1], "index": 0},
+            ],
+            "usage": {"prompt_tokens": 8, "total_tokens": 8},
+        },
+    )
+    embedder = NVIDIAEmbeddings(base_url="http://localhost:8888/v1")
+    calls = []
+
+    def json_loads(data: Any) -> Any:
+        calls.append(data)
+        return json.loads(data)
+
+    embedder._client.client.json_loads_fn = json_loads
+    assert embedder.embed_documents(["a", "b"]) == [[0.1], [0.3]]
+    assert len(calls) == 1
+    request = requests_mock.last_request
+    assert request.headers["Content-Type"] == "application/json"
+    assert request.json()["input"] == ["a", "b"]
+
+
 # todo: test max_batch_size (-50, 0, 1, 50)
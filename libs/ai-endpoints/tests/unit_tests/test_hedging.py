@@ -0,0 +1,166 @@
+import pickle
+import select
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+import pytest
+from requests_mock import Mocker
+
+from langchain_nvidia_ai_endpoints import NVIDIAEmbeddings, NVIDIARerank
+from langchain_nvidia_ai_endpoints.circuit import CircuitBreaker
+from langchain_nvidia_ai_endpoints.hedging import HedgingPolicy
+
+
+def _slow_first(response: Any, delay: float) -> Tuple[Callable, List[Any]]:
+    """Server handler answering the first request after `delay`, later ones at once"""
+    calls: List[Any] = []
+    lock = threading.Lock()
+
+    def handler(request: Any, body: Any) -> Optional[Tuple[int, Any]]:
+        with lock:
+            calls.append(body)
+            first = len(calls) == 1
+        if first:
+            time.sleep(delay)
+        return 200, response
+
+    return handler, calls
+
+
+def test_hedge_wins(local_server: Callable) -> None:
+    handler, calls = _slow_first({"data": [{"embedding": [0.1], "index": 0}]}, 1.0)
+    base_url = local_server(handler)
+    policy = HedgingPolicy(initial_delay=0.05, max_extra_load=1.0)
+    embedder = NVIDIAEmbeddings(base_url=base_url, hedging=policy)
+    start = time.perf_counter()
+    assert embedder.embed_query("hello") == [0.1]
+    assert time.perf_counter() - start < 0.5
+    assert len(calls) == 2
+    assert policy.hedges == {f"{base_url}/embeddings": 1}
+    ## attempts run on the client's own pool
+    assert embedder._client.client._hedge_executor is not None
+
+
+def test_hedge_loser_released(local_server: Callable) -> None:
+    closed = threading.Event()
+    calls: List[Any] = []
+    lock = threading.Lock()
+
+    def handler(request: Any, body: Any) -> Optional[Tuple[int, Any]]:
+        with lock:
+            calls.append(body)
+            first = len(calls) == 1
+        if first:
+            ## never answer, until the client closes the connection
+            conn = request.connection
+            deadline = time.monotonic() + 5.0
+            while time.monotonic() < deadline:
+                if select.select([conn], [], [], 0.01)[0]:
+                    if not conn.recv(1, socket.MSG_PEEK):
+                        closed.set()
+                        return None
+            return 200, {"data": [{"embedding": [0.0], "index": 0}]}
+        return 200, {"data": [{"embedding": [0.1], "index": 0}]}
+
+    base_url = local_server(handler)
+    policy = HedgingPolicy(initial_delay=0.05, max_extra_load=1.0)
+    breaker = CircuitBreaker(min_calls=1, window=1)
+    embedder = NVIDIAEmbeddings(
+        base_url=base_url, hedging=policy, circuit_breaker=breaker
+    )
+    assert embedder.embed_query("hello") == [0.1]
+    ## the first request is abandoned, its connection closed long before it answers
+    assert closed.wait(1.0)
+    assert policy.abandoned == {f"{base_url}/embeddings": 1}
+    ## and its failure is not held against the endpoint
+    executor = embedder._client.client._hedge_executor
+    assert executor is not None
+    executor.shutdown(wait=True)
+    assert breaker.state(f"{base_url}/embeddings") == "closed"
+
+
+def test_hedge_loser_abandoned() -> None:
+    policy = HedgingPolicy(initial_delay=0.05, max_extra_load=1.0)
+    stopped = threading.Event()
+    abandoned: List[int] = []
+
+    def attempt(index: int) -> int:
+        if index == 0:
+            stopped.wait(5.0)
+        return index
+
+    def abandon(index: int) -> None:
+        abandoned.append(index)
+        stopped.set()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        start = time.perf_counter()
+        assert policy.call("url", attempt, executor=executor, abandon=abandon) == 1
+    ## the executor waited for the original request, which stopped at once
+    assert time.perf_counter() - start < 1.0
+    assert abandoned == [0]
+    assert policy.abandoned == {"url": 1}
+
+
+def test_hedge_budget(local_server: Callable) -> None:
+    handler, calls = _slow_first({"rankings": [{"index": 0, "logit": 1.0}]}, 0.2)
+    policy = HedgingPolicy(initial_delay=0.01, max_extra_load=0.5)
+    ranker = NVIDIARerank(base_url=local_server(handler), hedging=policy)
+    ## the first request only earns half a hedge, so it is not hedged
+    ranker._rank(["doc"], "query")
+    assert len(calls) == 1
+    assert policy.hedges == {}
+
+
+def test_no_hedge_on_fast_error(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        "http://localhost:8888/v1/embeddings", status_code=400, json={"title": "Bad"}
+    )
+    policy = HedgingPolicy(initial_delay=0.5, max_extra_load=1.0)
+    embedder = NVIDIAEmbeddings(base_url="http://localhost:8888/v1", hedging=policy)
+    with pytest.raises(Exception, match="Bad"):
+        embedder.embed_query("hello")
+    assert requests_mock.call_count == 1
+
+
+def test_no_hedge_while_queued() -> None:
+    policy = HedgingPolicy(initial_delay=0.05, max_extra_load=1.0)
+    attempts: List[int] = []
+
+    def attempt(index: int) -> int:
+        attempts.append(index)
+        return index
+
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        ## the only worker is busy for longer than the hedge delay
+        executor.submit(release.wait)
+        timer = threading.Timer(0.2, release.set)
+        timer.start()
+        assert policy.call("url", attempt, executor=executor) == 0
+    assert attempts == [0]
+    assert policy.hedges == {}
+
+
+def test_delay_percentile() -> None:
+    policy = HedgingPolicy(percentile=90, min_samples=10, max_delay=1.0)
+    assert policy.delay("url") == policy.initial_delay
+    for i in range(1, 101):
+        policy.observe("url", i / 100)
+    assert policy.delay("url") == 0.9
+    assert policy.delay("other") == policy.initial_delay
+    policy.observe("url", 10.0)
+    assert policy.delay("url") == 0.91
+
+
+def test_pickle() -> None:
+    policy = HedgingPolicy(min_samples=1)
+    policy.observe("url", 1.0)
+    restored = pickle.loads(pickle.dumps(policy))
+    assert restored == policy
+    assert restored.delay("url") == policy.initial_delay
+    embedder = NVIDIAEmbeddings(api_key="BOGUS", hedging=policy)
+    assert pickle.loads(pickle.dumps(embedder)).hedging == policy
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import pickle
+import time
+from functools import partial
+from typing import Any, Callable, Optional, Tuple
+
+import aiohttp
+import pytest
+import requests
+
+from langchain_nvidia_ai_endpoints import ChatNVIDIA, NVIDIAEmbeddings
+from langchain_nvidia_ai_endpoints.http2 import AsyncHTTP2Session, HTTP2Session
+from langchain_nvidia_ai_endpoints.timeouts import Timeouts
+
+pytest.importorskip("httpx")
+
+
+def _nim(pause: float = 0.0) -> Callable[[Any, Any], Optional[Tuple[int, Any]]]:
+    """Handler of a fake NIM answering embeddings, chat and chat streams"""
+
+    def handler(request: Any, body: Any) -> Optional[Tuple[int, Any]]:
+        if request.path.endswith("/embeddings"):
+            return 200, {"data": [{"embedding": [0.1], "index": 0}]}
+        if not body.get("stream", True):
+            return 200, {"choices": [{"message": {"content": "Hi"}}]}
+        request.send_response(200)
+        request.send_header("Content-Type", "text/event-stream")
+        request.send_header("Transfer-Encoding", "chunked")
+        request.end_headers()
+        try:
+            for content in ["Hello", " world"]:
+                delta = {"choices": [{"index": 0, "delta": {"content": content}}]}
+                data = f"data: {json.dumps(delta)}\n\n".encode()
+                request.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                request.wfile.flush()
+                time.sleep(pause)
+            request.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            pass  # the client gave up
+        return None
+
+    return handler
+
+
+def _chat(base_url: str, **kwargs: Any) -> ChatNVIDIA:
+    llm = ChatNVIDIA(base_url=base_url, **kwargs)
+    llm._client.client.get_session_fn = lambda: HTTP2Session(http2=False)
+    llm._client.client.get_asession_fn = lambda **_: AsyncHTTP2Session(http2=False)
+    return llm
+
+
+def test_invoke_and_stream(local_server: Callable) -> None:
+    llm = _chat(local_server(_nim()))
+    assert llm.invoke("hello").content == "Hi"
+    assert "".join(str(c.content) for c in llm.stream("hello")) == "Hello world"
+    session = llm._client.client._get_session()
+    assert isinstance(session, HTTP2Session)
+    response = llm._client.client.last_response
+    assert response.status_code == 200
+    assert response.request.body
+
+
+async def test_astream(local_server: Callable) -> None:
+    client = _chat(local_server(_nim()))._client.client
+    chunks = [msg["content"] async for msg in client.get_req_astream({"messages": []})]
+    assert chunks == ["Hello", " world"]
+
+
+def test_errors(local_server: Callable) -> None:
+    base_url = local_server(lambda request, body: (503, {"title": "Unavailable"}))
+    llm = _chat(base_url)
+    with pytest.raises(Exception, match="Unavailable") as exc_info:
+        llm.invoke("hello")
+    assert getattr(exc_info.value, "status_code", None) == 503
+    ## nothing listens on the port of a closed server
+    llm = _chat("http://127.0.0.1:9/v1")
+    with pytest.raises(requests.exceptions.ConnectionError):
+        llm.invoke("hello")
+
+
+async def test_async_errors(local_server: Callable) -> None:
+    base_url = local_server(lambda request, body: (503, {"title": "Unavailable"}))
+    client = _chat(base_url)._client.client
+    with pytest.raises(aiohttp.ClientResponseError) as exc_info:
+        async for _ in client.get_req_astream({"messages": []}):
+            pass
+    assert exc_info.value.status == 503
+
+
+def test_idle_timeout(local_server: Callable) -> None:
+    llm = _chat(local_server(_nim(pause=2.0)), timeouts=Timeouts(idle=0.2))
+    start = time.perf_counter()
+    with pytest.raises(requests.exceptions.ConnectionError, match="timed out"):
+        list(llm.stream("hello"))
+    assert time.perf_counter() - start < 1.0
+
+
+def _http2_chat(base_url: str, monkeypatch: pytest.MonkeyPatch) -> ChatNVIDIA:
+    """A chat model with `http2` on, whose clients speak HTTP/1.1 without h2"""
+    monkeypatch.setattr(
+        "langchain_nvidia_ai_endpoints._common.AsyncHTTP2Session",
+        partial(AsyncHTTP2Session, http2=False),
+    )
+    return ChatNVIDIA(base_url=base_url, http2=True)
+
+
+async def _astream_client(client: Any) -> Any:
+    """Stream a chat, returning the httpx client shared on the running loop"""
+    async for _ in client.get_req_astream({"messages": []}):
+        pass
+    return client._asessions[asyncio.get_running_loop()][0]
+
+
+async def test_shared_async_client(
+    local_server: Callable, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    client = _http2_chat(local_server(_nim()), monkeypatch)._client.client
+    shared = await _astream_client(client)
+    assert await _astream_client(client) is shared
+    assert not shared.is_closed
+
+
+def test_async_client_closed_with_loop(
+    local_server: Callable, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    client = _http2_chat(local_server(_nim()), monkeypatch)._client.client
+    first = asyncio.run(_astream_client(client))
+    assert first.is_closed
+    second = asyncio.run(_astream_client(client))
+    assert second is not first and second.is_closed
+    assert not client._asessions
+
+
+def test_http2_setting(local_server: Callable) -> None:
+    pytest.importorskip("h2")
+    embedder = NVIDIAEmbeddings(base_url=local_server(_nim()), http2=True)
+    assert embedder.embed_query("hello") == [0.1]
+    assert isinstance(embedder._client.client._get_session(), HTTP2Session)
+    assert pickle.loads(pickle.dumps(embedder)).http2
+
+
+def test_sessions_not_pickled(local_server: Callable) -> None:
+    embedder = NVIDIAEmbeddings(base_url=local_server(_nim()))
+    embedder._client.client.get_session_fn = partial(HTTP2Session, http2=False)
+    embedder.embed_query("hello")
+    assert embedder._client.client._session is not None
+    restored = pickle.loads(pickle.dumps(embedder))
+    assert restored._client.client._session is None
+    assert restored.embed_query("hello") == [0.1]
@@ -0,0 +1,134 @@
+import json
+from typing import Dict, List
+
+import pytest
+from requests_mock import Mocker
+
+from langchain_nvidia_ai_endpoints import ChatNVIDIA, NVIDIAEmbeddings
+from langchain_nvidia_ai_endpoints.metrics import (
+    HistogramSample,
+    MetricsCallbackHandler,
+    PrometheusExporter,
+    _request_metrics,
+    get_metrics_callback,
+    metrics_callback_var,
+)
+
+URL = "http://localhost:8888/v1/chat/completions"
+
+
+def _counts(cb: MetricsCallbackHandler) -> Dict[str, int]:
+    return {sample.name: sample.count for sample in cb.collect()}
+
+
+def _sse(events: List[dict]) -> str:
+    return "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+
+
+@pytest.mark.parametrize("method", ["stream", "astream"])
+async def test_stream_metrics(requests_mock: Mocker, method: str) -> None:
+    requests_mock.post(
+        URL,
+        text=_sse(
+            [
+                {"choices": [{"index": 0, "delta": {"content": "Hi"}}]},
+                {"choices": [{"index": 0, "delta": {"content": " there"}}]},
+                {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]},
+            ]
+        ),
+    )
+    llm = ChatNVIDIA(model="mock-model", base_url="http://localhost:8888/v1")
+    with get_metrics_callback() as cb:
+        if method == "stream":
+            list(llm.stream("hello"))
+        else:
+            [chunk async for chunk in llm.astream("hello")]
+    assert _counts(cb) == {
+        "inter_token_latency_seconds": 1,
+        "request_bytes": 1,
+        "request_latency_seconds": 1,
+        "response_bytes": 1,
+        "time_to_first_token_seconds": 1,
+        "tokens_per_second": 1,
+    }
+    assert {(s.model, s.endpoint) for s in cb.collect()} == {("mock-model", URL)}
+
+
+def test_invoke_metrics(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        URL,
+        json={
+            "choices": [{"index": 0, "message": {"content": "Hi"}}],
+            "usage": {"prompt_tokens": 3, "completion_tokens": 5, "total_tokens": 8},
+        },
+    )
+    llm = ChatNVIDIA(model="mock-model", base_url="http://localhost:8888/v1")
+    with get_metrics_callback() as cb:
+        llm.invoke("hello")
+    assert _counts(cb) == {
+        "request_bytes": 1,
+        "request_latency_seconds": 1,
+        "response_bytes": 1,
+        "tokens_per_second": 1,
+    }
+    samples = {s.name: s for s in cb.collect()}
+    assert samples["request_bytes"].sum == len(requests_mock.last_request.body)
+    assert samples["tokens_per_second"].sum > 0
+
+
+def test_queue_time(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        "https://ai.api.nvidia.com/v1/retrieval/nvidia/embeddings",
+        status_code=202,
+        headers={"NVCF-REQID": "REQ"},
+    )
+    requests_mock.get(
+        "https://api.nvcf.nvidia.com/v2/nvcf/pexec/status/REQ",
+        json={"data": [{"embedding": [0.1, 0.2], "index": 0}]},
+    )
+    embedder = NVIDIAEmbeddings(model="NV-Embed-QA", api_key="BOGUS", interval=0)
+    with get_metrics_callback() as cb:
+        assert embedder.embed_query("hello") == [0.1, 0.2]
+    assert _counts(cb)["queue_time_seconds"] == 1
+    assert {s.model for s in cb.collect()} == {"NV-Embed-QA"}
+
+
+def test_disabled(requests_mock: Mocker) -> None:
+    requests_mock.post(URL, json={"choices": [{"message": {"content": "Hi"}}]})
+    with get_metrics_callback() as cb:
+        pass
+    assert metrics_callback_var.get() is None
+    assert _request_metrics({}, URL) is None
+    ChatNVIDIA(base_url="http://localhost:8888/v1").invoke("hello")
+    assert cb.collect() == []
+
+
+def test_prometheus_export() -> None:
+    exporter = PrometheusExporter(namespace="test")
+    cb = MetricsCallbackHandler(
+        buckets={"request_latency_seconds": [1, 0.1]}, exporters=[exporter]
+    )
+    for value in (0.05, 0.5, 5):
+        cb.observe("request_latency_seconds", value, 'a "model"', "url")
+    cb.export()
+    assert cb.collect() == [
+        HistogramSample(
+            name="request_latency_seconds",
+            model='a "model"',
+            endpoint="url",
+            buckets=(0.1, 1),
+            counts=(1, 1, 1),
+            sum=5.55,
+            count=3,
+        )
+    ]
+    labels = 'model="a \\"model\\"",endpoint="url"'
+    assert exporter.text.splitlines()[2:] == [
+        f'test_request_latency_seconds_bucket{{{labels},le="0.1"}} 1',
+        f'test_request_latency_seconds_bucket{{{labels},le="1"}} 2',
+        f'test_request_latency_seconds_bucket{{{labels},le="+Inf"}} 3',
+        f"test_request_latency_seconds_sum{{{labels}}} 5.55",
+        f"test_request_latency_seconds_count{{{labels}}} 3",
+    ]
+    cb.reset()
+    assert cb.to_prometheus() == ""
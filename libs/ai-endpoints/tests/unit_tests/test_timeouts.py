@@ -0,0 +1,189 @@
+import json
+import time
+from typing import Any, Callable, Optional, Tuple
+
+import pytest
+import requests
+from requests_mock import Mocker
+
+from langchain_nvidia_ai_endpoints import ChatNVIDIA, NVIDIAEmbeddings
+from langchain_nvidia_ai_endpoints.timeouts import Timeouts
+
+
+def _event(content: str) -> bytes:
+    delta = {"choices": [{"index": 0, "delta": {"content": content}}]}
+    return f"data: {json.dumps(delta)}\n\n".encode()
+
+
+def _stream(
+    chunks: int, pause: float, header_delay: float = 0.0
+) -> Callable[[Any, Any], Optional[Tuple[int, Any]]]:
+    """Handler streaming `chunks` events, `pause` seconds apart"""
+
+    def handler(request: Any, body: Any) -> Optional[Tuple[int, Any]]:
+        time.sleep(header_delay)
+        request.send_response(200)
+        request.send_header("Content-Type", "text/event-stream")
+        request.send_header("Transfer-Encoding", "chunked")
+        request.end_headers()
+        try:
+            for i in range(chunks):
+                if i:
+                    time.sleep(pause)
+                data = _event(str(i))
+                request.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                request.wfile.flush()
+            request.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            pass  # the client gave up
+        return None
+
+    return handler
+
+
+def test_stream_stalls(local_server: Callable) -> None:
+    llm = ChatNVIDIA(
+        base_url=local_server(_stream(2, pause=2.0)), timeouts=Timeouts(idle=0.2)
+    )
+    received = []
+    start = time.perf_counter()
+    with pytest.raises(requests.exceptions.ConnectionError, match="Read timed out"):
+        for chunk in llm.stream("hello"):
+            received.append(chunk.content)
+    assert received == ["0"]
+    assert time.perf_counter() - start < 1.0
+
+
+async def test_astream_stalls(local_server: Callable) -> None:
+    llm = ChatNVIDIA(
+        base_url=local_server(_stream(2, pause=2.0)), timeouts=Timeouts(idle=0.2)
+    )
+    received = []
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError, match="No response chunk within 0.20s"):
+        async for msg in llm._client.client.get_req_astream({"messages": []}):
+            received.append(msg["content"])
+    assert received == ["0"]
+    assert time.perf_counter() - start < 1.0
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_first_byte(local_server: Callable, stream: bool) -> None:
+    llm = ChatNVIDIA(
+        base_url=local_server(_stream(1, pause=0.0, header_delay=2.0)),
+        timeouts=Timeouts(first_byte=0.2),
+    )
+    start = time.perf_counter()
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        if stream:
+            list(llm.stream("hello"))
+        else:
+            llm.invoke("hello")
+    assert time.perf_counter() - start < 1.0
+
+
+async def test_first_byte_async(local_server: Callable) -> None:
+    llm = ChatNVIDIA(
+        base_url=local_server(_stream(1, pause=0.0, header_delay=2.0)),
+        timeouts=Timeouts(first_byte=0.2),
+    )
+    with pytest.raises(TimeoutError, match="No response headers"):
+        async for _ in llm._client.client.get_req_astream({"messages": []}):
+            pass
+
+
+def test_stream_total(local_server: Callable) -> None:
+    ## every chunk arrives within the idle timeout, but the stream goes on too long
+    llm = ChatNVIDIA(
+        base_url=local_server(_stream(20, pause=0.1)),
+        timeouts=Timeouts(idle=1.0, total=0.35),
+    )
+    received = []
+    with pytest.raises(TimeoutError, match="Total timeout of 0.35s"):
+        for chunk in llm.stream("hello"):
+            received.append(chunk.content)
+    assert 2 <= len(received) <= 5
+
+
+async def test_astream_total(local_server: Callable) -> None:
+    llm = ChatNVIDIA(
+        base_url=local_server(_stream(20, pause=0.1)),
+        timeouts=Timeouts(idle=1.0, total=0.35),
+    )
+    with pytest.raises(TimeoutError):
+        async for _ in llm._client.client.get_req_astream({"messages": []}):
+            pass
+
+
+def test_polling_total(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        "https://ai.api.nvidia.com/v1/retrieval/nvidia/embeddings",
+        status_code=202,
+        headers={"NVCF-REQID": "REQ-1"},
+    )
+    requests_mock.get(
+        "https://api.nvcf.nvidia.com/v2/nvcf/pexec/status/REQ-1",
+        status_code=202,
+        headers={"NVCF-REQID": "REQ-1"},
+    )
+    embedder = NVIDIAEmbeddings(
+        model="NV-Embed-QA", api_key="BOGUS", timeouts=Timeouts(total=0.1)
+    )
+    with pytest.raises(TimeoutError):
+        embedder.embed_query("hello")
+    ## polls are bounded by the time left until the deadline
+    connect, read = requests_mock.last_request.timeout
+    assert connect == 10.0
+    assert read <= 0.1
+
+
+def test_polling_without_total(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        "https://ai.api.nvidia.com/v1/retrieval/nvidia/embeddings",
+        status_code=202,
+        headers={"NVCF-REQID": "REQ-1"},
+    )
+    requests_mock.get(
+        "https://api.nvcf.nvidia.com/v2/nvcf/pexec/status/REQ-1",
+        status_code=202,
+        headers={"NVCF-REQID": "REQ-1"},
+    )
+    embedder = NVIDIAEmbeddings(model="NV-Embed-QA", api_key="BOGUS")
+    embedder._client.client.timeout = 0.1
+    with pytest.raises(TimeoutError):
+        embedder.embed_query("hello")
+    ## polling gives up after `timeout`, but no poll is cut short by a deadline
+    assert requests_mock.last_request.timeout == (10.0, 0.1)
+
+
+def test_defaults(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        "http://localhost:8888/v1/embeddings",
+        json={"data": [{"embedding": [0.1], "index": 0}]},
+    )
+    embedder = NVIDIAEmbeddings(base_url="http://localhost:8888/v1")
+    embedder.embed_query("hello")
+    ## without a total, nothing shortens the client's timeout
+    assert requests_mock.last_request.timeout == (10.0, 60)
+    embedder = NVIDIAEmbeddings(
+        base_url="http://localhost:8888/v1",
+        timeouts=Timeouts(connect=1, first_byte=5),
+    )
+    embedder.embed_query("hello")
+    assert requests_mock.last_request.timeout == (1, 5)
+
+
+def test_idle_timeout_without_socket(
+    requests_mock: Mocker, caplog: pytest.LogCaptureFixture
+) -> None:
+    ## mocked responses have no socket to apply the idle timeout to
+    requests_mock.post(
+        "http://localhost:8888/v1/chat/completions",
+        content=_event("a") + _event("b") + b"data: [DONE]\n\n",
+    )
+    llm = ChatNVIDIA(
+        base_url="http://localhost:8888/v1", timeouts=Timeouts(idle=1.0, total=10.0)
+    )
+    with caplog.at_level("DEBUG", logger="langchain_nvidia_ai_endpoints._common"):
+        assert "".join(str(chunk.content) for chunk in llm.stream("hello")) == "ab"
+    assert "No socket found" in caplog.text
@@ -0,0 +1,164 @@
+import json
+import socket
+from typing import List
+
+import pytest
+from aiohttp import web
+from requests_mock import Mocker
+
+from langchain_nvidia_ai_endpoints import ChatNVIDIA, NVIDIAEmbeddings
+from langchain_nvidia_ai_endpoints.tracing import (
+    RequestSpan,
+    RequestTracer,
+    RingBufferTracer,
+    TraceEvent,
+    request_tracer_var,
+    trace_requests,
+)
+
+URL = "http://localhost:8888/v1/chat/completions"
+
+
+def _sse(events: List[dict]) -> str:
+    return "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+
+
+_DELTAS = [
+    {"choices": [{"index": 0, "delta": {"content": "Hi"}}]},
+    {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]},
+]
+
+
+def _names(span: RequestSpan) -> List[str]:
+    return [event.name for event in span.events]
+
+
+def test_invoke_span(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        URL,
+        json={"choices": [{"message": {"content": "Hi"}}]},
+        headers={"NVCF-REQID": "REQ-1"},
+    )
+    llm = ChatNVIDIA(model="mock-model", base_url="http://localhost:8888/v1")
+    with trace_requests() as tracer:
+        llm.invoke("hello")
+    assert isinstance(tracer, RingBufferTracer)
+    (span,) = tracer.spans
+    assert _names(span) == ["send", "first_byte", "last_byte", "parse"]
+    offsets = [event.offset for event in span.events]
+    assert offsets == sorted(offsets)
+    assert span.url == URL
+    assert span.model == "mock-model"
+    assert not span.stream
+    assert span.status_code == 200
+    assert span.nvcf_request_id == "REQ-1"
+    assert span.request_bytes == len(requests_mock.last_request.body)
+    assert span.response_bytes and span.response_bytes > 0
+    assert span.duration is not None and span.error is None
+    assert tracer.find("REQ-1") is span
+
+
+def test_polling_span(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        "https://ai.api.nvidia.com/v1/retrieval/nvidia/embeddings",
+        status_code=202,
+        headers={"NVCF-REQID": "REQ-2"},
+    )
+    requests_mock.get(
+        "https://api.nvcf.nvidia.com/v2/nvcf/pexec/status/REQ-2",
+        json={"data": [{"embedding": [0.1], "index": 0}]},
+    )
+    embedder = NVIDIAEmbeddings(model="NV-Embed-QA", api_key="BOGUS", interval=0)
+    with trace_requests() as tracer:
+        embedder.embed_query("hello")
+    (span,) = tracer.spans
+    assert _names(span) == ["send", "first_byte", "poll", "last_byte"]
+    assert span.events[2].attributes == {"status_code": 200}
+    assert span.polls == 1
+    assert span.status_code == 200
+    assert span.nvcf_request_id == "REQ-2"
+
+
+def test_error_span(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        URL,
+        status_code=500,
+        json={"title": "Internal Server Error"},
+        headers={"NVCF-REQID": "REQ-3"},
+    )
+    llm = ChatNVIDIA(base_url="http://localhost:8888/v1")
+    with trace_requests() as tracer:
+        with pytest.raises(Exception):
+            llm.invoke("hello")
+    span = tracer.find("REQ-3")
+    assert span is not None
+    assert span.status_code == 500
+    assert span.error and "Internal Server Error" in span.error
+
+
+def test_stream_span(requests_mock: Mocker) -> None:
+    requests_mock.post(URL, text=_sse(_DELTAS))
+    events: List[TraceEvent] = []
+
+    class Tracer(RequestTracer):
+        def on_event(self, span: RequestSpan, event: TraceEvent) -> None:
+            events.append(event)
+
+    llm = ChatNVIDIA(base_url="http://localhost:8888/v1")
+    with trace_requests(Tracer()):
+        assert "".join(str(c.content) for c in llm.stream("hello")) == "Hi"
+    assert [event.name for event in events] == [
+        "send",
+        "first_byte",
+        "first_token",
+        "last_byte",
+    ]
+
+
+async def test_astream_connection_phases() -> None:
+    async def handler(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"NVCF-REQID": "REQ-4"})
+        await response.prepare(request)
+        await response.write(_sse(_DELTAS).encode())
+        return response
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    site = web.SockSite(runner, sock)
+    await site.start()
+    try:
+        base_url = f"http://127.0.0.1:{sock.getsockname()[1]}/v1"
+        client = ChatNVIDIA(base_url=base_url)._client.client
+        with trace_requests() as tracer:
+            async for _ in client.get_req_astream({"messages": []}):
+                pass
+    finally:
+        await runner.cleanup()
+    assert isinstance(tracer, RingBufferTracer)
+    (span,) = tracer.spans
+    names = _names(span)
+    assert names[:4] == ["send", "connect_start", "connect_end", "first_byte"]
+    assert names[-2:] == ["first_token", "last_byte"]
+    assert span.stream
+    assert span.nvcf_request_id == "REQ-4"
+    assert span.response_bytes and span.response_bytes > 0
+
+
+def test_ring_buffer_capacity(requests_mock: Mocker) -> None:
+    requests_mock.post(URL, json={"choices": [{"message": {"content": "Hi"}}]})
+    llm = ChatNVIDIA(base_url="http://localhost:8888/v1")
+    llm.invoke("untraced")
+    tracer = RingBufferTracer(capacity=2)
+    with trace_requests(tracer):
+        for _ in range(3):
+            llm.invoke("hello")
+    assert request_tracer_var.get() is None
+    assert len(tracer.spans) == 2
+    tracer.clear()
+    assert tracer.spans == []
+    with pytest.raises(ValueError):
+        RingBufferTracer(capacity=0)
@@ -1,20 +1,42 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import itertools
 import queue
-import random
+import secrets
+import struct
+import threading
 import time
+import weakref
+from collections import deque
 from functools import partial
-from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
-import google.protobuf.json_format
 import numpy as np
 import tritonclient.grpc as grpcclient
-from langchain_core.callbacks import CallbackManagerForLLMRun
+import tritonclient.grpc.aio as grpcclient_aio
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
 from langchain_core.language_models import BaseLLM
 from langchain_core.outputs import Generation, GenerationChunk, LLMResult
-from langchain_core.pydantic_v1 import Field, root_validator
-from tritonclient.grpc.service_pb2 import ModelInferResponse
+from langchain_core.pydantic_v1 import Field, PrivateAttr
+from tritonclient.grpc.service_pb2 import ModelInferResponse, ModelStreamInferResponse
 from tritonclient.utils import np_to_triton_dtype
 
 
@@ -26,6 +48,581 @@ class TritonTensorRTRuntimeError(TritonTensorRTError, RuntimeError):
     """Runtime error for TritonTensorRT."""
 
 
+## Length prefix of the elements of a serialized BYTES tensor
+_ELEMENT_LENGTH = struct.Struct("<I")
+
+## Delays between checks of the readiness of a model being loaded, in seconds
+_READY_POLL_DELAY = 0.05
+_READY_POLL_MAX_DELAY = 2.0
+
+## Number of sets of sampling parameters whose input tensors are cached
+_INPUT_CACHE_SIZE = 64
+
+## Calls of stopped requests and closing clients, finishing in the background
+_DRAINING: Set[asyncio.Future] = set()
+
+
+async def _drain(responses: Any, timeout: float = 10.0) -> None:
+    """Read and ignore the remaining responses of a call, then end it."""
+
+    async def read() -> None:
+        async for _ in responses:
+            pass
+
+    try:
+        await asyncio.wait_for(read(), timeout)
+    except Exception:
+        pass
+    finally:
+        responses.cancel()
+
+
+def _close_aclient(
+    loop: asyncio.AbstractEventLoop, client: grpcclient_aio.InferenceServerClient
+) -> None:
+    """Close the asyncio client of a loop without blocking.
+
+    The client is closed on its loop while the loop runs, else on the loop of
+    the caller, or on a loop of its own when the caller has none.
+    """
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.close(), loop)
+        return
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(client.close())
+        return
+    task = running.create_task(client.close())
+    _DRAINING.add(task)
+    task.add_done_callback(_DRAINING.discard)
+
+
+## Ids of the requests of this process. TensorRT-LLM expects numeric ids, the
+## random high bits keep the ids of different processes apart on the server.
+_REQUEST_IDS = itertools.count((secrets.randbits(31) << 32) + 1)
+
+
+## The reasons a generation ended, by state of its request
+_STOP_REASONS = {
+    "completed": "end",
+    "stopped": "stop_sequence",
+    "cancelled": "cancelled",
+    "failed": "error",
+}
+
+
+class _RequestRecord:
+    """The lifecycle of a request sent to the server.
+
+    The state of a request is "running" until it is "completed" by its final
+    response, "stopped" by a stop sequence, "cancelled" or "failed".
+    """
+
+    def __init__(
+        self, request_id: str, model_name: str, streaming: bool = True
+    ) -> None:
+        self.request_id = request_id
+        self.model_name = model_name
+        self.streaming = streaming
+        self.state = "running"
+        self.start_time = time.perf_counter()
+        self.sent_time: Optional[float] = None
+        self.first_token_time: Optional[float] = None
+        self.last_token_time: Optional[float] = None
+        self.end_time: Optional[float] = None
+        self.tokens = 0
+        self.cancel: Optional[Callable[[], None]] = None
+
+    def sent(self) -> None:
+        """Mark the request as handed to gRPC."""
+        self.sent_time = time.perf_counter()
+
+    def token(self) -> None:
+        """Count a response with text, there is one per token when streaming."""
+        now = time.perf_counter()
+        if self.first_token_time is None:
+            self.first_token_time = now
+        self.last_token_time = now
+        self.tokens += 1
+
+    @property
+    def latency(self) -> float:
+        """Seconds from sending the request to its end, or until now."""
+        end_time = self.end_time if self.end_time is not None else time.perf_counter()
+        return end_time - self.start_time
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        """Seconds from sending the request to its first text."""
+        if self.first_token_time is None:
+            return None
+        sent_time = self.sent_time if self.sent_time is not None else self.start_time
+        return self.first_token_time - sent_time
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "model_name": self.model_name,
+            "state": self.state,
+            "latency": self.latency,
+            "time_to_first_token": self.time_to_first_token,
+            "tokens": self.tokens,
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        """The metrics of the request, reported in its generation info.
+
+        - `stop_reason`: "end" of the generation, "stop_sequence", "cancelled"
+          or "error"
+        - `queue_time_seconds`: from creating the request to handing it to gRPC
+        - `latency_seconds`: from creating the request to its end
+        - `time_to_first_token_seconds`: from sending the request to its first
+          token (streaming)
+        - `inter_token_latency_seconds`: mean gap between tokens (streaming)
+        - `completion_tokens`: tokens generated (streaming), the server does not
+          report it for complete responses
+        """
+        end_time = self.end_time if self.end_time is not None else time.perf_counter()
+        sent_time = self.sent_time if self.sent_time is not None else end_time
+        metrics: Dict[str, Any] = {
+            "request_id": self.request_id,
+            "stop_reason": _STOP_REASONS.get(self.state),
+            "queue_time_seconds": sent_time - self.start_time,
+            "latency_seconds": self.latency,
+        }
+        if self.streaming:
+            metrics["time_to_first_token_seconds"] = self.time_to_first_token
+            if self.tokens > 1:
+                assert self.first_token_time and self.last_token_time
+                metrics["inter_token_latency_seconds"] = (
+                    self.last_token_time - self.first_token_time
+                ) / (self.tokens - 1)
+            metrics["completion_tokens"] = self.tokens
+        return metrics
+
+
+class _RequestRegistry:
+    """The requests of a client in progress, and the last ones to end."""
+
+    def __init__(self, history: int = 1000) -> None:
+        self._lock = threading.Lock()
+        self._active: Dict[str, _RequestRecord] = {}
+        self._history: Deque[_RequestRecord] = deque(maxlen=history)
+
+    def create(self, model_name: str, streaming: bool = True) -> _RequestRecord:
+        """Register a new request with a unique id."""
+        record = _RequestRecord(str(next(_REQUEST_IDS)), model_name, streaming)
+        with self._lock:
+            self._active[record.request_id] = record
+        return record
+
+    def finish(self, request_id: str, state: str) -> Optional[_RequestRecord]:
+        """End a request in `state`, unless it ended already."""
+        with self._lock:
+            record = self._active.pop(request_id, None)
+            if record is None:
+                return None
+            record.state = state
+            record.end_time = time.perf_counter()
+            self._history.append(record)
+        return record
+
+    def cancel(self, request_id: str) -> bool:
+        """Cancel a request in progress, returns whether there was one."""
+        with self._lock:
+            record = self._active.get(request_id)
+        if record is None or record.cancel is None:
+            return False
+        record.cancel()
+        return True
+
+    def active(self) -> List[_RequestRecord]:
+        with self._lock:
+            return list(self._active.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Counts of the requests by state, latencies of the last ones to end."""
+        with self._lock:
+            records = list(self._history)
+            active = len(self._active)
+        states = ["completed", "stopped", "cancelled", "failed"]
+        stats: Dict[str, Any] = {"running": active}
+        stats.update({state: 0 for state in states})
+        for record in records:
+            stats[record.state] += 1
+        latencies = [r.latency for r in records if r.state in ("completed", "stopped")]
+        first_tokens = [
+            r.time_to_first_token for r in records if r.time_to_first_token is not None
+        ]
+        stats["tokens"] = sum(record.tokens for record in records)
+        if latencies:
+            stats["latency_mean"] = float(np.mean(latencies))
+            stats["latency_p50"] = float(np.percentile(latencies, 50))
+            stats["latency_p95"] = float(np.percentile(latencies, 95))
+        if first_tokens:
+            stats["time_to_first_token_mean"] = float(np.mean(first_tokens))
+        return stats
+
+
+class _StopMatcher:
+    """Find stop sequences in the output of a request, as it is streamed.
+
+    A stop sequence can span several responses, so the end of the output that
+    could start one is held back until the next response tells whether it does.
+    """
+
+    def __init__(self, stop_words: Sequence[str]) -> None:
+        self.stop_words = [word for word in stop_words if word]
+        self.stopped = False
+        self._held = ""
+
+    def feed(self, text: str) -> Tuple[str, bool]:
+        """The text that can be output, and whether a stop sequence matched.
+
+        The output is trimmed before the first stop sequence.
+        """
+        if not self.stop_words:
+            return text, False
+        text = self._held + text
+        self._held = ""
+        matches = [i for i in map(text.find, self.stop_words) if i >= 0]
+        if matches:
+            self.stopped = True
+            return text[: min(matches)], True
+        # a suffix shorter than the longest stop sequence may start one
+        longest = max(len(word) for word in self.stop_words)
+        for start in range(max(len(text) - longest + 1, 0), len(text)):
+            suffix = text[start:]
+            if any(word.startswith(suffix) for word in self.stop_words):
+                self._held = suffix
+                return text[:start], False
+        return text, False
+
+    def flush(self) -> str:
+        """The text held back, once the output is complete."""
+        held, self._held = self._held, ""
+        return held
+
+
+class _TaggedResponses:
+    """The responses of a stream, remembering the one being handled.
+
+    The callback of a stream is not passed the response of an error, the
+    request that failed is read from the response remembered here instead.
+    """
+
+    def __init__(self, responses: Any) -> None:
+        self._responses = responses
+        self.current: Optional[ModelStreamInferResponse] = None
+
+    def __iter__(self) -> _TaggedResponses:
+        return self
+
+    def __next__(self) -> ModelStreamInferResponse:
+        self.current = None
+        self.current = next(self._responses)
+        return self.current
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._responses, name)
+
+
+class _StreamManager:
+    """One long-lived bidirectional stream of a client, shared by many requests.
+
+    The client supports a single stream at a time. Requests sent on it run
+    concurrently, their responses are passed to the callback of the request with
+    the same id. The client is referenced weakly, it owns the stream.
+    """
+
+    def __init__(
+        self,
+        client: grpcclient.InferenceServerClient,
+        compression: Optional[str] = None,
+    ) -> None:
+        self._client = weakref.ref(client)
+        self.compression = compression
+        self._lock = threading.Lock()
+        # notified once a failed stream is stopped
+        self._replaced = threading.Condition(self._lock)
+        self._callbacks: Dict[str, Callable[..., None]] = {}
+        self._responses: Optional[_TaggedResponses] = None
+        self._started = False
+        self._failed = False
+        self._stopping = False
+
+    @property
+    def client(self) -> grpcclient.InferenceServerClient:
+        client = self._client()
+        if client is None:
+            raise TritonTensorRTRuntimeError("The client of the stream is closed")
+        return client
+
+    def start(
+        self,
+        request_id: str,
+        callback: Callable[..., None],
+        on_send: Optional[Callable[[], None]] = None,
+        **kwargs: Any,
+    ) -> None:
+        """Send a request, its results are passed to `callback(result, error)`.
+
+        `on_send` is called once the request has its turn on the stream.
+        """
+        with self._lock:
+            self._replace_failed()
+            if request_id in self._callbacks:
+                raise TritonTensorRTRuntimeError(
+                    f"Request {request_id} is already in progress"
+                )
+            self._callbacks[request_id] = callback
+            if on_send is not None:
+                on_send()
+            try:
+                self._send(request_id=request_id, **kwargs)
+            except Exception:
+                del self._callbacks[request_id]
+                raise
+
+    def send(self, **kwargs: Any) -> None:
+        """Send a request whose results are ignored, e.g. a stop signal."""
+        with self._lock:
+            self._replace_failed()
+            self._send(**kwargs)
+
+    def finish(self, request_id: str) -> None:
+        """Ignore any further results of a request."""
+        with self._lock:
+            self._callbacks.pop(request_id, None)
+
+    def close(self) -> None:
+        """Close the stream, cancelling the requests in progress."""
+        with self._lock:
+            self._callbacks.clear()
+            started, self._started = self._started, False
+        client = self._client()
+        if started and client is not None:
+            # outside the lock, the responses being dispatched may need it
+            client.stop_stream(cancel_requests=True)
+
+    def _replace_failed(self) -> None:
+        """Stop the stream if it failed, a stream is not usable after an error.
+
+        Called with the lock held. Stopping waits for the thread dispatching the
+        responses, which may need the lock, so it is released meanwhile.
+        """
+        while self._failed:
+            if self._stopping:
+                # another request is stopping it
+                self._replaced.wait()
+                continue
+            self._stopping = True
+            self._lock.release()
+            try:
+                self.client.stop_stream(cancel_requests=True)
+            finally:
+                self._lock.acquire()
+                self._stopping = False
+                self._replaced.notify_all()
+            self._started = self._failed = False
+
+    def _send(self, **kwargs: Any) -> None:
+        if not self._started:
+            self._start_stream()
+            self._started = True
+        self.client.async_stream_infer(**kwargs)
+
+    def _start_stream(self) -> None:
+        """Start the stream of the client, remembering the response handled."""
+        client = self.client
+        self._responses = None
+        # the stub of the client is private, without it errors fail all requests
+        stub: Any = getattr(client, "_client_stub", None)
+        stream_infer = getattr(stub, "ModelStreamInfer", None)
+        if stream_infer is None:
+            client.start_stream(
+                callback=self._dispatch, compression_algorithm=self.compression
+            )
+            return
+
+        def tagged_stream_infer(*args: Any, **kwargs: Any) -> _TaggedResponses:
+            self._responses = _TaggedResponses(stream_infer(*args, **kwargs))
+            return self._responses
+
+        stub.ModelStreamInfer = tagged_stream_infer
+        try:
+            client.start_stream(
+                callback=self._dispatch, compression_algorithm=self.compression
+            )
+        finally:
+            stub.ModelStreamInfer = stream_infer
+
+    def _failed_request(self) -> Optional[str]:
+        """The id of the request whose error is being handled, if it has one."""
+        response = self._responses.current if self._responses else None
+        if response is None or not response.error_message:
+            return None
+        return response.infer_response.id or None
+
+    def _dispatch(
+        self, result: Optional[grpcclient.InferResult], error: Optional[Exception]
+    ) -> None:
+        """Pass a result to the callback of its request."""
+        if error:
+            request_id = self._failed_request()
+            with self._lock:
+                if request_id is not None:
+                    failed = self._callbacks.pop(request_id, None)
+                    callbacks = [failed] if failed is not None else []
+                else:
+                    # the stream failed, or the error does not tell which
+                    # request failed, fail all of them
+                    callbacks = list(self._callbacks.values())
+                    self._callbacks.clear()
+                    self._failed = True
+            for callback in callbacks:
+                callback(result=None, error=error)
+        elif result is not None:
+            request_callback = self._callbacks.get(result.get_response().id)
+            if request_callback is not None:
+                request_callback(result=result, error=None)
+
+
+## Fields of TritonTensorRTLLM setting up its channel, a client is shared only
+## by the instances with the same server url and options
+_CHANNEL_OPTIONS = (
+    "keepalive_time_ms",
+    "keepalive_timeout_ms",
+    "max_message_size",
+    "compression",
+)
+
+
+def _channel_args(
+    keepalive_time_ms: Optional[int],
+    keepalive_timeout_ms: int,
+    max_message_size: Optional[int],
+) -> List[Tuple[str, Any]]:
+    """The arguments of a gRPC channel to the server."""
+    keepalive = grpcclient.KeepAliveOptions(keepalive_timeout_ms=keepalive_timeout_ms)
+    if keepalive_time_ms is not None:
+        # keep idle channels alive too, they are long-lived
+        keepalive.keepalive_time_ms = keepalive_time_ms
+        keepalive.keepalive_permit_without_calls = True
+        keepalive.http2_max_pings_without_data = 0
+    if max_message_size is None:
+        max_message_size = grpcclient.MAX_GRPC_MESSAGE_SIZE
+    return [
+        ("grpc.max_send_message_length", max_message_size),
+        ("grpc.max_receive_message_length", max_message_size),
+        ("grpc.keepalive_time_ms", keepalive.keepalive_time_ms),
+        ("grpc.keepalive_timeout_ms", keepalive.keepalive_timeout_ms),
+        (
+            "grpc.keepalive_permit_without_calls",
+            keepalive.keepalive_permit_without_calls,
+        ),
+        ("grpc.http2.max_pings_without_data", keepalive.http2_max_pings_without_data),
+    ]
+
+
+class _ClientPool:
+    """Clients shared by the models using the same server and channel options.
+
+    A client is closed once the last model using it is closed or collected.
+    As a client supports a single stream, its stream is shared as well, by the
+    models using the client, whether it is pooled or passed as `client`.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple, Tuple[grpcclient.InferenceServerClient, int]] = {}
+        self._streams: weakref.WeakKeyDictionary[
+            grpcclient.InferenceServerClient, _StreamManager
+        ] = weakref.WeakKeyDictionary()
+        self._released: List[grpcclient.InferenceServerClient] = []
+
+    def acquire(
+        self,
+        server_url: str,
+        keepalive_time_ms: Optional[int],
+        keepalive_timeout_ms: int,
+        max_message_size: Optional[int],
+        compression: Optional[str],
+    ) -> grpcclient.InferenceServerClient:
+        """Get the client for a server and options, creating it on first use."""
+        key = (
+            server_url,
+            keepalive_time_ms,
+            keepalive_timeout_ms,
+            max_message_size,
+            compression,
+        )
+        with self._lock:
+            if key in self._clients:
+                client, references = self._clients[key]
+            else:
+                client = grpcclient.InferenceServerClient(
+                    server_url,
+                    channel_args=_channel_args(
+                        keepalive_time_ms, keepalive_timeout_ms, max_message_size
+                    ),
+                )
+                references = 0
+            self._clients[key] = (client, references + 1)
+        self._close_released()
+        return client
+
+    def streams(
+        self, client: grpcclient.InferenceServerClient, compression: Optional[str]
+    ) -> _StreamManager:
+        """The stream of a client, created on first use with `compression`."""
+        with self._lock:
+            streams = self._streams.get(client)
+            if streams is None:
+                streams = self._streams[client] = _StreamManager(client, compression)
+        self._close_released()
+        return streams
+
+    def release(self, client: grpcclient.InferenceServerClient) -> None:
+        """Stop using a client, it is closed when it is not used anymore.
+
+        This is called by finalizers, which can run while the pool is locked,
+        the client is then released by the thread holding the lock.
+        """
+        self._released.append(client)
+        self._close_released()
+
+    def _close_released(self) -> None:
+        while self._released and self._lock.acquire(blocking=False):
+            unused = []
+            try:
+                while self._released:
+                    client = self._released.pop()
+                    for key, (pooled, references) in self._clients.items():
+                        if pooled is client:
+                            break
+                    else:
+                        continue
+                    if references > 1:
+                        self._clients[key] = (client, references - 1)
+                    else:
+                        del self._clients[key]
+                        unused.append((client, self._streams.pop(client, None)))
+            finally:
+                self._lock.release()
+            for client, streams in unused:
+                try:
+                    if streams is not None:
+                        streams.close()
+                    client.close()
+                except Exception:
+                    pass  # e.g. collected in a thread of the stream
+
+
+_CLIENTS = _ClientPool()
+
+
 class TritonTensorRTLLM(BaseLLM):
     """TRTLLM triton models.
 
@@ -40,6 +637,17 @@ class TritonTensorRTLLM(BaseLLM):
         length_penalty: (float) The penalty to apply repeated tokens
         tokens: (int) The maximum number of tokens to generate.
         client: The client object used to communicate with the inference server
+        keepalive_time_ms: (int) Send keepalive pings after this long idle
+        keepalive_timeout_ms: (int) Close the channel when a ping is not
+            answered within this time
+        max_message_size: (int) The largest message to send or receive
+        compression: (str) Compress the requests with "gzip" or "deflate"
+        max_in_flight: (int) The most prompts of a batch in progress at once
+
+    Instances with the same server_url and channel options share a client,
+    created for the first one. Call `close` once done with an instance, the
+    shared client is closed with the last instance using it. A client passed
+    as `client` is not closed.
 
     Example:
         .. code-block:: python
@@ -63,7 +671,7 @@ class TritonTensorRTLLM(BaseLLM):
     beam_width: int = 1
     repetition_penalty: float = 1.0
     length_penalty: float = 1.0
-    client: grpcclient.InferenceServerClient
+    client: grpcclient.InferenceServerClient = Field(None)
     stop: List[str] = Field(
         default_factory=lambda: ["</s>"], description="Stop tokens."
     )
@@ -73,17 +681,71 @@ class TritonTensorRTLLM(BaseLLM):
         description="Request the inference server to load the specified model.\
             Certain Triton configurations do not allow for this operation.",
     )
-
-    def __del__(self):
-        """Ensure the client streaming connection is properly shutdown"""
-        self.client.close()
-
-    @root_validator(pre=True, allow_reuse=True)
-    def validate_environment(cls, values: Dict[str, Any]) -> Dict[str, Any]:
-        """Validate that python package exists in environment."""
-        if not values.get("client"):
-            values["client"] = grpcclient.InferenceServerClient(values["server_url"])
-        return values
+    warmup_prompt: Optional[str] = Field(
+        None,
+        description="A prompt to generate one token from once the model is \
+            ready, before the first request.",
+    )
+    keepalive_time_ms: Optional[int] = Field(
+        None,
+        description="Send a keepalive ping after this many milliseconds \
+            without activity on the channel, the server must allow it.",
+    )
+    keepalive_timeout_ms: int = Field(
+        20000,
+        description="Close the channel when a keepalive ping is not answered \
+            within this many milliseconds.",
+    )
+    max_message_size: Optional[int] = Field(
+        None, description="The largest message to send or receive, in bytes."
+    )
+    compression: Optional[Literal["gzip", "deflate"]] = Field(
+        None, description="Compress the messages sent to the server."
+    )
+    max_in_flight: int = Field(
+        64,
+        ge=1,
+        description="The most prompts of a batch sent to the server at once.",
+    )
+    _streams: _StreamManager = PrivateAttr()
+    _ready_models: Set[str] = PrivateAttr(default_factory=set)
+    _requests: _RequestRegistry = PrivateAttr(default_factory=_RequestRegistry)
+    _ready_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _aclients: Dict[asyncio.AbstractEventLoop, grpcclient_aio.InferenceServerClient] = (
+        PrivateAttr(default_factory=dict)
+    )
+    _input_cache: Dict[Tuple, List[grpcclient.InferInput]] = PrivateAttr(
+        default_factory=dict
+    )
+    _stop_inputs: Optional[List[grpcclient.InferInput]] = PrivateAttr(default=None)
+    _release: Optional[weakref.finalize] = PrivateAttr(default=None)
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        if not self.client:
+            # acquired once the fields are valid, so that it is always released
+            if self.server_url is None:
+                raise ValueError("A server_url is required without a client")
+            options = {name: getattr(self, name) for name in _CHANNEL_OPTIONS}
+            self.client = _CLIENTS.acquire(self.server_url, **options)
+            # release the client when the instance is collected, or at exit
+            self._release = weakref.finalize(self, _CLIENTS.release, self.client)
+        self._streams = _CLIENTS.streams(self.client, self.compression)
+
+    def close(self) -> None:
+        """Release the client, closing it unless other instances share it, and
+        close the asyncio clients."""
+        if self._release is not None:
+            self._release()
+        while self._aclients:
+            _close_aclient(*self._aclients.popitem())
+
+    async def aclose(self) -> None:
+        """Close the asyncio client of the running event loop, then the clients."""
+        aclient = self._aclients.pop(asyncio.get_running_loop(), None)
+        if aclient is not None:
+            await aclient.close()
+        self.close()
 
     @property
     def _llm_type(self) -> str:
@@ -119,20 +781,90 @@ class TritonTensorRTLLM(BaseLLM):
         res = self.client.get_model_repository_index(as_json=True)
         return [model["name"] for model in res["models"]]
 
+    def get_active_requests(self) -> List[Dict[str, Any]]:
+        """Get the requests in progress: id, model, state, latency and tokens."""
+        return [record.to_dict() for record in self._requests.active()]
+
+    def get_request_stats(self) -> Dict[str, Any]:
+        """Get the counts of the requests by state and the latencies, in seconds,
+        of the last ones to end."""
+        return self._requests.stats()
+
+    def cancel_request(self, request_id: str) -> bool:
+        """Cancel a request in progress, returns whether there was one.
+
+        The request is stopped on the server and its results end early.
+        """
+        return self._requests.cancel(request_id)
+
     def _load_model(self, model_name: str, timeout: int = 1000) -> None:
-        """Load a model into the server."""
-        if self.client.is_model_ready(model_name):
+        """Load a model into the server, unless it is known to be ready.
+
+        The readiness of a model is checked once, then cached until a request
+        to it fails. A model that is not ready is loaded if `load_model` is
+        set, its readiness is then polled with an exponential backoff.
+        """
+        if model_name in self._ready_models:
             return
 
-        self.client.load_model(model_name)
-        t0 = time.perf_counter()
-        t1 = t0
-        while not self.client.is_model_ready(model_name) and t1 - t0 < timeout:
-            t1 = time.perf_counter()
+        with self._ready_lock:
+            if model_name in self._ready_models:
+                return
+            if not self.client.is_model_ready(model_name):
+                if not self.load_model:
+                    raise TritonTensorRTRuntimeError(
+                        f"Model {model_name} is not ready on Triton"
+                    )
+                self.client.load_model(model_name)
+                self._wait_until_ready(model_name, timeout)
+            self._warmup(model_name)
+            self._ready_models.add(model_name)
+
+    def _wait_until_ready(self, model_name: str, timeout: float) -> None:
+        """Poll the readiness of a model until it is ready or `timeout` passed."""
+        deadline = time.monotonic() + timeout
+        delay = _READY_POLL_DELAY
+        while not self.client.is_model_ready(model_name):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TritonTensorRTRuntimeError(
+                    f"Failed to load {model_name} on Triton in {timeout}s"
+                )
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, _READY_POLL_MAX_DELAY)
+
+    def _warmup(self, model_name: str) -> None:
+        """Generate a token once the model is ready, if a warmup prompt is set.
+
+        The first requests to a model can be much slower than the next ones,
+        the warmup takes that cost before the requests of the user.
+        """
+        if self.warmup_prompt is None:
+            return
+        inputs = self._generate_inputs(
+            stream=False,
+            prompt=[[self.warmup_prompt]],
+            **{**self._model_default_parameters, "tokens": 1},
+        )
+        result_queue = self._send_request(
+            model_name, inputs, self._generate_outputs(), [], streaming=False
+        )
+        try:
+            for token in result_queue:
+                if isinstance(token, Exception):
+                    raise token
+        finally:
+            result_queue.close()
 
-        if not self.client.is_model_ready(model_name):
-            raise TritonTensorRTRuntimeError(
-                f"Failed to load {model_name} on Triton in {timeout}s"
+    def _model_failed(self, model_name: str) -> None:
+        """Check the readiness of a model again before its next request."""
+        self._ready_models.discard(model_name)
+
+    async def _aload_model(self, model_name: str) -> None:
+        """Load a model into the server without blocking the event loop."""
+        if model_name not in self._ready_models:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._load_model, model_name
             )
 
     def _generate(
@@ -146,17 +878,17 @@ class TritonTensorRTLLM(BaseLLM):
 
         invocation_params = self._get_invocation_params(**kwargs)
         stop_words = stop if stop is not None else self.stop
-        generations = []
-        # TODO: We should handle the native batching instead.
-        for prompt in prompts:
-            invoc_params = {**invocation_params, "prompt": [[prompt]]}
-            result: str = self._request(
-                self.model_name,
-                stop=stop_words,
-                **invoc_params,
-            )
-            generations.append([Generation(text=result, generation_info={})])
-        return LLMResult(generations=generations)
+        results = self._request_batch(
+            self.model_name, prompts, stop=stop_words, **invocation_params
+        )
+        generations = [
+            [Generation(text=text, generation_info=record.metrics())]
+            for text, record in results
+        ]
+        return LLMResult(
+            generations=generations,
+            llm_output=self._llm_output([record for _, record in results]),
+        )
 
     def _stream(
         self,
@@ -175,12 +907,100 @@ class TritonTensorRTLLM(BaseLLM):
 
         result_queue = self._invoke_triton(self.model_name, inputs, outputs, stop_words)
 
-        for token in result_queue:
+        try:
+            for token in result_queue:
+                if isinstance(token, Exception):
+                    raise token
+                yield GenerationChunk(text=token)
+                if run_manager:
+                    run_manager.on_llm_new_token(token)
+        finally:
+            result_queue.close()
+        yield self._final_chunk(result_queue.record)
+
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        await self._aload_model(self.model_name)
+
+        invocation_params = self._get_invocation_params(**kwargs)
+        stop_words = stop if stop is not None else self.stop
+        outputs = self._generate_outputs()
+
+        # at most max_in_flight prompts are in progress, as for _generate
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+
+        async def request(prompt: str) -> Tuple[str, _RequestRecord]:
+            async with in_flight:
+                inputs = self._generate_inputs(
+                    stream=False, prompt=[[prompt]], **invocation_params
+                )
+                record = self._requests.create(self.model_name, streaming=False)
+                tokens = self._ainvoke_triton(
+                    self.model_name, inputs, outputs, stop_words, record=record
+                )
+                return "".join([token async for token in tokens]), record
+
+        results = await asyncio.gather(*(request(prompt) for prompt in prompts))
+        generations = [
+            [Generation(text=text, generation_info=record.metrics())]
+            for text, record in results
+        ]
+        return LLMResult(
+            generations=generations,
+            llm_output=self._llm_output([record for _, record in results]),
+        )
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        await self._aload_model(self.model_name)
+
+        invocation_params = self._get_invocation_params(**kwargs, prompt=[[prompt]])
+        stop_words = stop if stop is not None else self.stop
+
+        inputs = self._generate_inputs(stream=True, **invocation_params)
+        outputs = self._generate_outputs()
+
+        record = self._requests.create(self.model_name)
+        async for token in self._ainvoke_triton(
+            self.model_name, inputs, outputs, stop_words, record=record
+        ):
             yield GenerationChunk(text=token)
             if run_manager:
-                run_manager.on_llm_new_token(token)
-
-        self.client.stop_stream()
+                await run_manager.on_llm_new_token(token)
+        yield self._final_chunk(record)
+
+    def _llm_output(self, records: Sequence[_RequestRecord]) -> Dict[str, Any]:
+        """The output of a generation, with the token usage of its requests.
+
+        The usage has the format of the other LangChain integrations, so usage
+        callbacks, e.g. `get_usage_callback` of langchain-nvidia-ai-endpoints,
+        track it too. Tokens are only counted when streaming, and the server
+        does not report the prompt tokens.
+        """
+        output: Dict[str, Any] = {"model_name": self.model_name}
+        if records and all(record.streaming for record in records):
+            tokens = sum(record.tokens for record in records)
+            output["token_usage"] = {
+                "completion_tokens": tokens,
+                "total_tokens": tokens,
+            }
+        return output
+
+    def _final_chunk(self, record: _RequestRecord) -> GenerationChunk:
+        """The last chunk of a stream, with the metrics of its request."""
+        return GenerationChunk(
+            text="", generation_info={**record.metrics(), **self._llm_output([record])}
+        )
 
     ##### BELOW ARE METHODS PREVIOUSLY ONLY IN THE GRPC CLIENT
 
@@ -196,7 +1016,9 @@ class TritonTensorRTLLM(BaseLLM):
         inputs = self._generate_inputs(stream=False, prompt=prompt, **params)
         outputs = self._generate_outputs()
 
-        result_queue = self._invoke_triton(self.model_name, inputs, outputs, stop)
+        result_queue = self._invoke_triton(
+            self.model_name, inputs, outputs, stop, streaming=False
+        )
 
         result_str = ""
         try:
@@ -205,40 +1027,212 @@ class TritonTensorRTLLM(BaseLLM):
                     raise token
                 result_str += token
         finally:
-            self.client.stop_stream()
+            result_queue.close()
 
         return result_str
 
-    def _invoke_triton(self, model_name, inputs, outputs, stop_words):
-        if not self.client.is_model_ready(model_name):
-            raise RuntimeError("Cannot request streaming, model is not loaded")
+    def _request_batch(
+        self,
+        model_name: str,
+        prompts: Sequence[str],
+        stop: Optional[List[str]] = None,
+        **params: Any,
+    ) -> List[Tuple[str, _RequestRecord]]:
+        """Request inferencing of several prompts from the triton server.
+
+        The prompts are sent as concurrent requests on a single stream, so the
+        in-flight batching of TensorRT-LLM can batch them on the server. At most
+        `max_in_flight` of them are in progress, the next one is sent as the
+        oldest one completes.
+        Returns the text generated for each prompt and the record of its request.
+        """
+        outputs = self._generate_outputs()
+        pending = iter(prompts)
+        result_queues: Deque[StreamingResponseGenerator] = deque()
+        results = []
+
+        def send(prompt: str) -> None:
+            inputs = self._generate_inputs(stream=False, prompt=[[prompt]], **params)
+            result_queues.append(
+                self._send_request(
+                    model_name, inputs, outputs, stop or [], streaming=False
+                )
+            )
+
+        try:
+            for prompt in itertools.islice(pending, self.max_in_flight):
+                send(prompt)
+            while result_queues:
+                result_queue = result_queues.popleft()
+                try:
+                    result_str = ""
+                    for token in result_queue:
+                        if isinstance(token, Exception):
+                            raise token
+                        result_str += token
+                finally:
+                    result_queue.close()
+                results.append((result_str, result_queue.record))
+                for prompt in itertools.islice(pending, 1):
+                    send(prompt)
+        finally:
+            for result_queue in result_queues:
+                result_queue.close()
 
-        request_id = str(random.randint(1, 9999999))  # nosec
+        return results
 
-        result_queue = StreamingResponseGenerator(
-            self,
-            request_id,
-            force_batch=False,
-            stop_words=stop_words,
+    def _invoke_triton(self, model_name, inputs, outputs, stop_words, streaming=True):
+        return self._send_request(
+            model_name, inputs, outputs, stop_words, streaming=streaming
         )
 
-        self.client.start_stream(
-            callback=partial(
-                self._stream_callback,
-                result_queue,
-                stop_words=stop_words,
+    def _get_aclient(self) -> grpcclient_aio.InferenceServerClient:
+        """The asyncio client of the running event loop, created on first use.
+
+        The clients of the loops closed since are closed.
+        """
+        loop = asyncio.get_running_loop()
+        for closed in [other for other in self._aclients if other.is_closed()]:
+            _close_aclient(closed, self._aclients.pop(closed))
+        if loop not in self._aclients:
+            if self.server_url is None:
+                raise TritonTensorRTRuntimeError(
+                    "The asyncio interface requires the server_url"
+                )
+            self._aclients[loop] = grpcclient_aio.InferenceServerClient(
+                self.server_url,
+                channel_args=_channel_args(
+                    self.keepalive_time_ms,
+                    self.keepalive_timeout_ms,
+                    self.max_message_size,
+                ),
             )
+        return self._aclients[loop]
+
+    async def _ainvoke_triton(
+        self,
+        model_name: str,
+        inputs: List[grpcclient.InferInput],
+        outputs: List[grpcclient.InferRequestedOutput],
+        stop_words: Sequence[str],
+        record: Optional[_RequestRecord] = None,
+    ) -> AsyncIterator[str]:
+        """Stream the results of a request from the asyncio client.
+
+        Every request has a gRPC call of its own, all multiplexed over the
+        channel of the client. As results are only read as fast as they are
+        consumed, gRPC flow control holds back a request whose consumer falls
+        behind. When the consumer stops early, e.g. because its task was
+        cancelled, the stop signal is sent to the server.
+        """
+        if record is None:
+            record = self._requests.create(model_name)
+        request_id = record.request_id
+        finished = asyncio.Event()
+        stopped = False
+        loop = asyncio.get_running_loop()
+
+        def stop_request() -> None:
+            nonlocal stopped
+            if self._requests.finish(request_id, "cancelled") and not finished.is_set():
+                # the server ends the call once it has the stop signal
+                stopped = True
+                finished.set()
+
+        def cancel() -> None:
+            loop.call_soon_threadsafe(stop_request)
+
+        record.cancel = cancel
+
+        async def requests() -> AsyncIterator[Dict[str, Any]]:
+            record.sent()
+            yield {
+                "model_name": model_name,
+                "inputs": inputs,
+                "outputs": outputs,
+                "request_id": request_id,
+            }
+            # keep the call open for the stop signal
+            await finished.wait()
+            if stopped:
+                yield {
+                    "model_name": model_name,
+                    "inputs": self._generate_stop_signals(),
+                    "request_id": request_id,
+                    "parameters": {"Streaming": True},
+                }
+
+        matcher = _StopMatcher(stop_words)
+        responses = self._get_aclient().stream_infer(
+            requests(), compression_algorithm=self.compression
         )
+        done = False
+        try:
+            async for result, error in responses:
+                if error:
+                    done = True
+                    self._requests.finish(request_id, "failed")
+                    self._model_failed(model_name)
+                    raise error
+                response, final = self._parse_response(result)
+                if response:
+                    record.token()
+                text, matched = matcher.feed(response or "")
+                if matched:
+                    self._requests.finish(request_id, "stopped")
+                if final:
+                    done = True
+                    self._requests.finish(request_id, "completed")
+                    if not matched:
+                        text += matcher.flush()
+                if text:
+                    yield text
+                if matched or final:
+                    break
+            else:
+                done = True
+                self._requests.finish(request_id, "completed")
+        finally:
+            self._requests.finish(request_id, "cancelled")
+            stopped = stopped or not done
+            finished.set()
+            if stopped:
+                # cancelling the call could drop the stop signal, let the server
+                # end it instead
+                task = asyncio.ensure_future(_drain(responses))
+                _DRAINING.add(task)
+                task.add_done_callback(_DRAINING.discard)
+
+    def _send_request(
+        self,
+        model_name: str,
+        inputs: List[grpcclient.InferInput],
+        outputs: List[grpcclient.InferRequestedOutput],
+        stop_words: Optional[Sequence[str]],
+        streaming: bool = True,
+    ) -> StreamingResponseGenerator:
+        """Send a request on the stream of the client, returns its results."""
+        record = self._requests.create(model_name, streaming)
+        result_queue = StreamingResponseGenerator(
+            self, record, stop_words=stop_words or []
+        )
+        record.cancel = result_queue.cancel
 
         # Even though this request may not be a streaming request certain configurations
         # in Triton prevent the GRPC server from accepting none streaming connections.
         # Therefore we call the streaming API and combine the streamed results.
-        self.client.async_stream_infer(
-            model_name=model_name,
-            inputs=inputs,
-            outputs=outputs,
-            request_id=request_id,
-        )
+        try:
+            self._streams.start(
+                record.request_id,
+                partial(self._stream_callback, result_queue, model_name=model_name),
+                on_send=record.sent,
+                model_name=model_name,
+                inputs=inputs,
+                outputs=outputs,
+            )
+        except Exception:
+            self._requests.finish(record.request_id, "failed")
+            raise
 
         return result_queue
 
@@ -270,41 +1264,73 @@ class TritonTensorRTLLM(BaseLLM):
         repetition_penalty: float = 1,
         length_penalty: float = 1.0,
         stream: bool = True,
-    ) -> List[grpcclient.InferRequestedOutput]:
-        """Create the input for the triton inference server."""
+    ) -> List[grpcclient.InferInput]:
+        """Create the input for the triton inference server.
+
+        Only the text input is created for every request. The tensors of the
+        sampling parameters are cached, requests with the same parameters and
+        number of prompts share them.
+        """
         query = np.array(prompt).astype(object)
-        request_output_len = np.array([tokens]).astype(np.uint32).reshape((1, -1))
-        runtime_top_k = np.array([top_k]).astype(np.uint32).reshape((1, -1))
-        runtime_top_p = np.array([top_p]).astype(np.float32).reshape((1, -1))
-        temperature_array = np.array([temperature]).astype(np.float32).reshape((1, -1))
-        len_penalty = np.array([length_penalty]).astype(np.float32).reshape((1, -1))
-        repetition_penalty_array = (
-            np.array([repetition_penalty]).astype(np.float32).reshape((1, -1))
+        key = (
+            len(query),
+            tokens,
+            temperature,
+            top_k,
+            top_p,
+            beam_width,
+            repetition_penalty,
+            length_penalty,
+            stream,
+            self.seed,
         )
-        random_seed = np.array([self.seed]).astype(np.uint64).reshape((1, -1))
-        beam_width_array = np.array([beam_width]).astype(np.uint32).reshape((1, -1))
-        streaming_data = np.array([[stream]], dtype=bool)
-
-        inputs = [
-            self._prepare_tensor("text_input", query),
-            self._prepare_tensor("max_tokens", request_output_len),
-            self._prepare_tensor("top_k", runtime_top_k),
-            self._prepare_tensor("top_p", runtime_top_p),
-            self._prepare_tensor("temperature", temperature_array),
-            self._prepare_tensor("length_penalty", len_penalty),
-            self._prepare_tensor("repetition_penalty", repetition_penalty_array),
-            self._prepare_tensor("random_seed", random_seed),
-            self._prepare_tensor("beam_width", beam_width_array),
-            self._prepare_tensor("stream", streaming_data),
+        parameters = self._input_cache.get(key)
+        if parameters is None:
+            parameters = self._generate_parameter_inputs(*key)
+            if len(self._input_cache) >= _INPUT_CACHE_SIZE:
+                self._input_cache.clear()
+            self._input_cache[key] = parameters
+        return [self._prepare_tensor("text_input", query), *parameters]
+
+    def _generate_parameter_inputs(
+        self,
+        batch_size: int,
+        tokens: int,
+        temperature: float,
+        top_k: float,
+        top_p: float,
+        beam_width: int,
+        repetition_penalty: float,
+        length_penalty: float,
+        stream: bool,
+        seed: int,
+    ) -> List[grpcclient.InferInput]:
+        """Create the inputs of the sampling parameters for a batch of prompts."""
+        shape = (batch_size, 1)
+        return [
+            self._prepare_tensor("max_tokens", np.full(shape, tokens, np.uint32)),
+            self._prepare_tensor("top_k", np.full(shape, top_k, np.uint32)),
+            self._prepare_tensor("top_p", np.full(shape, top_p, np.float32)),
+            self._prepare_tensor(
+                "temperature", np.full(shape, temperature, np.float32)
+            ),
+            self._prepare_tensor(
+                "length_penalty", np.full(shape, length_penalty, np.float32)
+            ),
+            self._prepare_tensor(
+                "repetition_penalty", np.full(shape, repetition_penalty, np.float32)
+            ),
+            self._prepare_tensor("random_seed", np.full(shape, seed, np.uint64)),
+            self._prepare_tensor("beam_width", np.full(shape, beam_width, np.uint32)),
+            self._prepare_tensor("stream", np.full(shape, stream, bool)),
         ]
-        return inputs
 
     def _send_stop_signals(self, model_name: str, request_id: str) -> None:
         """Send the stop signal to the Triton Inference server."""
         stop_inputs = self._generate_stop_signals()
-        self.client.async_stream_infer(
-            model_name,
-            stop_inputs,
+        self._streams.send(
+            model_name=model_name,
+            inputs=stop_inputs,
             request_id=request_id,
             parameters={"Streaming": True},
         )
@@ -313,6 +1339,8 @@ class TritonTensorRTLLM(BaseLLM):
         self,
     ) -> List[grpcclient.InferInput]:
         """Generate the signal to stop the stream."""
+        if self._stop_inputs is not None:
+            return self._stop_inputs
         inputs = [
             grpcclient.InferInput("input_ids", [1, 1], "INT32"),
             grpcclient.InferInput("input_lengths", [1, 1], "INT32"),
@@ -323,56 +1351,92 @@ class TritonTensorRTLLM(BaseLLM):
         inputs[1].set_data_from_numpy(np.zeros([1, 1], dtype=np.int32))
         inputs[2].set_data_from_numpy(np.array([[0]], dtype=np.uint32))
         inputs[3].set_data_from_numpy(np.array([[True]], dtype="bool"))
+        self._stop_inputs = inputs
         return inputs
 
     @staticmethod
-    def _process_result(result: Dict[str, str]) -> str:
-        """Post-process the result from the server."""
-
-        message = ModelInferResponse()
-        google.protobuf.json_format.Parse(json.dumps(result), message)
-        infer_result = grpcclient.InferResult(message)
-        np_res = infer_result.as_numpy("text_output")
-
-        generated_text = ""
-        if np_res is not None:
-            generated_text = "".join([token.decode() for token in np_res])
-
-        return generated_text
+    def _process_result(response: ModelInferResponse) -> str:
+        """Post-process the result from the server.
+
+        The raw contents of the BYTES output are decoded in place, each element
+        is serialized as its length, a little-endian uint32, then its bytes.
+        """
+        for index, output in enumerate(response.outputs):
+            if output.name == "text_output":
+                break
+        else:
+            return ""
+        raw = response.raw_output_contents[index]
+
+        tokens = []
+        offset = 0
+        while offset < len(raw):
+            (length,) = _ELEMENT_LENGTH.unpack_from(raw, offset)
+            offset += _ELEMENT_LENGTH.size
+            tokens.append(raw[offset : offset + length])
+            offset += length
+        return b"".join(tokens).decode()
 
     def _stream_callback(
         self,
-        result_queue: queue.Queue[Union[Optional[Dict[str, str]], str]],
-        result: grpcclient.InferResult,
-        error: str,
-        stop_words: List[str],
+        result_queue: StreamingResponseGenerator,
+        result: Optional[grpcclient.InferResult],
+        error: Optional[Exception],
+        model_name: Optional[str] = None,
     ) -> None:
-        """Add streamed result to queue."""
+        """Add streamed result to queue.
+
+        The request is stopped on the server as soon as its output matches a
+        stop sequence, the output is trimmed before it.
+        """
+        request_id = result_queue.request_id
         if error:
+            self._requests.finish(request_id, "failed")
+            if model_name is not None:
+                self._model_failed(model_name)
             result_queue.put(error)
-        else:
-            response_raw: dict = result.get_response(as_json=True)
-            # TODO: Check the response is a map rather than a string
-            if "outputs" in response_raw:
-                # the very last response might have no output, just the final flag
-                response = self._process_result(response_raw)
-
-                if response in stop_words:
-                    result_queue.put(None)
-                else:
-                    result_queue.put(response)
-
-            if response_raw["parameters"]["triton_final_response"]["bool_param"]:
+        elif result is not None and not result_queue.matcher.stopped:
+            response, final = self._parse_response(result)
+            if response:
+                result_queue.record.token()
+            text, matched = result_queue.matcher.feed(response or "")
+            if matched:
+                self._requests.finish(request_id, "stopped")
+            elif final:
+                self._requests.finish(request_id, "completed")
+                text += result_queue.matcher.flush()
+            if text:
+                result_queue.put(text)
+            if matched and not final:
+                result_queue.stop()
+            if matched or final:
                 # end of the generation
                 result_queue.put(None)
 
+    def _parse_response(
+        self, result: grpcclient.InferResult
+    ) -> Tuple[Optional[str], bool]:
+        """The text of a response, if any, and whether it is the final one."""
+        message: ModelInferResponse = result.get_response()
+        response = None
+        if message.outputs:
+            # the very last response might have no output, just the final flag
+            response = self._process_result(message)
+        final = "triton_final_response" in message.parameters and (
+            message.parameters["triton_final_response"].bool_param
+        )
+        return response, final
+
     def stop_stream(
         self, model_name: str, request_id: str, signal: bool = True
     ) -> None:
-        """Close the streaming connection."""
+        """Stop streaming the results of a request.
+
+        The stream itself stays open for the other requests of the client.
+        """
         if signal:
             self._send_stop_signals(model_name, request_id)
-        self.client.stop_stream()
+        self._streams.finish(request_id)
 
 
 class StreamingResponseGenerator(queue.Queue):
@@ -381,27 +1445,56 @@ class StreamingResponseGenerator(queue.Queue):
     def __init__(
         self,
         llm: TritonTensorRTLLM,
-        request_id: str,
-        force_batch: bool,
+        record: _RequestRecord,
         stop_words: Sequence[str],
     ) -> None:
         """Instantiate the generator class."""
         super().__init__()
         self.llm = llm
-        self.request_id = request_id
-        self._batch = force_batch
-        self._stop_words = stop_words
+        self.record = record
+        self.request_id = record.request_id
+        self.matcher = _StopMatcher(stop_words)
+        self._done = False
+        self._stopped = False
+        self._stop_lock = threading.Lock()
 
     def __iter__(self) -> StreamingResponseGenerator:
         """Return self as a generator."""
         return self
 
-    def __next__(self) -> str:
+    def __next__(self) -> Union[str, Exception]:
         """Return the next retrieved token."""
+        if self._done:
+            raise StopIteration()
         val = self.get()
-        if val is None or val in self._stop_words:
-            self.llm.stop_stream(
-                self.llm.model_name, self.request_id, signal=not self._batch
-            )
+        if isinstance(val, Exception):
+            # the request failed, there is nothing left to stop
+            self._done = True
+            return val
+        if val is None:
+            # the generation ended or was stopped already
+            self._done = True
+            self.stop(signal=False)
             raise StopIteration()
         return val
+
+    def stop(self, signal: bool = True) -> None:
+        """Stop the request, once, sending the stop signal if `signal` is set."""
+        with self._stop_lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        self.llm.stop_stream(self.llm.model_name, self.request_id, signal=signal)
+
+    def cancel(self) -> None:
+        """Stop the request from any thread, ending its results."""
+        self.llm._requests.finish(self.request_id, "cancelled")
+        self.stop()
+        self.put(None)
+
+    def close(self) -> None:
+        """Stop the request, unless all of its results have been retrieved."""
+        if not self._done:
+            self._done = True
+            self.llm._requests.finish(self.request_id, "cancelled")
+            self.stop()
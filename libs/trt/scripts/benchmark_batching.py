@@ -0,0 +1,112 @@
+"""
+Compare sending prompts one at a time with sending them as a batch.
+
+Starts a mock Triton gRPC server whose model generates one token every
+`--token-delay` seconds for each request in flight, like the in-flight batching
+of TensorRT-LLM does, then generates completions of the same prompts with
+`TritonTensorRTLLM._request` per prompt and with `TritonTensorRTLLM.generate`.
+
+    python scripts/benchmark_batching.py --prompts 32
+"""
+
+import argparse
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator, List
+
+import grpc
+import numpy as np
+from tritonclient.grpc import service_pb2, service_pb2_grpc
+from tritonclient.utils import deserialize_bytes_tensor, serialize_byte_tensor
+
+from langchain_nvidia_trt import TritonTensorRTLLM
+
+
+class InFlightBatchingTriton(service_pb2_grpc.GRPCInferenceServiceServicer):
+    def __init__(self, tokens: int, token_delay: float) -> None:
+        self.tokens = tokens
+        self.token_delay = token_delay
+
+    def _generate(self, request: Any, responses: queue.Queue) -> None:
+        index = [tensor.name for tensor in request.inputs].index("text_input")
+        prompt = deserialize_bytes_tensor(request.raw_input_contents[index])[0]
+        time.sleep(self.tokens * self.token_delay)
+        response = service_pb2.ModelInferResponse(id=request.id)
+        output = response.outputs.add(name="text_output", datatype="BYTES")
+        output.shape.append(1)
+        text = np.array([prompt.upper()], dtype=object)
+        response.raw_output_contents.append(serialize_byte_tensor(text).item())
+        response.parameters["triton_final_response"].bool_param = True
+        responses.put(service_pb2.ModelStreamInferResponse(infer_response=response))
+
+    def ModelStreamInfer(self, request_iterator: Iterator[Any], context: Any) -> Any:
+        responses: queue.Queue = queue.Queue()
+
+        def read() -> None:
+            generations = []
+            try:
+                for request in request_iterator:
+                    if "text_input" not in [tensor.name for tensor in request.inputs]:
+                        continue  # a stop signal
+                    generation = threading.Thread(
+                        target=self._generate, args=(request, responses)
+                    )
+                    generation.start()
+                    generations.append(generation)
+            except grpc.RpcError:
+                pass  # the client closed the stream
+            for generation in generations:
+                generation.join()
+            responses.put(None)
+
+        threading.Thread(target=read, daemon=True).start()
+        while (response := responses.get()) is not None:
+            yield response
+
+    def ModelReady(self, request: Any, context: Any) -> Any:
+        return service_pb2.ModelReadyResponse(ready=True)
+
+
+def report(name: str, wall: float, prompts: int) -> None:
+    print(  # noqa: T201
+        f"{name:<24} wall {wall:6.2f}s  {prompts / wall:8.1f} prompts/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--prompts", type=int, default=32)
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    args = parser.parse_args()
+
+    server = grpc.server(ThreadPoolExecutor(max_workers=4))
+    service_pb2_grpc.add_GRPCInferenceServiceServicer_to_server(
+        InFlightBatchingTriton(args.tokens, args.token_delay), server
+    )
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    try:
+        llm = TritonTensorRTLLM(
+            model_name="ensemble", server_url=f"127.0.0.1:{port}", load_model=False
+        )
+        prompts: List[str] = [f"prompt {i}" for i in range(args.prompts)]
+        params = llm._get_invocation_params()
+
+        start = time.perf_counter()
+        for prompt in prompts:
+            llm._request(llm.model_name, prompt=[[prompt]], stop=llm.stop, **params)
+        report("one at a time", time.perf_counter() - start, len(prompts))
+
+        start = time.perf_counter()
+        llm.generate(prompts)
+        report("batch on one stream", time.perf_counter() - start, len(prompts))
+        llm.close()
+    finally:
+        server.stop(grace=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Measure the cost of handling one streamed token in the stream callback.
+
+Compares `TritonTensorRTLLM._stream_callback`, which reads the `InferResult`
+protobuf directly, with the previous handling of a token, which converted the
+response to JSON and parsed it back into a protobuf message.
+
+    python scripts/benchmark_callback.py --tokens 100000
+"""
+
+import argparse
+import json
+import queue
+import timeit
+
+import google.protobuf.json_format
+import numpy as np
+import tritonclient.grpc as grpcclient
+from tritonclient.grpc import service_pb2
+from tritonclient.utils import serialize_byte_tensor
+
+from langchain_nvidia_trt import TritonTensorRTLLM
+from langchain_nvidia_trt.llms import StreamingResponseGenerator
+
+
+def token_result(token: str) -> grpcclient.InferResult:
+    response = service_pb2.ModelInferResponse(model_name="ensemble", id="1")
+    output = response.outputs.add(name="text_output", datatype="BYTES")
+    output.shape.append(1)
+    data = serialize_byte_tensor(np.array([token.encode()], dtype=object))
+    response.raw_output_contents.append(data.item())
+    response.parameters["triton_final_response"].bool_param = False
+    return grpcclient.InferResult(response)
+
+
+def json_round_trip(result_queue: queue.Queue, result: grpcclient.InferResult) -> None:
+    """The handling of a token before the callback read the protobuf."""
+    response_raw = result.get_response(as_json=True)
+    message = service_pb2.ModelInferResponse()
+    google.protobuf.json_format.Parse(json.dumps(response_raw), message)
+    np_res = grpcclient.InferResult(message).as_numpy("text_output")
+    result_queue.put("".join([token.decode() for token in np_res]))
+    if response_raw["parameters"]["triton_final_response"]["bool_param"]:
+        result_queue.put(None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tokens", type=int, default=100_000)
+    args = parser.parse_args()
+
+    llm = TritonTensorRTLLM(
+        model_name="ensemble", server_url="localhost:8001", load_model=False
+    )
+    result = token_result(" token")
+    result_queue = StreamingResponseGenerator(
+        llm, llm._requests.create("ensemble"), stop_words=["</s>"]
+    )
+
+    for name, callback in [
+        ("json round trip", lambda: json_round_trip(result_queue, result)),
+        (
+            "protobuf",
+            lambda: llm._stream_callback(result_queue, result=result, error=None),
+        ),
+    ]:
+        seconds = min(timeit.repeat(callback, number=args.tokens, repeat=3))
+        result_queue.queue.clear()
+        print(  # noqa: T201
+            f"{name:<16} {seconds / args.tokens * 1e6:8.2f} us/token"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Generator, Iterator, List, Optional, Set, Tuple
+
+import grpc
+import numpy as np
+import pytest
+from tritonclient.grpc import service_pb2, service_pb2_grpc
+from tritonclient.utils import deserialize_bytes_tensor, serialize_byte_tensor
+
+
+def _input(request: service_pb2.ModelInferRequest, name: str) -> Optional[np.ndarray]:
+    """Flattened contents of a BYTES or BOOL input of a request"""
+    for index, tensor in enumerate(request.inputs):
+        if tensor.name == name:
+            raw = request.raw_input_contents[index]
+            if tensor.datatype == "BYTES":
+                return deserialize_bytes_tensor(raw)
+            return np.frombuffer(raw, dtype=bool)
+    return None
+
+
+def _response(
+    request: service_pb2.ModelInferRequest, text: Optional[str], final: bool
+) -> service_pb2.ModelStreamInferResponse:
+    response = service_pb2.ModelInferResponse(
+        model_name=request.model_name, id=request.id
+    )
+    if text is not None:
+        output = response.outputs.add(name="text_output", datatype="BYTES")
+        output.shape.append(1)
+        data = serialize_byte_tensor(np.array([text.encode()], dtype=object))
+        response.raw_output_contents.append(data.item())
+    response.parameters["triton_final_response"].bool_param = final
+    return service_pb2.ModelStreamInferResponse(infer_response=response)
+
+
+class MockTriton(service_pb2_grpc.GRPCInferenceServiceServicer):
+    """
+    A Triton server hosting one TensorRT-LLM model, which answers a prompt with
+    its words in upper case, one token per word. Requests sent on a stream are
+    generated concurrently, like in-flight batching does. The prompt "fail"
+    gets an error response, with the id of its request, the prompt "fail all"
+    one without it, which fails every request of the stream.
+    """
+
+    def __init__(self, token_delay: float = 0.0) -> None:
+        self.token_delay = token_delay
+        self.load_delay = 0.0
+        self.ready = True
+        self.streams = 0
+        self.readiness_checks = 0
+        self.requests: List[service_pb2.ModelInferRequest] = []
+        self.stopped: Set[str] = set()
+        self.generating = 0
+        self.most_generating = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def tokens(prompt: str) -> List[str]:
+        words = prompt.upper().split()
+        return [word if not i else f" {word}" for i, word in enumerate(words)]
+
+    def _generate(
+        self,
+        request: service_pb2.ModelInferRequest,
+        responses: "queue.Queue[Optional[service_pb2.ModelStreamInferResponse]]",
+    ) -> None:
+        with self._lock:
+            self.generating += 1
+            self.most_generating = max(self.most_generating, self.generating)
+        prompt = _input(request, "text_input")
+        stream = _input(request, "stream")
+        assert prompt is not None and stream is not None
+        if prompt[0].decode() in ("fail", "fail all"):
+            self._finished()
+            failed = request.id if prompt[0].decode() == "fail" else ""
+            responses.put(
+                service_pb2.ModelStreamInferResponse(
+                    error_message="generation failed",
+                    infer_response=service_pb2.ModelInferResponse(id=failed),
+                )
+            )
+            return
+        tokens = self.tokens(prompt[0].decode())
+        if not stream[0]:
+            time.sleep(self.token_delay * len(tokens))
+            self._finished()
+            responses.put(_response(request, "".join(tokens), final=True))
+            return
+        for token in tokens:
+            time.sleep(self.token_delay)
+            if request.id in self.stopped:
+                break
+            responses.put(_response(request, token, final=False))
+        self._finished()
+        responses.put(_response(request, None, final=True))
+
+    def _finished(self) -> None:
+        """Count a generation as ended, before its final response is sent"""
+        with self._lock:
+            self.generating -= 1
+
+    def ModelStreamInfer(
+        self, request_iterator: Iterator[Any], context: Any
+    ) -> Iterator[service_pb2.ModelStreamInferResponse]:
+        self.streams += 1
+        responses: queue.Queue = queue.Queue()
+
+        def read() -> None:
+            generations = []
+            try:
+                for request in request_iterator:
+                    self.requests.append(request)
+                    if _input(request, "stop") is not None:
+                        self.stopped.add(request.id)
+                        continue
+                    generation = threading.Thread(
+                        target=self._generate, args=(request, responses)
+                    )
+                    generation.start()
+                    generations.append(generation)
+            except grpc.RpcError:
+                pass  # the client cancelled the stream
+            for generation in generations:
+                generation.join()
+            responses.put(None)
+
+        threading.Thread(target=read, daemon=True).start()
+        while (response := responses.get()) is not None:
+            yield response
+
+    def ModelReady(self, request: Any, context: Any) -> Any:
+        self.readiness_checks += 1
+        return service_pb2.ModelReadyResponse(ready=self.ready)
+
+    def RepositoryModelLoad(self, request: Any, context: Any) -> Any:
+        def load() -> None:
+            self.ready = True
+
+        threading.Timer(self.load_delay, load).start()
+        return service_pb2.RepositoryModelLoadResponse()
+
+    def RepositoryIndex(self, request: Any, context: Any) -> Any:
+        return service_pb2.RepositoryIndexResponse(
+            models=[service_pb2.RepositoryIndexResponse.ModelIndex(name="ensemble")]
+        )
+
+
+@pytest.fixture
+def triton_server() -> Generator[Tuple[str, MockTriton], None, None]:
+    """A mock Triton server on localhost, returns its url and servicer"""
+    servicer = MockTriton()
+    server = grpc.server(ThreadPoolExecutor(max_workers=32))
+    service_pb2_grpc.add_GRPCInferenceServiceServicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    yield f"127.0.0.1:{port}", servicer
+    server.stop(grace=None)
@@ -1,7 +1,538 @@
 """Test TritonTensorRT Chat API wrapper."""
+
+import asyncio
+import gc
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Tuple
+
+import pytest
+import tritonclient.grpc as grpcclient
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import RunnableConfig
+from tritonclient.grpc import service_pb2
+
 from langchain_nvidia_trt import TritonTensorRTLLM
+from langchain_nvidia_trt.llms import (
+    _CLIENTS,
+    StreamingResponseGenerator,
+    TritonTensorRTRuntimeError,
+    _StopMatcher,
+)
+from tests.unit_tests.conftest import MockTriton, _input, _response
+
+## How long to poll for something the server does in the background
+_DEADLINE = 5.0
+
+
+def _wait_for(condition: Callable[[], bool]) -> bool:
+    """Poll a condition until it holds or the deadline passed, returns it"""
+    deadline = time.monotonic() + _DEADLINE
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+async def _await_for(condition: Callable[[], bool]) -> bool:
+    """Poll a condition from the event loop, like `_wait_for`"""
+    deadline = time.monotonic() + _DEADLINE
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    return condition()
 
 
 def test_initialization() -> None:
     """Test integration initialization."""
     TritonTensorRTLLM(model_name="ensemble", server_url="http://localhost:8001")
+
+
+def test_generate_batch(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test prompts are sent concurrently on one stream."""
+    url, servicer = triton_server
+    servicer.token_delay = 0.1
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    prompts = ["hello world", "good morning to you", "bye"]
+    result = llm.generate(prompts)
+    assert [g[0].text for g in result.generations] == [
+        "HELLO WORLD",
+        "GOOD MORNING TO YOU",
+        "BYE",
+    ]
+    assert servicer.streams == 1
+    assert servicer.most_generating == len(prompts)
+    assert len({request.id for request in servicer.requests}) == len(prompts)
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+async def test_generate_batch_in_flight(
+    triton_server: Tuple[str, MockTriton], use_async: bool
+) -> None:
+    """Test at most max_in_flight prompts of a batch are in progress at once."""
+    url, servicer = triton_server
+    servicer.token_delay = 0.01
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url, max_in_flight=2)
+    prompts = [f"prompt number {i}" for i in range(6)]
+    if use_async:
+        result = await llm.agenerate(prompts)
+    else:
+        result = llm.generate(prompts)
+    assert [g[0].text for g in result.generations] == [p.upper() for p in prompts]
+    assert len(servicer.requests) == len(prompts)
+    assert servicer.most_generating <= 2
+
+
+def test_concurrent_streams(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test generations from several threads share the stream of the client."""
+    url, servicer = triton_server
+    servicer.token_delay = 0.01
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    prompts = [f"prompt number {i}" for i in range(8)]
+    with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+        results = list(executor.map(lambda p: "".join(llm.stream(p)), prompts))
+    assert results == [f"PROMPT NUMBER {i}" for i in range(8)]
+    assert llm.invoke("one more") == "ONE MORE"
+    assert servicer.streams == 1
+
+
+def test_stream_stopped_early(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test the request is stopped when the caller stops iterating."""
+    url, servicer = triton_server
+    servicer.token_delay = 0.05
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    for _ in llm.stream("a b c d e f g h"):
+        break
+    request_id = servicer.requests[0].id
+    assert _wait_for(lambda: request_id in servicer.stopped)
+    assert llm.invoke("again") == "AGAIN"
+
+
+async def test_astream(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test streaming with the asyncio client."""
+    url, servicer = triton_server
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    chunks = [chunk async for chunk in llm.astream("hello big world")]
+    # the last chunk carries the metrics of the request
+    assert chunks == ["HELLO", " BIG", " WORLD", ""]
+
+
+async def test_agenerate(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test the prompts of a batch are requested concurrently."""
+    url, servicer = triton_server
+    servicer.token_delay = 0.1
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    result = await llm.agenerate(["hello world", "good morning to you", "bye"])
+    assert [g[0].text for g in result.generations] == [
+        "HELLO WORLD",
+        "GOOD MORNING TO YOU",
+        "BYE",
+    ]
+    assert servicer.most_generating == 3
+
+
+async def test_astream_cancelled(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test cancelling a streaming task stops its request on the server."""
+    url, servicer = triton_server
+    servicer.token_delay = 0.05
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    first_token = asyncio.Event()
+
+    async def consume() -> None:
+        async for _ in llm.astream("a b c d e f g h"):
+            first_token.set()
+
+    task = asyncio.create_task(consume())
+    await first_token.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    request_id = servicer.requests[0].id
+    assert await _await_for(lambda: request_id in servicer.stopped)
+
+
+def test_parse_response() -> None:
+    """Test the text and final flag are read from the raw response."""
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url="localhost:8001")
+    request = service_pb2.ModelInferRequest(model_name="ensemble", id="1")
+    text = _response(request, "héllo", final=False).infer_response
+    assert llm._parse_response(grpcclient.InferResult(text)) == ("héllo", False)
+    last = _response(request, None, final=True).infer_response
+    assert llm._parse_response(grpcclient.InferResult(last)) == (None, True)
+    del last.parameters["triton_final_response"]
+    assert llm._parse_response(grpcclient.InferResult(last)) == (None, False)
+
+
+def test_input_cache() -> None:
+    """Test the tensors of the sampling parameters are reused."""
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url="localhost:8001")
+    params = llm._get_invocation_params()
+    first = llm._generate_inputs(prompt=[["a"]], **params)
+    second = llm._generate_inputs(prompt=[["b"]], **params)
+    assert first[0] is not second[0]
+    assert first[1:] == second[1:]
+    assert [tensor.name() for tensor in first] == [
+        "text_input",
+        "max_tokens",
+        "top_k",
+        "top_p",
+        "temperature",
+        "length_penalty",
+        "repetition_penalty",
+        "random_seed",
+        "beam_width",
+        "stream",
+    ]
+
+    batch = llm._generate_inputs(prompt=[["a"], ["b"], ["c"]], **params)
+    assert all(tensor.shape() == [3, 1] for tensor in batch)
+    assert batch[1:] != first[1:]
+
+    hotter = llm._generate_inputs(prompt=[["a"]], **{**params, "temperature": 0.5})
+    assert hotter[4] is not first[4]
+    assert hotter[1] is not first[1]
+
+
+def test_readiness_cached(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test the readiness of the model is checked once."""
+    url, servicer = triton_server
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    assert llm.invoke("one") == "ONE"
+    assert llm.generate(["two", "three"]).generations[1][0].text == "THREE"
+    assert "".join(llm.stream("four")) == "FOUR"
+    assert servicer.readiness_checks == 1
+
+    # a failed request invalidates it
+    llm._stream_callback(
+        StreamingResponseGenerator(
+            llm, llm._requests.create("ensemble"), stop_words=[]
+        ),
+        result=None,
+        error=Exception("failed"),
+        model_name="ensemble",
+    )
+    assert llm.invoke("five") == "FIVE"
+    assert servicer.readiness_checks == 2
+
+
+async def test_areadiness_cached(triton_server: Tuple[str, MockTriton]) -> None:
+    url, servicer = triton_server
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    assert await llm.ainvoke("one") == "ONE"
+    assert await llm.ainvoke("two") == "TWO"
+    assert servicer.readiness_checks == 1
+
+
+def test_load_model(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test readiness is polled with a backoff while the model loads."""
+    url, servicer = triton_server
+    servicer.ready = False
+    servicer.load_delay = 0.3
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    assert llm.invoke("hello") == "HELLO"
+    # a poll every 50ms at most, with the check before loading
+    assert 2 < servicer.readiness_checks < 8
+
+
+def test_load_model_disabled(triton_server: Tuple[str, MockTriton]) -> None:
+    url, servicer = triton_server
+    servicer.ready = False
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url, load_model=False)
+    with pytest.raises(TritonTensorRTRuntimeError, match="not ready"):
+        llm.invoke("hello")
+
+
+def test_warmup(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test the warmup prompt is generated once, before the first request."""
+    url, servicer = triton_server
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url, warmup_prompt="hi")
+    assert llm.invoke("hello") == "HELLO"
+    assert llm.invoke("again") == "AGAIN"
+    prompts = [_input(request, "text_input") for request in servicer.requests]
+    assert [prompt[0] for prompt in prompts if prompt is not None] == [
+        b"hi",
+        b"hello",
+        b"again",
+    ]
+    max_tokens = _input(servicer.requests[0], "max_tokens")
+    assert max_tokens is not None and max_tokens[0] == 1
+
+
+@pytest.mark.parametrize(
+    "chunks, stop_words, expected, matched",
+    [
+        (["a", "b", "c"], [], "abc", False),
+        (["hello", "</s>"], ["</s>"], "hello", True),
+        (["hel", "lo</", "s>", "more"], ["</s>"], "hello", True),
+        (["a", "<", "b"], ["</s>"], "a<b", False),
+        (["a", "<", "/"], ["</s>"], "a", False),
+        (["ab", "cd"], ["bc", "d"], "a", True),
+        (["Obs", "erv", "ation:"], ["\nObservation:", "Observation:"], "", True),
+    ],
+)
+def test_stop_matcher(
+    chunks: List[str], stop_words: List[str], expected: str, matched: bool
+) -> None:
+    matcher = _StopMatcher(stop_words)
+    output = ""
+    for chunk in chunks:
+        text, stopped = matcher.feed(chunk)
+        output += text
+        if stopped:
+            break
+    assert (output, matcher.stopped) == (expected, matched)
+
+
+def test_stream_stop_sequence(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test a stop sequence spanning several tokens stops the request."""
+    url, servicer = triton_server
+    servicer.token_delay = 0.02
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    chunks = list(llm.stream("a b c d e f g h", stop=[" C D"]))
+    assert "".join(chunks) == "A B"
+    request_id = servicer.requests[0].id
+    assert _wait_for(lambda: request_id in servicer.stopped)
+    assert llm.invoke("a b c d", stop=["B C"]) == "A "
+    assert llm.generate(["a b c d"], stop=[" D"]).generations[0][0].text == "A B C"
+
+
+async def test_astream_stop_sequence(triton_server: Tuple[str, MockTriton]) -> None:
+    url, servicer = triton_server
+    servicer.token_delay = 0.02
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    chunks = [chunk async for chunk in llm.astream("a b c d e f", stop=[" C D"])]
+    assert "".join(chunks) == "A B"
+    request_id = servicer.requests[0].id
+    assert await _await_for(lambda: request_id in servicer.stopped)
+    assert await llm.ainvoke("a b c d", stop=[" D"]) == "A B C"
+
+
+def test_request_registry(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test requests get unique numeric ids and their lifecycle is recorded."""
+    url, servicer = triton_server
+    servicer.token_delay = 0.01
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    prompts = [f"prompt number {i}" for i in range(8)]
+    with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+        list(executor.map(lambda p: "".join(llm.stream(p)), prompts))
+    llm.generate(["a b", "c d"])
+    "".join(llm.stream("a b c d", stop=[" C"]))
+
+    ids = [request.id for request in servicer.requests if request.id]
+    assert all(request_id.isdigit() for request_id in ids)
+    assert len(set(ids)) == len(prompts) + 3
+    assert llm.get_active_requests() == []
+    stats = llm.get_request_stats()
+    assert stats["completed"] == len(prompts) + 2
+    assert stats["stopped"] == 1
+    assert stats["tokens"] == 3 * len(prompts) + 2 + 3
+    assert 0 < stats["time_to_first_token_mean"] < stats["latency_p95"]
+
+
+def test_cancel_request(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test a request can be cancelled from another thread."""
+    url, servicer = triton_server
+    servicer.token_delay = 0.05
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    chunks = llm.stream("a b c d e f g h")
+    assert next(chunks) == "A"
+    (active,) = llm.get_active_requests()
+    assert active["state"] == "running" and active["tokens"] == 1
+    assert llm.cancel_request(active["request_id"])
+    assert "".join(chunks) == ""
+    assert _wait_for(lambda: active["request_id"] in servicer.stopped)
+    assert llm.get_request_stats()["cancelled"] == 1
+    assert not llm.cancel_request(active["request_id"])
+
+
+async def test_acancel_request(triton_server: Tuple[str, MockTriton]) -> None:
+    url, servicer = triton_server
+    servicer.token_delay = 0.05
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    chunks = []
+    async for chunk in llm.astream("a b c d e f g h"):
+        chunks.append(chunk)
+        if len(chunks) == 1:
+            (active,) = llm.get_active_requests()
+            assert llm.cancel_request(active["request_id"])
+    # the generation ends before its 8 tokens
+    assert len(chunks) < 8
+    assert await _await_for(lambda: active["request_id"] in servicer.stopped)
+    assert llm.get_request_stats()["cancelled"] == 1
+
+
+def test_shared_client(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test instances with the same server and options share a client."""
+    url, servicer = triton_server
+    first = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    second = TritonTensorRTLLM(model_name="ensemble", server_url=url, tokens=10)
+    compressed = TritonTensorRTLLM(
+        model_name="ensemble", server_url=url, compression="gzip"
+    )
+    assert first.client is second.client
+    assert compressed.client is not first.client
+    assert first.invoke("one") == "ONE"
+    assert second.invoke("two") == "TWO"
+    assert compressed.invoke("three") == "THREE"
+    assert servicer.streams == 2
+
+    first.close()
+    first.close()
+    assert second.invoke("four") == "FOUR"
+    second.close()
+    third = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    assert third.client is not first.client
+    assert third.invoke("five") == "FIVE"
+
+    # collected instances release their client
+    client = third.client
+    del third
+    gc.collect()
+    assert all(pooled is not client for pooled, _ in _CLIENTS._clients.values())
+    compressed.close()
+
+
+def test_invalid_fields_acquire_no_client(
+    triton_server: Tuple[str, MockTriton],
+) -> None:
+    """Test an instance failing validation leaves the pool unchanged."""
+    url, servicer = triton_server
+    clients = dict(_CLIENTS._clients)
+    with pytest.raises(ValueError):
+        TritonTensorRTLLM(model_name="ensemble", server_url=url, top_k="bad")
+    assert _CLIENTS._clients == clients
+
+
+def test_aclients_closed(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test the asyncio clients of ended event loops are closed."""
+    url, servicer = triton_server
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    assert asyncio.run(llm.ainvoke("one")) == "ONE"
+    (first,) = llm._aclients.values()
+    assert asyncio.run(llm.ainvoke("two")) == "TWO"
+    (second,) = llm._aclients.values()
+    assert second is not first
+    with pytest.raises(Exception, match="closed"):
+        asyncio.run(first.is_model_ready("ensemble"))
+    llm.close()
+    assert not llm._aclients
+    with pytest.raises(Exception, match="closed"):
+        asyncio.run(second.is_model_ready("ensemble"))
+
+
+def test_own_client(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test a client passed to an instance is not closed with it."""
+    url, servicer = triton_server
+    client = grpcclient.InferenceServerClient(url)
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url, client=client)
+    assert llm.invoke("hello") == "HELLO"
+    llm.close()
+    assert client.is_model_ready("ensemble")
+    client.close()
+
+
+def test_shared_own_client(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test instances passed the same client share its stream."""
+    url, servicer = triton_server
+    client = grpcclient.InferenceServerClient(url)
+    first = TritonTensorRTLLM(model_name="ensemble", server_url=url, client=client)
+    second = TritonTensorRTLLM(model_name="ensemble", server_url=url, client=client)
+    assert first.invoke("hello") == "HELLO"
+    assert second.invoke("world") == "WORLD"
+    assert servicer.streams == 1
+    client.close()
+
+
+def test_request_error(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test the error of a request fails it alone, not the others of the stream."""
+    url, servicer = triton_server
+    servicer.token_delay = 0.02
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    other = TritonTensorRTLLM(model_name="ensemble", server_url=url, tokens=10)
+    stream = llm.stream("a b c d e")
+    assert next(stream) == "A"
+    with pytest.raises(Exception, match="generation failed"):
+        other.invoke("fail")
+    assert "".join(stream) == " B C D E"
+    assert servicer.streams == 1
+
+
+def test_stream_failed(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test a failed stream is replaced by the next request, without deadlock."""
+    url, servicer = triton_server
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    with pytest.raises(Exception, match="generation failed"):
+        llm.invoke("fail all")
+    # the stream is still open, stopping it dispatches its cancellation
+    results: List[str] = []
+    retry = threading.Thread(
+        target=lambda: results.append(llm.invoke("again")), daemon=True
+    )
+    retry.start()
+    retry.join(_DEADLINE)
+    assert results == ["AGAIN"]
+    assert servicer.streams == 2
+
+
+def test_max_message_size(triton_server: Tuple[str, MockTriton]) -> None:
+    url, servicer = triton_server
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url, max_message_size=512)
+    assert llm.invoke("short") == "SHORT"
+    with pytest.raises(Exception, match="RESOURCE_EXHAUSTED|larger than max"):
+        llm.invoke("long " * 200)
+    llm.close()
+
+
+class _Outputs(BaseCallbackHandler):
+    def __init__(self) -> None:
+        self.results: List[LLMResult] = []
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        self.results.append(response)
+
+
+def test_generate_metrics(triton_server: Tuple[str, MockTriton]) -> None:
+    """Test the metrics of the requests are in the result."""
+    url, servicer = triton_server
+    servicer.token_delay = 0.02
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    result = llm.generate(["a b", "c d e"], stop=[" E"])
+    first, second = (
+        generations[0].generation_info for generations in result.generations
+    )
+    assert first is not None and second is not None
+    assert first["stop_reason"] == "end"
+    assert second["stop_reason"] == "stop_sequence"
+    assert first["request_id"] != second["request_id"]
+    assert first["latency_seconds"] >= 0.04
+    assert 0 <= first["queue_time_seconds"] < first["latency_seconds"]
+    # token counts and timings of tokens are only known when streaming
+    assert "completion_tokens" not in first
+    assert result.llm_output == {"model_name": "ensemble"}
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+async def test_stream_metrics(
+    triton_server: Tuple[str, MockTriton], use_async: bool
+) -> None:
+    """Test the metrics of a stream reach the callbacks."""
+    url, servicer = triton_server
+    servicer.token_delay = 0.02
+    llm = TritonTensorRTLLM(model_name="ensemble", server_url=url)
+    outputs = _Outputs()
+    config: RunnableConfig = {"callbacks": [outputs]}
+    if use_async:
+        chunks = [c async for c in llm.astream("a b c d", config=config)]
+    else:
+        chunks = list(llm.stream("a b c d", config=config))
+    assert "".join(chunks) == "A B C D"
+
+    (result,) = outputs.results
+    info = result.generations[0][0].generation_info
+    assert info is not None
+    assert info["stop_reason"] == "end"
+    assert info["completion_tokens"] == 4
+    assert info["token_usage"] == {"completion_tokens": 4, "total_tokens": 4}
+    assert info["model_name"] == "ensemble"
+    assert 0.02 <= info["time_to_first_token_seconds"] < info["latency_seconds"]
+    assert 0.01 < info["inter_token_latency_seconds"] < info["latency_seconds"]